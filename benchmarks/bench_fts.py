@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Compare the full-text search backend with the in-memory index.
+
+For each bookmark count, lays out a fake HOME, times the first sync of
+the FTS5 database (bookmarks plus History), then the median warm
+search_results time for a few queries with each backend, and the time to
+open the database in a new process-like store.
+
+Usage: benchmarks/bench_fts.py [sizes] [runs]
+       e.g. benchmarks/bench_fts.py 1000,10000,100000 20
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fixtures import make_home
+
+QUERIES = ['git', 'café', 'kubectl', 'review', 'zzqx', 'git rev', 'git -review']
+
+
+def median_ms(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def main():
+    sizes = [int(s) for s in (sys.argv[1] if len(sys.argv) > 1 else '1000,10000').split(',')]
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"{'size':>8} {'sync ms':>9} {'open ms':>8} {'query':>12} {'index ms':>9} {'fts ms':>8}")
+    for n in sizes:
+        root = tempfile.mkdtemp(prefix='bench-fts-')
+        try:
+            os.environ.update(HOME=os.path.join(root, 'home'),
+                              alfred_workflow_cache=os.path.join(root, 'cache'))
+            make_home(os.environ['HOME'], n)
+            from bookmark_manager import BookmarkManager
+            from fts_store import FtsStore
+
+            manager = BookmarkManager()
+            start = time.perf_counter()
+            manager.fts_store = FtsStore()
+            manager.fts_store.sync(manager.sources)
+            sync_ms = (time.perf_counter() - start) * 1000
+            open_ms = median_ms(lambda: FtsStore().connect(), runs)
+
+            for query in QUERIES:
+                os.environ.pop('BM_SEARCH_BACKEND', None)
+                manager.search_results(query)
+                index_ms = median_ms(lambda: manager.search_results(query), runs)
+                os.environ['BM_SEARCH_BACKEND'] = 'fts'
+                fts_ms = median_ms(lambda: manager.search_results(query), runs)
+                print(f"{n:>8} {sync_ms:>9.1f} {open_ms:>8.2f} {query:>12} {index_ms:>9.2f} "
+                      f"{fts_ms:>8.2f}")
+        finally:
+            os.environ.pop('BM_SEARCH_BACKEND', None)
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
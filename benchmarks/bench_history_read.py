@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Time reading Chrome's History database: the old copy-to-/tmp approach
+against open_readonly, both unlocked and while another connection holds
+an exclusive lock (as a running Chrome does).
+
+Usage: benchmarks/bench_history_read.py [size_mb]
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from readonly_db import open_readonly
+from fixtures import make_history_db
+
+RECENT_QUERY = """
+    SELECT title, url FROM urls
+    WHERE last_visit_time > ?
+    ORDER BY last_visit_time DESC
+    LIMIT 20
+"""
+
+
+def cutoff() -> int:
+    return int((time.time() - 3600) * 1000000 + 11644473600000000)
+
+
+def read_by_copy(db_path: str):
+    temp_db = os.path.join(tempfile.gettempdir(), 'chrome_history_temp')
+    shutil.copyfile(db_path, temp_db)
+    try:
+        conn = sqlite3.connect(temp_db)
+        conn.execute(RECENT_QUERY, (cutoff(),)).fetchall()
+        conn.close()
+    finally:
+        os.remove(temp_db)
+
+
+def read_in_place(db_path: str):
+    with open_readonly(db_path) as conn:
+        conn.execute(RECENT_QUERY, (cutoff(),)).fetchall()
+
+
+def time_it(fn, db_path: str, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(db_path)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    work_dir = tempfile.mkdtemp(prefix='bench-history-')
+    try:
+        db_path = os.path.join(work_dir, 'History')
+        # About 2500 padded urls per megabyte, as a large real History
+        make_history_db(db_path, size_mb * 2500, visits_per_url=0, padding=200)
+        print(f"fixture: {os.path.getsize(db_path) / 1e6:.0f} MB")
+        print(f"copy to /tmp + query:      {time_it(read_by_copy, db_path):9.1f} ms")
+        print(f"open_readonly, unlocked:   {time_it(read_in_place, db_path):9.1f} ms")
+
+        # Hold an exclusive lock the way Chrome does while running
+        locker = sqlite3.connect(db_path)
+        locker.execute("PRAGMA locking_mode=EXCLUSIVE")
+        locker.execute("BEGIN EXCLUSIVE")
+        print(f"open_readonly, locked:     {time_it(read_in_place, db_path):9.1f} ms")
+        locker.rollback()
+        locker.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
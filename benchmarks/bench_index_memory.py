@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Measure the memory held by the bookmark index with tracemalloc.
+
+Compares the per-entry dicts the bookmarks used to be held in, and lists
+of str, with the packed columns of BookmarkIndex, and the cost of one
+query against the dicts and the index.
+
+Usage: benchmarks/bench_index_memory.py [sizes]
+       e.g. benchmarks/bench_index_memory.py 10000,100000,300000
+"""
+
+import os
+import sys
+import marshal
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bench_trigram_index import time_query
+from fixtures import synthetic_bookmarks
+from bookmark_index import BookmarkIndex, fold
+
+QUERY = 'wiki'
+
+
+def traced(build):
+    """
+    Run build() and get (result, bytes it still holds)
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, held
+
+
+def dict_search(bookmarks, query):
+    return [
+        b for b in bookmarks
+        if query in b['title'].lower() or query in b['url'].lower()
+    ]
+
+
+def mb(n_bytes: int) -> str:
+    return f"{n_bytes / (1 << 20):8.1f} MB"
+
+
+def main():
+    sizes = [int(s) for s in (sys.argv[1] if len(sys.argv) > 1 else '10000,100000,300000').split(',')]
+    for n in sizes:
+        titles, urls = synthetic_bookmarks(n)
+        index = BookmarkIndex.build(titles, urls)
+        fields = index.snapshot_fields()
+
+        # Every layout is measured as loaded from marshal, as a search loads it
+        dicts, dict_bytes = traced(lambda: marshal.loads(marshal.dumps([
+            {'title': t, 'url': u, 'source': 'chrome'} for t, u in zip(titles, urls)
+        ])))
+        _, list_bytes = traced(lambda: marshal.loads(marshal.dumps(
+            [titles, urls, list(index.fragments)]
+        )))
+        packed = {name: fields[name] for name in ('titles', 'urls', 'fragments')}
+        _, packed_bytes = traced(lambda: marshal.loads(marshal.dumps(packed)))
+        _, keys_bytes = traced(lambda: marshal.loads(marshal.dumps(fields['keys'])))
+        _, postings_bytes = traced(lambda: marshal.loads(marshal.dumps(fields['postings'])))
+        loaded = BookmarkIndex.from_snapshot(dict(fields, stat=(0, 0), checksum=''))
+
+        print(f"{n:>9} bookmarks")
+        print(f"{'dicts':>28} {mb(dict_bytes)}  ({dict_bytes / n:.0f} B/entry)")
+        print(f"{'str lists + fragments':>28} {mb(list_bytes)}  ({list_bytes / n:.0f} B/entry)")
+        print(f"{'packed + fragments':>28} {mb(packed_bytes)}  ({packed_bytes / n:.0f} B/entry)")
+        print(f"{'packed folded keys':>28} {mb(keys_bytes)}  ({keys_bytes / n:.0f} B/entry)")
+        print(f"{'trigram postings':>28} {mb(postings_bytes)}  ({postings_bytes / n:.0f} B/entry)")
+
+        dict_ms = time_query(lambda: dict_search(dicts, QUERY))
+        index_ms = time_query(lambda: loaded.trigrams.search(fold(QUERY)))
+        print(f"{'query ' + repr(QUERY):>28} dicts {dict_ms:.2f} ms, index {index_ms:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Compare patching the bookmark index after a small edit with rebuilding it.
+
+For each size, indexes a generated Bookmarks file, then renames, removes
+and adds a few bookmarks and times BookmarkIndex.patched against
+BookmarkIndex.build over the edited bookmarks, checking both find the
+same bookmarks.
+
+Usage: benchmarks/bench_index_patch.py [sizes] [edits]
+       e.g. benchmarks/bench_index_patch.py 10000,100000 5
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fixtures import make_bookmarks
+from chrome_profiles import read_bookmarks_document
+from bookmark_index import BookmarkIndex, flatten_bookmarks, fold
+
+QUERIES = ['git', 'café', 'renamed', 'kubectl-rollout', 'py']
+
+
+def build(bookmarks: list) -> BookmarkIndex:
+    bookmarks = sorted(bookmarks, key=lambda b: b['title'])
+    return BookmarkIndex.build([b['title'] for b in bookmarks], [b['url'] for b in bookmarks],
+                               [b['folder'] for b in bookmarks], [b['id'] for b in bookmarks])
+
+
+def edit(bookmarks: list, edits: int, rng: random.Random) -> list:
+    """
+    Rename, remove and add edits bookmarks each
+    """
+    bookmarks = [dict(b) for b in bookmarks]
+    for b in rng.sample(bookmarks, edits):
+        b['title'] += ' renamed'
+    for b in rng.sample(bookmarks, edits):
+        bookmarks.remove(b)
+    for n in range(edits):
+        bookmarks.append({'id': f'new-{n}', 'title': f'Added café {n}',
+                          'url': f'https://added.example.com/{n}', 'folder': 'Work/Added'})
+    return bookmarks
+
+
+def found(index: BookmarkIndex) -> list:
+    return [sorted(index.urls[i] for i in index.trigrams.search(fold(q))) for q in QUERIES]
+
+
+def main():
+    sizes = [int(s) for s in (sys.argv[1] if len(sys.argv) > 1 else '10000,100000').split(',')]
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rng = random.Random(1)
+    print(f"{'size':>9} {'edits':>6} {'build ms':>10} {'patch ms':>10}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'Bookmarks')
+            make_bookmarks(path, n)
+            bookmarks = flatten_bookmarks(read_bookmarks_document(path)['roots'])
+        # Patch an index as loaded from its snapshot
+        fields = build(bookmarks).snapshot_fields()
+        base = BookmarkIndex.from_snapshot(dict(fields, stat=(0, 0), checksum=''))
+
+        edited = edit(bookmarks, edits, rng)
+        start = time.perf_counter()
+        rebuilt = build(edited)
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        patched = base.patched(edited)
+        patch_ms = (time.perf_counter() - start) * 1000
+
+        assert found(patched) == found(rebuilt)
+        print(f"{n:>9} {edits:>6} {build_ms:>10.1f} {patch_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Link checker throughput against local stand-in HTTP servers.
+
+Starts one keep-alive HTTP/1.1 server per simulated host on 127.0.0.1 and
+checks thousands of urls spread over them: most answer 200, some are gone
+(404), refuse HEAD (405, then 200 on GET), redirect, or answer slowly, a
+few hang past the checker's timeout or close the connection without an
+answer, and some point at a port nothing listens on. Reports urls/sec and connections opened for a full check,
+then for a re-run served from the result cache, and checks every url got
+the status it should: a hanging page times out alone, while the other
+pages of its host still answer, a dropped connection isn't reported as
+a dead page, and the re-run checks the urls that got no answer again.
+
+Usage: benchmarks/bench_link_check.py [--urls 5000] [--hosts 20]
+           [--workers 32] [--per-host 2] [--rate 0] [--timeout 0.5]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from link_checker import (
+    STATUS_DROPPED, STATUS_TIMEOUT, STATUS_UNREACHABLE, LinkChecker, LinkCheckCache, is_dead
+)
+
+# Seconds a /slow/ page takes to answer
+SLOW_DELAY = 0.02
+
+# Seconds a /hang/ page takes to answer, past the checker's timeout
+HANG_DELAY = 2.0
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with Handler.lock:
+            Handler.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def answer(self, status: int, body: bytes = b'', location: str = None):
+        self.send_response(status)
+        if location:
+            self.send_header('Location', location)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        kind = self.path.split('/')[1]
+        if kind == 'nohead':
+            self.answer(405)
+        else:
+            self.do_GET()
+
+    def do_GET(self):
+        kind, n = self.path.split('/')[1:3]
+        if kind == 'gone':
+            self.answer(404, b'gone')
+        elif kind == 'moved':
+            self.answer(301, location=f'/ok/{n}')
+        elif kind == 'slow':
+            time.sleep(SLOW_DELAY)
+            self.answer(200, b'slow')
+        elif kind == 'hang':
+            time.sleep(HANG_DELAY)
+            self.answer(200, b'late')
+        elif kind == 'drop':
+            # Hang up without answering, like a reset keep-alive connection
+            self.close_connection = True
+        else:
+            self.answer(200, b'<html>ok</html>')
+
+
+def closed_port() -> int:
+    """
+    Get a local port nothing listens on, so connections are refused
+    """
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def make_urls(ports: list, n: int, seed: int = 1) -> dict:
+    """
+    Get {url: expected status} for n urls over the servers, plus a few on
+    a refused port
+    """
+    rng = random.Random(seed)
+    expected = {}
+    for i in range(n):
+        port = rng.choice(ports)
+        roll = rng.random()
+        kind, status = (('gone', 404) if roll < 0.05 else ('nohead', 200) if roll < 0.10
+                        else ('moved', 200) if roll < 0.15 else ('slow', 200) if roll < 0.20
+                        else ('hang', STATUS_TIMEOUT) if roll < 0.201
+                        else ('drop', STATUS_DROPPED) if roll < 0.202 else ('ok', 200))
+        expected[f'http://127.0.0.1:{port}/{kind}/{i}'] = status
+    refused = closed_port()
+    for i in range(max(1, n // 100)):
+        expected[f'http://127.0.0.1:{refused}/ok/{i}'] = STATUS_UNREACHABLE
+    return expected
+
+
+def timed_check(checker: LinkChecker, urls: list, refresh: bool) -> tuple:
+    connections = Handler.connections
+    start = time.perf_counter()
+    results = checker.check(urls, refresh=refresh)
+    elapsed = time.perf_counter() - start
+    return results, elapsed, Handler.connections - connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--urls', type=int, default=5000)
+    parser.add_argument('--hosts', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--per-host', type=int, default=2)
+    parser.add_argument('--rate', type=float, default=0,
+                        help='requests per second per host (0 for no limit)')
+    parser.add_argument('--timeout', type=float, default=0.5,
+                        help='seconds the checker waits for a connection or an answer')
+    args = parser.parse_args()
+
+    servers = [ThreadingHTTPServer(('127.0.0.1', 0), Handler) for _ in range(args.hosts)]
+    for server in servers:
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    expected = make_urls([server.server_address[1] for server in servers], args.urls)
+    urls = list(expected)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        print(f"{'run':>8} {'urls':>7} {'seconds':>9} {'urls/sec':>10} {'connections':>12} "
+              f"{'unanswered':>11}")
+        for run, refresh in (('full', True), ('cached', False)):
+            # A new checker per run, as each check-links command gets
+            checker = LinkChecker(LinkCheckCache(cache_dir), workers=args.workers,
+                                  per_host=args.per_host, host_rate=args.rate,
+                                  timeout=args.timeout)
+            results, elapsed, connections = timed_check(checker, urls, refresh)
+            assert results == expected, 'link statuses differ from what the servers answer'
+            assert not any(is_dead(results[url]) for url in urls if '/drop/' in url), \
+                'a dropped connection was reported as a dead page'
+            unanswered = sum(1 for status in results.values() if status <= 0)
+            stored = LinkCheckCache(cache_dir).load()
+            assert not any(stored.get(url, (0, 1))[1] <= 0 for url in urls), \
+                'a failure without an answer was cached'
+            print(f"{run:>8} {len(results):>7} {elapsed:>9.3f} {len(results) / elapsed:>10.0f} "
+                  f"{connections:>12} {unanswered:>11}")
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
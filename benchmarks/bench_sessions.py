@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Time reading open tabs from Chrome session logs.
+
+For each tab count, writes an SNSS session file in which tabs navigate,
+prune their history and close, checks the parser finds exactly the tabs
+left open with their selected pages, and times a parse of the file
+against a read served from the (size, mtime) keyed cache, in memory and
+from disk.
+
+Usage: benchmarks/bench_sessions.py [tab counts] [runs]
+       e.g. benchmarks/bench_sessions.py 100,1000,10000 20
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fixtures import make_session_file
+from chrome_sessions import SessionTabsCache, read_session_tabs
+
+
+def best_ms(fn, runs: int) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    sizes = [int(s) for s in (sys.argv[1] if len(sys.argv) > 1 else '100,1000,10000').split(',')]
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"{'tabs':>7} {'open':>6} {'file KB':>9} {'parse ms':>9} {'memory ms':>10} "
+          f"{'disk ms':>8}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            sessions_dir = os.path.join(tmp, 'Sessions')
+            path = os.path.join(sessions_dir, 'Session_13370000000000000')
+            expected = make_session_file(path, n)
+            tabs = read_session_tabs(path)
+            assert [(t['url'], t['title']) for t in tabs] == expected, 'open tabs differ'
+
+            parse_ms = best_ms(lambda: read_session_tabs(path), runs)
+            cache = SessionTabsCache(sessions_dir, cache_dir=tmp)
+            cache.tabs()
+            memory_ms = best_ms(cache.tabs, runs)
+            disk_ms = best_ms(lambda: SessionTabsCache(sessions_dir, cache_dir=tmp).tabs(), runs)
+            print(f"{n:>7} {len(tabs):>6} {os.path.getsize(path) / 1024:>9.0f} {parse_ms:>9.2f} "
+                  f"{memory_ms:>10.3f} {disk_ms:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+End-to-end latency benchmark suite.
+
+For each bookmark count, lays out a fake HOME with generated Bookmarks and
+History files and measures, with p50/p95/p99 over many runs:
+
+  search       BookmarkManager.search_bookmarks, in process
+  tabs         BookmarkManager.get_open_tabs, in process
+  create       BookmarkManager.create_bookmark, in process
+  main         a full `bookmark_manager.py search <query>` process
+  burst        a typed query replayed keystroke by keystroke through
+               bookmark_client.py the way Alfred runs a Script Filter with
+               a queue delay and "terminate previous script"; the latency
+               is from the last keystroke to the final output
+
+"cold" runs start with an empty workflow cache (no snapshot, History
+mirror or frecency scores), "warm" runs reuse what earlier runs built.
+
+Results are written as JSON; pass --compare to diff against a previous
+run and fail on regressions.
+
+Usage: benchmarks/bench_suite.py [--sizes 1000,10000] [--runs 20]
+           [--output results.json] [--compare baseline.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, SRC_DIR)
+
+from fixtures import make_home
+
+QUERIES = ['git', 'kubectl-rollout', 'café', 'py', 'zzqx', 'docs api']
+
+# What a user types in the burst replay, and how fast
+BURST_QUERY = 'kube docs'
+DEFAULT_TYPING_INTERVAL = 0.08
+
+# Alfred's Script Filter queue delay; 0 is "immediately after each character"
+DEFAULT_QUEUE_DELAY = 0.0
+
+# A result is a regression when its p50 or p95 grows by more than this factor
+DEFAULT_REGRESSION_THRESHOLD = 1.25
+
+
+def percentile(samples: list, pct: float) -> float:
+    """
+    Nearest-rank percentile of samples
+    """
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(samples_ms: list) -> dict:
+    return {
+        'n': len(samples_ms),
+        'min': min(samples_ms),
+        'p50': percentile(samples_ms, 50),
+        'p95': percentile(samples_ms, 95),
+        'p99': percentile(samples_ms, 99),
+        'max': max(samples_ms),
+        'mean': sum(samples_ms) / len(samples_ms),
+    }
+
+
+class Environment:
+    """
+    A fake HOME with generated Chrome data, a private workflow cache and a
+    private daemon socket directory, applied to this process and to the
+    subprocesses it starts
+    """
+
+    def __init__(self, n_bookmarks: int):
+        self.root = tempfile.mkdtemp(prefix='bench-suite-')
+        self.home = os.path.join(self.root, 'home')
+        self.cache = os.path.join(self.root, 'cache')
+        self.tmp = os.path.join(self.root, 'tmp')
+        os.makedirs(self.tmp)
+        make_home(self.home, n_bookmarks)
+        self.env = dict(os.environ, HOME=self.home, alfred_workflow_cache=self.cache,
+                        TMPDIR=self.tmp)
+        self.env.pop('BM_DAEMON', None)
+
+    def apply(self):
+        os.environ.update(HOME=self.home, alfred_workflow_cache=self.cache, TMPDIR=self.tmp)
+        os.environ.pop('BM_DAEMON', None)
+
+    def clear_cache(self):
+        # A source that missed its deadline may still be filling the cache
+        for thread in threading.enumerate():
+            if thread.daemon:
+                thread.join()
+        shutil.rmtree(self.cache, ignore_errors=True)
+
+    def remove(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def time_calls(env: Environment, fn, runs: int, cold: bool) -> list:
+    """
+    Time fn(manager) runs times. Cold runs get an empty cache and a new
+    BookmarkManager, as the first keystroke after a change does.
+    """
+    from bookmark_manager import BookmarkManager
+
+    samples = []
+    manager = BookmarkManager()
+    for i in range(runs):
+        if cold:
+            env.clear_cache()
+            manager = BookmarkManager()
+        start = time.perf_counter()
+        fn(manager, i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def time_processes(env: Environment, args: list, runs: int, cold: bool) -> list:
+    """
+    Time runs invocations of a workflow script in a fresh interpreter
+    """
+    samples = []
+    for _ in range(runs):
+        if cold:
+            env.clear_cache()
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=SRC_DIR, env=env.env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def replay_burst(env: Environment, query: str, typing_interval: float,
+                 queue_delay: float) -> float:
+    """
+    Type query one character every typing_interval seconds and drive
+    bookmark_client.py the way Alfred drives a Script Filter: a keystroke
+    runs the script queue_delay later unless another keystroke came first,
+    terminating the previous run. Get the milliseconds from the last
+    keystroke until the final run finished.
+    """
+    script = [sys.executable, 'bookmark_client.py', 'search']
+    start = time.perf_counter()
+    running = None
+    for i in range(1, len(query) + 1):
+        keystroke = start + (i - 1) * typing_interval
+        launch_at = keystroke + queue_delay
+        if i < len(query) and launch_at >= keystroke + typing_interval:
+            # The next keystroke arrives first and restarts the delay
+            continue
+        time.sleep(max(0.0, launch_at - time.perf_counter()))
+        if running is not None and running.poll() is None:
+            running.terminate()
+            running.wait()
+        running = subprocess.Popen(script + [query[:i]], cwd=SRC_DIR, env=env.env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    running.wait()
+    return (time.perf_counter() - keystroke) * 1000
+
+
+def run_size(n: int, runs: int, typing_interval: float, queue_delay: float) -> dict:
+    env = Environment(n)
+    env.apply()
+    results = {}
+    try:
+        cold_runs = max(3, runs // 5)
+        for temperature, count in (('cold', cold_runs), ('warm', runs)):
+            cold = temperature == 'cold'
+            results[f'search/{temperature}'] = time_calls(
+                env, lambda m, i: m.search_bookmarks(QUERIES[i % len(QUERIES)]), count, cold)
+            results[f'tabs/{temperature}'] = time_calls(
+                env, lambda m, i: m.get_open_tabs(), count, cold)
+            results[f'main/{temperature}'] = time_processes(
+                env, ['bookmark_manager.py', 'search', 'git'], count, cold)
+        results['burst/warm'] = [
+            replay_burst(env, BURST_QUERY, typing_interval, queue_delay)
+            for _ in range(max(3, runs // 5))
+        ]
+        # Last, since every created bookmark invalidates the snapshot
+        results['create/warm'] = time_calls(
+            env, lambda m, i: m.create_bookmark(
+                f'https://bench.example.com/{i}', 'Bench/Created', f'Bench {i}'),
+            runs, False)
+    finally:
+        env.remove()
+    return {name: summarize(samples) for name, samples in results.items()}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Print p50/p95 ratios against a baseline run and get the regressions
+    """
+    regressions = []
+    print(f"\n{'benchmark':>28} {'p50 ratio':>10} {'p95 ratio':>10}")
+    for size, benches in results['results'].items():
+        for name, stats in benches.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if not base:
+                continue
+            ratios = [stats[p] / base[p] if base[p] else 1.0 for p in ('p50', 'p95')]
+            flag = ' REGRESSION' if max(ratios) > threshold else ''
+            print(f"{size + ' ' + name:>28} {ratios[0]:>9.2f}x {ratios[1]:>9.2f}x{flag}")
+            if flag:
+                regressions.append(f"{size} {name}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='1000,10000',
+                        help='comma-separated bookmark counts, e.g. 1000,100000,1000000')
+    parser.add_argument('--runs', type=int, default=20, help='warm runs per benchmark')
+    parser.add_argument('--typing-interval', type=float, default=DEFAULT_TYPING_INTERVAL)
+    parser.add_argument('--queue-delay', type=float, default=DEFAULT_QUEUE_DELAY)
+    parser.add_argument('--output', help='results file (default bench-<revision>.json)')
+    parser.add_argument('--compare', help='baseline results file to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    revision = git_revision()
+    results = {
+        'revision': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'runs': args.runs,
+        'typing_interval': args.typing_interval,
+        'queue_delay': args.queue_delay,
+        'results': {},
+    }
+    print(f"{'benchmark':>28} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for n in (int(s) for s in args.sizes.split(',')):
+        benches = run_size(n, args.runs, args.typing_interval, args.queue_delay)
+        results['results'][str(n)] = benches
+        for name, stats in benches.items():
+            print(f"{str(n) + ' ' + name:>28} {stats['p50']:>9.2f} {stats['p95']:>9.2f} "
+                  f"{stats['p99']:>9.2f}")
+
+    output = args.output or f'bench-{revision}.json'
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nwrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"FAIL: {regression} regressed more than {args.threshold:.2f}x")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
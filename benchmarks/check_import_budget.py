@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Startup budget regression check based on python -X importtime.
+
+Imports each workflow entry point in a fresh interpreter and fails if a
+module that only some commands need (sqlite3, shlex, urllib.parse, ...)
+is loaded eagerly, or if the cumulative import time exceeds the budget.
+
+Usage: benchmarks/check_import_budget.py [budget_ms]
+"""
+
+import os
+import sys
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Entry points Alfred launches on every keystroke
+ENTRY_POINTS = ['alfred_wrapper', 'bookmark_client', 'bookmark_manager']
+
+# Modules that must only be imported on the paths that need them
+LAZY_MODULES = ['sqlite3', 'shlex', 'urllib.parse', 'subprocess', 'tempfile', 'hashlib']
+
+# Cumulative import time allowed per entry point, in milliseconds
+DEFAULT_BUDGET_MS = 60.0
+
+# Fresh interpreters per entry point; the fastest run is compared to the
+# budget so a noisy machine does not cause false failures
+RUNS = 5
+
+
+def import_times(module: str):
+    """
+    Get {module: cumulative_us} for a fresh import of module
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SRC_DIR, capture_output=True, text=True,
+        env=dict(os.environ, HOME=os.environ.get('HOME', '/tmp'))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS
+    failures = []
+    for entry in ENTRY_POINTS:
+        runs = [import_times(entry) for _ in range(RUNS)]
+        times = min(runs, key=lambda t: t.get(entry, 0))
+        total_ms = times.get(entry, 0) / 1000
+        eager = [m for m in LAZY_MODULES if m in times]
+        print(f"{entry:>18}: {total_ms:6.1f} ms cumulative"
+              + (f", eager: {', '.join(eager)}" if eager else ''))
+        if eager:
+            failures.append(f"{entry} eagerly imports {', '.join(eager)}")
+        if total_ms > budget_ms:
+            failures.append(f"{entry} import took {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
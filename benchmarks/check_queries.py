@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Query compiler regression check against a generated Chrome profile.
+
+Runs each query through search_results with the index backend and, where
+SQLite has FTS5, the full-text backend, and fails if either returns a
+different number of results than expected. Covers the fuzzy fallback:
+it corrects a misspelled term, but must not run when the terms matched
+and an exclusion or field filter removed every hit.
+
+Usage: benchmarks/check_queries.py [n_bookmarks]
+"""
+
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fixtures import make_home
+
+DEFAULT_BOOKMARKS = 2000
+
+# (query, whether it should find anything, backends to check)
+CASES = [
+    ('git', True, ('index', 'fts')),
+    ('git -git', False, ('index', 'fts')),
+    ('git site:nomatch.invalid', False, ('index', 'fts')),
+    ('git title:zzqx', False, ('index', 'fts')),
+    ('-git git', False, ('index', 'fts')),
+    # Misspelled: only the index matches fuzzily
+    ('gti', True, ('index',)),
+    # The fallback keeps the exclusions: every fuzzy match of 'gti' has a 'g'
+    ('gti -g', False, ('index',)),
+]
+
+
+def fts5_available() -> bool:
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE t USING fts5(x)')
+    except sqlite3.Error:
+        return False
+    return True
+
+
+def count(manager, query: str, backend: str) -> int:
+    if backend == 'fts':
+        os.environ['BM_SEARCH_BACKEND'] = 'fts'
+    else:
+        os.environ.pop('BM_SEARCH_BACKEND', None)
+    return len(manager.search_results(query))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BOOKMARKS
+    root = tempfile.mkdtemp(prefix='check-queries-')
+    failures = []
+    try:
+        os.environ.update(HOME=os.path.join(root, 'home'),
+                          alfred_workflow_cache=os.path.join(root, 'cache'))
+        make_home(os.environ['HOME'], n)
+        from bookmark_manager import BookmarkManager
+
+        manager = BookmarkManager()
+        backends = ['index'] + (['fts'] if fts5_available() else [])
+        print(f"{'query':>26} " + ' '.join(f'{backend:>6}' for backend in backends))
+        for query, found, checked in CASES:
+            counts = []
+            for backend in backends:
+                got = count(manager, query, backend)
+                counts.append(f'{got:>6}' if backend in checked else f'{"-":>6}')
+                if backend in checked and bool(got) != found:
+                    failures.append(f"{query!r} on {backend}: {got} results, expected "
+                                    f"{'some' if found else 'none'}")
+            print(f"{query:>26} " + ' '.join(counts))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Bookmark source regression check against generated browser stores.
+
+Lays out a fake HOME with Chromium, Brave, Edge and Arc profiles behind
+Local State files, a Firefox places.sqlite and a Safari Bookmarks.plist,
+runs discovery and each source's load, and fails if a source is missing,
+found out of order, or loads different bookmarks than were written. Also
+prints each source's cold (no snapshot) and warm load time.
+
+Usage: benchmarks/check_sources.py [n_bookmarks]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fixtures import make_browsers_home
+
+DEFAULT_BOOKMARKS = 2000
+
+
+def load_ms(source) -> float:
+    start = time.perf_counter()
+    source.load_index()
+    return (time.perf_counter() - start) * 1000
+
+
+def loaded(source):
+    """
+    Get what a source's index holds in the form its fixture describes it
+    """
+    index = source.load_index()
+    if source.browser in ('firefox', 'safari'):
+        return sorted((index.titles[i], index.urls[i], index.folders[i]) for i in index.order)
+    return {index.urls[i] for i in index.order}
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BOOKMARKS
+    root = tempfile.mkdtemp(prefix='check-sources-')
+    failures = []
+    try:
+        home = os.path.join(root, 'home')
+        os.environ.update(HOME=home, alfred_workflow_cache=os.path.join(root, 'cache'))
+        expected = make_browsers_home(home, n)
+
+        from chrome_profiles import discover_chromium_profiles
+        from firefox_source import discover_firefox_profiles
+        from safari_source import discover_safari
+
+        chromium = discover_chromium_profiles(home)
+        # Chrome isn't installed here, so it only contributes its Default profile
+        found = [str(source) for source in chromium if source.browser != 'chrome']
+        wanted = [name for name in expected if not name.startswith(('firefox:', 'safari:'))]
+        if found != wanted:
+            failures.append(f"Chromium-family profiles {found}, expected {wanted}")
+        sources = chromium + discover_firefox_profiles(home) + discover_safari(home)
+
+        print(f"{'source':>26} {'bookmarks':>10} {'cold ms':>8} {'warm ms':>8}")
+        for source in sources:
+            name = str(source)
+            if name not in expected:
+                continue
+            cold_ms = load_ms(source)
+            warm_ms = load_ms(source)
+            got = loaded(source)
+            want = expected[name]
+            if not isinstance(want, set):
+                want = sorted(want)
+            if got != want:
+                failures.append(f"{name} loaded {len(got)} bookmarks differing from the "
+                                f"{len(want)} written")
+            print(f"{name:>26} {len(got):>10} {cold_ms:>8.1f} {warm_ms:>8.2f}")
+        missing = set(expected) - {str(source) for source in sources}
+        if missing:
+            failures.append(f"sources not discovered: {', '.join(sorted(missing))}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
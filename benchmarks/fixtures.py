@@ -0,0 +1,515 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic browser data for the benchmarks: Chrome Bookmarks JSON with
+deep folder trees and Unicode titles, History databases with urls and
+visits, a fake HOME laid out the way the workflow expects, and the stores
+of the other sources (Chromium-family profiles behind a Local State file,
+Firefox's places.sqlite, Safari's Bookmarks.plist).
+
+Everything is generated from a seed, so the same arguments always give
+the same files.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import struct
+import sqlite3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from bookmark_writer import compute_checksum
+from chrome_tab_manager import chrome_time
+from chrome_profiles import CHROMIUM_BROWSERS
+from firefox_source import FIREFOX_PROFILES_DIR
+from safari_source import SAFARI_BOOKMARKS_PATH
+
+CHROME_PROFILE_DIR = 'Library/Application Support/Google/Chrome/Default'
+
+# Mostly ASCII, like real bookmark titles, with accented, CJK, Cyrillic
+# and emoji words mixed in
+WORDS = (
+    'git hub docs kube infra python rust deploy review search index tree '
+    'cluster metrics alert billing roadmap design notes wiki api guide '
+    'release dashboard oncall runbook blog recipe travel music news'
+).split()
+UNICODE_WORDS = 'café naïve résumé Zürich São 東京 検索 中文 привет 📚 🚀'.split()
+FOLDER_WORDS = 'Work Projects Reading Tools Reference Archive Personal Team Infra Docs'.split()
+
+# Words that appear in the same number of entries whatever the size, so
+# index benchmarks see constant-selectivity needles
+NEEDLE = 'kubectl-rollout'
+
+
+def synthetic_bookmarks(n: int, seed: int = 1):
+    """
+    Generate n bookmark titles/urls with a long tail of rare tokens
+    """
+    rng = random.Random(seed)
+    titles, urls = [], []
+    for i in range(n):
+        words = [rng.choice(WORDS) for _ in range(3)]
+        token = '%x' % rng.getrandbits(32)
+        titles.append(' '.join(words).title() + ' ' + token)
+        urls.append(f'https://{words[0]}.example.com/{words[1]}/{token}')
+    # A handful of needles whose frequency stays constant as n grows
+    for i in range(0, n, max(1, n // 10)):
+        titles[i] = f'{NEEDLE} cheatsheet'
+    return titles, urls
+
+
+def random_title(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(2, 6))]
+    if rng.random() < 0.15:
+        words[rng.randrange(len(words))] = rng.choice(UNICODE_WORDS)
+    return ' '.join(words).capitalize()
+
+
+def random_url(rng: random.Random, domains: int) -> str:
+    # Popular domains get most bookmarks, as in real collections
+    domain = f'{rng.choice(WORDS)}{int(rng.paretovariate(1.2)) % domains}.example.com'
+    path = '/'.join(rng.choice(WORDS) for _ in range(rng.randint(0, 4)))
+    return f'https://{domain}/{path}?id={rng.getrandbits(24):x}'
+
+
+def make_bookmarks(path: str, n: int, seed: int = 1, max_depth: int = 8,
+                   entries_per_folder: int = 20) -> list:
+    """
+    Write a Chrome Bookmarks file with n url bookmarks spread over a random
+    folder tree up to max_depth deep, and return the bookmarked urls
+    """
+    rng = random.Random(seed)
+    next_id = [4]
+    added = chrome_time(time.time() - 365 * 86400)
+
+    def new_node(node_type: str, name: str, **fields):
+        node = {
+            'date_added': str(added + next_id[0]),
+            'guid': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'id': str(next_id[0]),
+            'name': name,
+            'type': node_type,
+        }
+        node.update(fields)
+        next_id[0] += 1
+        return node
+
+    roots = {
+        'bookmark_bar': {'children': [], 'id': '1', 'name': 'Bookmarks bar', 'type': 'folder'},
+        'other': {'children': [], 'id': '2', 'name': 'Other bookmarks', 'type': 'folder'},
+        'synced': {'children': [], 'id': '3', 'name': 'Mobile bookmarks', 'type': 'folder'},
+    }
+    folders = [(roots['bookmark_bar'], 0), (roots['other'], 0)]
+    for _ in range(max(1, n // entries_per_folder)):
+        parent, depth = rng.choice(folders)
+        if depth >= max_depth:
+            parent, depth = folders[0]
+        folder = new_node('folder', f'{rng.choice(FOLDER_WORDS)} {rng.choice(WORDS)}',
+                          children=[], date_modified=str(added))
+        parent['children'].append(folder)
+        folders.append((folder, depth + 1))
+
+    domains = max(10, n // 10)
+    urls = []
+    for _ in range(n):
+        url = random_url(rng, domains)
+        folder, _ = rng.choice(folders)
+        folder['children'].append(new_node('url', random_title(rng), url=url))
+        urls.append(url)
+    for i in range(0, n, max(1, n // 10)):
+        roots['synced']['children'].append(
+            new_node('url', f'{NEEDLE} cheatsheet', url=f'https://kubernetes.io/docs/{i}'))
+
+    document = {
+        'checksum': compute_checksum(roots),
+        'roots': roots,
+        'version': 1,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False)
+    return urls
+
+
+def make_local_state(chrome_dir: str, profiles: dict, last_active: list = ()):
+    """
+    Write a Chromium Local State file listing profiles ({directory name:
+    display name}), with last_active as the most recently used ones
+    """
+    state = {
+        'profile': {
+            'info_cache': {dir_name: {'name': name} for dir_name, name in profiles.items()},
+            'profiles_order': list(profiles),
+            'last_active_profiles': list(last_active),
+        }
+    }
+    os.makedirs(chrome_dir, exist_ok=True)
+    with open(os.path.join(chrome_dir, 'Local State'), 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+
+
+def make_chromium_profiles(home: str, n: int, seed: int = 1, profiles_per_browser: int = 2,
+                           browsers: list = None) -> dict:
+    """
+    Lay out the user data directories of Chromium-family browsers under
+    home, each with profiles_per_browser profiles of n bookmarks and a
+    Local State naming them, the last profile most recently used. Chrome
+    is left out unless named in browsers. Returns {'browser:profile name':
+    set of bookmarked urls}, in the order discovery should find them.
+    """
+    if browsers is None:
+        browsers = [browser for browser, _ in CHROMIUM_BROWSERS if browser != 'chrome']
+    expected = {}
+    for browser, relative_dir in CHROMIUM_BROWSERS:
+        if browser not in browsers:
+            continue
+        chrome_dir = os.path.join(home, relative_dir)
+        names = {}
+        urls = {}
+        for k in range(profiles_per_browser):
+            dir_name = 'Default' if k == 0 else f'Profile {k}'
+            names[dir_name] = f'{browser.title()} {k}'
+            seed += 1
+            urls[dir_name] = set(make_bookmarks(os.path.join(chrome_dir, dir_name, 'Bookmarks'),
+                                                n, seed))
+            urls[dir_name].update(f'https://kubernetes.io/docs/{i}'
+                                  for i in range(0, n, max(1, n // 10)))
+        last = list(names)[-1]
+        make_local_state(chrome_dir, names, last_active=[last])
+        # The most recently used profile first, then the rest in order
+        for dir_name in [last] + [d for d in names if d != last]:
+            expected[f'{browser}:{names[dir_name]}'] = urls[dir_name]
+    return expected
+
+
+def make_places_db(path: str, n: int, seed: int = 1, entries_per_folder: int = 20) -> list:
+    """
+    Create a Firefox places.sqlite with n url bookmarks in a folder tree
+    under the menu, toolbar and other roots, plus what a search must skip:
+    copies of tagged bookmarks under the tags root, place: queries and
+    separators. Returns the (title, url, folder) of each real bookmark.
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE moz_places(id INTEGER PRIMARY KEY, url LONGVARCHAR, title LONGVARCHAR,
+                                guid TEXT UNIQUE);
+        CREATE TABLE moz_bookmarks(id INTEGER PRIMARY KEY, type INTEGER, fk INTEGER DEFAULT NULL,
+                                   parent INTEGER, position INTEGER, title LONGVARCHAR,
+                                   guid TEXT UNIQUE);
+    """)
+    places = {}
+    rows = []
+
+    def place(url: str) -> int:
+        if url not in places:
+            places[url] = len(places) + 1
+            conn.execute("INSERT INTO moz_places(id, url, guid) VALUES (?, ?, ?)",
+                         (places[url], url, f'p{places[url]:011d}'))
+        return places[url]
+
+    def add(kind: int, parent: int, title: str = None, fk: int = None, guid: str = None) -> int:
+        row_id = len(rows) + 1
+        rows.append((row_id, kind, fk, parent, row_id, title, guid or f'b{row_id:011d}'))
+        return row_id
+
+    root = add(2, 0, '', guid='root________')
+    tops = [add(2, root, title, guid=guid) for title, guid in (
+        ('menu', 'menu________'), ('toolbar', 'toolbar_____'), ('unfiled', 'unfiled_____'),
+        ('mobile', 'mobile______'))]
+    tags = add(2, root, 'tags', guid='tags________')
+    tag_folders = [add(2, tags, word) for word in WORDS[:5]]
+
+    # (row id, path below the top-level folders)
+    folders = [(top, '') for top in tops]
+    for _ in range(max(1, n // entries_per_folder)):
+        parent, path = rng.choice(folders)
+        name = f'{rng.choice(FOLDER_WORDS)} {rng.choice(WORDS)}'
+        folders.append((add(2, parent, name), f'{path}/{name}' if path else name))
+
+    expected = []
+    domains = max(10, n // 10)
+    for k in range(n):
+        url = random_url(rng, domains)
+        parent, path = rng.choice(folders)
+        # Firefox stores no title for some bookmarks; the url stands in
+        title = random_title(rng) if rng.random() < 0.95 else None
+        add(1, parent, title, place(url))
+        expected.append((title or url, url, path))
+        if rng.random() < 0.1:
+            add(1, rng.choice(tag_folders), None, place(url))
+        if k % 50 == 0:
+            add(3, parent)
+    add(1, tops[0], 'Most visited', place('place:sort=8&maxResults=10'))
+
+    conn.executemany("INSERT INTO moz_bookmarks VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return expected
+
+
+def make_safari_plist(path: str, n: int, seed: int = 1, entries_per_folder: int = 20,
+                      binary: bool = True) -> list:
+    """
+    Write a Safari Bookmarks.plist with n bookmarks in folders under the
+    Favorites bar and the bookmarks menu, plus a Reading List entry.
+    Returns the (title, url, folder) of each bookmark.
+    """
+    import plistlib
+
+    rng = random.Random(seed)
+
+    def new_list(title: str) -> dict:
+        return {'WebBookmarkType': 'WebBookmarkTypeList', 'Title': title, 'Children': [],
+                'WebBookmarkUUID': str(uuid.UUID(int=rng.getrandbits(128), version=4))}
+
+    def leaf(title: str, url: str) -> dict:
+        return {'WebBookmarkType': 'WebBookmarkTypeLeaf', 'URLString': url,
+                'URIDictionary': {'title': title},
+                'WebBookmarkUUID': str(uuid.UUID(int=rng.getrandbits(128), version=4))}
+
+    root = new_list('')
+    bar, menu, reading = new_list('BookmarksBar'), new_list('BookmarksMenu'), \
+        new_list('com.apple.ReadingList')
+    root['Children'] = [bar, menu, reading]
+    folders = [(bar, ''), (menu, '')]
+    for _ in range(max(1, n // entries_per_folder)):
+        parent, folder_path = rng.choice(folders)
+        name = f'{rng.choice(FOLDER_WORDS)} {rng.choice(WORDS)}'
+        folder = new_list(name)
+        parent['Children'].append(folder)
+        folders.append((folder, f'{folder_path}/{name}' if folder_path else name))
+
+    expected = []
+    domains = max(10, n // 10)
+    for _ in range(n):
+        url = random_url(rng, domains)
+        title = random_title(rng)
+        parent, folder_path = rng.choice(folders)
+        parent['Children'].append(leaf(title, url))
+        expected.append((title, url, folder_path))
+    reading['Children'].append(leaf('Saved for later', 'https://news.example.com/later'))
+    expected.append(('Saved for later', 'https://news.example.com/later', ''))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        plistlib.dump(root, f, fmt=plistlib.FMT_BINARY if binary else plistlib.FMT_XML)
+    return expected
+
+
+def make_history_db(path: str, n_urls: int, seed: int = 1, visits_per_url: int = 3,
+                    bookmarked: list = (), padding: int = 0, days: int = 90):
+    """
+    Create a History-like database with n_urls urls (bookmarked ones
+    first) and about visits_per_url visits each over the last days; a few
+    visits fall in the last hour, so there are open tabs to show
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE urls(id INTEGER PRIMARY KEY, url LONGVARCHAR, title LONGVARCHAR,
+                          visit_count INTEGER DEFAULT 0 NOT NULL,
+                          typed_count INTEGER DEFAULT 0 NOT NULL,
+                          last_visit_time INTEGER NOT NULL, hidden INTEGER DEFAULT 0 NOT NULL);
+        CREATE INDEX urls_url_index ON urls (url);
+        CREATE TABLE visits(id INTEGER PRIMARY KEY, url INTEGER NOT NULL,
+                            visit_time INTEGER NOT NULL, from_visit INTEGER,
+                            transition INTEGER DEFAULT 0 NOT NULL);
+        CREATE INDEX visits_url_index ON visits (url);
+        CREATE INDEX visits_time_index ON visits (visit_time);
+    """)
+    now = chrome_time(time.time())
+    span = days * 86400 * 1000000
+    pad = 'x' * padding
+    url_rows, visit_rows = [], []
+
+    def flush():
+        conn.executemany(
+            "INSERT INTO urls(id, url, title, visit_count, typed_count, last_visit_time) "
+            "VALUES (?, ?, ?, ?, ?, ?)", url_rows)
+        conn.executemany(
+            "INSERT INTO visits(url, visit_time, transition) VALUES (?, ?, ?)", visit_rows)
+        url_rows.clear()
+        visit_rows.clear()
+
+    bookmarked = list(bookmarked)
+    for url_id in range(1, n_urls + 1):
+        if url_id <= len(bookmarked):
+            url = bookmarked[url_id - 1]
+        else:
+            url = f'https://site{rng.randrange(5000)}.example.com/{url_id}/{pad}'
+        count = rng.randint(0, 2 * visits_per_url) if visits_per_url else 0
+        times = sorted(now - rng.randrange(span) for _ in range(count))
+        if rng.random() < 0.001:
+            times.append(now - rng.randrange(3600 * 1000000))
+        typed = 0
+        for visit_time in times:
+            transition = 1 if rng.random() < 0.2 else 0
+            typed += transition
+            visit_rows.append((url_id, visit_time, transition))
+        last_visit = times[-1] if times else now - rng.randrange(span)
+        url_rows.append((url_id, url, f'Page {url_id} {pad[:rng.randrange(60)]}',
+                         len(times), typed, last_visit))
+        if len(url_rows) >= 10000:
+            flush()
+    flush()
+    conn.commit()
+    conn.close()
+
+
+def make_favicons_db(path: str, page_urls: list, seed: int = 1, coverage: float = 0.8):
+    """
+    Create a Favicons-like database mapping about coverage of page_urls to
+    their host's icon, each icon stored as 16px and 32px bitmaps
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE favicons(id INTEGER PRIMARY KEY, url LONGVARCHAR NOT NULL,
+                              icon_type INTEGER DEFAULT 1);
+        CREATE TABLE favicon_bitmaps(id INTEGER PRIMARY KEY, icon_id INTEGER NOT NULL,
+                                     last_updated INTEGER DEFAULT 0, image_data BLOB,
+                                     width INTEGER DEFAULT 0, height INTEGER DEFAULT 0,
+                                     last_requested INTEGER DEFAULT 0);
+        CREATE INDEX favicon_bitmaps_icon_id ON favicon_bitmaps(icon_id);
+        CREATE TABLE icon_mapping(id INTEGER PRIMARY KEY, page_url LONGVARCHAR NOT NULL,
+                                  icon_id INTEGER);
+        CREATE INDEX icon_mapping_page_url_idx ON icon_mapping(page_url);
+    """)
+    icons = {}
+    mappings = []
+    for url in page_urls:
+        if rng.random() >= coverage:
+            continue
+        host = url.split('/')[2]
+        if host not in icons:
+            icon_id = icons[host] = len(icons) + 1
+            conn.execute("INSERT INTO favicons(id, url) VALUES (?, ?)",
+                         (icon_id, f'https://{host}/favicon.ico'))
+            for width in (16, 32):
+                image = b'\x89PNG\r\n\x1a\n' + f'{host} {width}'.encode() + bytes(rng.getrandbits(8) for _ in range(64))
+                conn.execute("INSERT INTO favicon_bitmaps(icon_id, image_data, width, height) "
+                             "VALUES (?, ?, ?, ?)", (icon_id, image, width, width))
+        mappings.append((url, icons[host]))
+    conn.executemany("INSERT INTO icon_mapping(page_url, icon_id) VALUES (?, ?)", mappings)
+    conn.commit()
+    conn.close()
+
+
+def pickle_string(text: str, wide: bool = False) -> bytes:
+    """
+    Encode a base::Pickle string field, padded to 4 bytes
+    """
+    data = text.encode('utf-16-le' if wide else 'utf-8')
+    field = struct.pack('<i', len(data) // 2 if wide else len(data)) + data
+    return field + b'\0' * (-len(field) % 4)
+
+
+def snss_command(command: int, payload: bytes) -> bytes:
+    return struct.pack('<HB', len(payload) + 1, command) + payload
+
+
+def navigation_command(tab_id: int, index: int, url: str, title: str) -> bytes:
+    """
+    An UpdateTabNavigation command: a pickle of tab id, navigation index,
+    url, title and the start of the fields Chrome writes after them
+    """
+    body = (struct.pack('<ii', tab_id, index) + pickle_string(url)
+            + pickle_string(title, wide=True) + pickle_string('page-state' * 8)
+            + struct.pack('<ii', 0, 0))
+    return snss_command(6, struct.pack('<I', len(body)) + body)
+
+
+def make_session_file(path: str, n_tabs: int, urls: list = (), seed: int = 1,
+                      navigations: int = 8, closed: float = 0.5) -> list:
+    """
+    Write an SNSS session log in which n_tabs tabs over a few windows
+    navigate back and forth, then about a closed share of them (and one
+    window) are closed, as a long-running Chrome would leave it. Returns
+    the (url, title) of the tabs left open, most recently active first.
+    """
+    rng = random.Random(seed)
+    urls = list(urls) or [f'https://tab{i}.example.com/' for i in range(n_tabs)]
+    out = [b'SNSS', struct.pack('<i', 3)]
+    windows = [1, 2, 3]
+    expected = {}
+    active_at = chrome_time(time.time() - 86400)
+    for n in range(n_tabs):
+        tab_id = 100 + n
+        window = rng.choice(windows)
+        out.append(snss_command(0, struct.pack('<ii', window, tab_id)))
+        out.append(snss_command(2, struct.pack('<ii', tab_id, n)))
+        history = []
+        for index in range(rng.randint(1, navigations)):
+            url = rng.choice(urls) + f'#{index}'
+            title = f'{random_title(rng)} {n}.{index}'
+            history.append((url, title))
+            out.append(navigation_command(tab_id, index, url, title))
+            out.append(snss_command(7, struct.pack('<ii', tab_id, index)))
+        # Go back a few pages, then prune the forward history
+        selected = rng.randrange(len(history))
+        out.append(snss_command(7, struct.pack('<ii', tab_id, selected)))
+        if selected + 1 < len(history) and rng.random() < 0.5:
+            pruned = len(history) - selected - 1
+            out.append(snss_command(24, struct.pack('<iii', tab_id, selected + 1, pruned)))
+        active_at += rng.randrange(1, 60000000)
+        out.append(snss_command(21, struct.pack('<i4xq', tab_id, active_at)))
+        if rng.random() < closed:
+            out.append(snss_command(16, struct.pack('<i4xq', tab_id, active_at)))
+        else:
+            expected[tab_id] = (active_at, window, history[selected])
+    out.append(snss_command(17, struct.pack('<i4xq', windows[-1], active_at)))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b''.join(out))
+    open_tabs = sorted((-at, tab_id, entry) for tab_id, (at, window, entry) in expected.items()
+                       if window != windows[-1])
+    return [entry for _, _, entry in open_tabs]
+
+
+def make_home(home: str, n_bookmarks: int, n_history: int = None, seed: int = 1):
+    """
+    Lay out a fake HOME with a Chrome Default profile holding a Bookmarks
+    file of n_bookmarks, a History database (by default twice as many
+    urls, half of the bookmarks among them), a Favicons database and a
+    session log with open tabs
+    """
+    profile_dir = os.path.join(home, CHROME_PROFILE_DIR)
+    urls = make_bookmarks(os.path.join(profile_dir, 'Bookmarks'), n_bookmarks, seed)
+    if n_history is None:
+        n_history = 2 * n_bookmarks
+    make_history_db(os.path.join(profile_dir, 'History'), n_history, seed,
+                    bookmarked=urls[::2])
+    make_favicons_db(os.path.join(profile_dir, 'Favicons'), urls, seed)
+    session = f'Session_{chrome_time(time.time())}'
+    make_session_file(os.path.join(profile_dir, 'Sessions', session), 60, urls, seed)
+    return profile_dir
+
+
+def make_browsers_home(home: str, n_bookmarks: int, seed: int = 1) -> dict:
+    """
+    Lay out a fake HOME for every source besides Chrome: two profiles of
+    each other Chromium-family browser, a Firefox profile and Safari's
+    bookmarks. Returns {'browser:profile name': expected}, where expected
+    is the set of bookmarked urls for Chromium profiles and the list of
+    (title, url, folder) otherwise.
+    """
+    expected = make_chromium_profiles(home, n_bookmarks, seed)
+    profile_dir = os.path.join(home, FIREFOX_PROFILES_DIR, 'x1y2z3.default-release')
+    expected['firefox:default-release'] = make_places_db(
+        os.path.join(profile_dir, 'places.sqlite'), n_bookmarks, seed)
+    expected['safari:Safari'] = make_safari_plist(
+        os.path.join(home, SAFARI_BOOKMARKS_PATH), n_bookmarks, seed)
+    return expected
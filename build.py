@@ -16,16 +16,38 @@ def create_alfred_workflow():
     # Copy necessary files
     shutil.copy('src/bookmark_manager.py', build_dir)
     shutil.copy('src/chrome_tab_manager.py', build_dir)
+    shutil.copy('src/bookmark_cache.py', build_dir)
+    shutil.copy('src/bookmark_index.py', build_dir)
+    shutil.copy('src/bookmark_ranking.py', build_dir)
+    shutil.copy('src/query_compiler.py', build_dir)
+    shutil.copy('src/bookmark_client.py', build_dir)
+    shutil.copy('src/bookmark_daemon.py', build_dir)
+    shutil.copy('src/alfred_output.py', build_dir)
+    shutil.copy('src/readonly_db.py', build_dir)
+    shutil.copy('src/history_mirror.py', build_dir)
+    shutil.copy('src/frecency.py', build_dir)
+    shutil.copy('src/favicons.py', build_dir)
+    shutil.copy('src/chrome_sessions.py', build_dir)
+    shutil.copy('src/fts_store.py', build_dir)
+    shutil.copy('src/bookmark_writer.py', build_dir)
+    shutil.copy('src/bookmark_import.py', build_dir)
+    shutil.copy('src/bookmark_dedupe.py', build_dir)
+    shutil.copy('src/link_checker.py', build_dir)
+    shutil.copy('src/chrome_profiles.py', build_dir)
+    shutil.copy('src/bookmark_sources.py', build_dir)
+    shutil.copy('src/firefox_source.py', build_dir)
+    shutil.copy('src/safari_source.py', build_dir)
+    shutil.copy('src/instrumentation.py', build_dir)
     
     # Create Alfred script filters
     bm_search_script = '''#!/bin/bash
-python3 bookmark_manager.py search "$1"'''
+python3 bookmark_client.py search "$1"'''
     
     bm_store_script = '''#!/bin/bash
 if [ -z "$1" ]; then
-    python3 bookmark_manager.py tabs
+    python3 bookmark_client.py tabs
 else
-    python3 bookmark_manager.py create "$@"
+    python3 bookmark_client.py create "$@"
 fi'''
     
     # Write script filter files
@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import json
+from typing import Iterable, TextIO
+
+_encode = json.JSONEncoder().encode
+
+
+def item_fragment(title: str, url: str, subtitle: str = None, icon: str = None) -> str:
+    """
+    Encode one Alfred Script Filter item for a url as a JSON fragment
+    """
+    item = {
+        "title": title,
+        "subtitle": url if subtitle is None else subtitle,
+        "arg": url,
+        "text": {
+            "copy": url,
+            "largetype": title
+        }
+    }
+    if icon is not None:
+        item["icon"] = {"path": icon}
+    return _encode(item)
+
+
+def with_icon(fragment: str, icon: str) -> str:
+    """
+    Add an icon file to an encoded item fragment without decoding it
+    """
+    return f'{fragment[:-1]}, "icon": {{"path": {_encode(icon)}}}}}'
+
+
+def message_fragment(title: str, subtitle: str = None) -> str:
+    """
+    Encode a non-actionable Alfred item, e.g. a status or error message
+    """
+    item = {"title": title}
+    if subtitle is not None:
+        item["subtitle"] = subtitle
+    return _encode(item)
+
+
+def write_items(fragments: Iterable[str], out: TextIO):
+    """
+    Stream pre-encoded item fragments to out as one Script Filter response,
+    without building the whole response in memory first
+    """
+    write = out.write
+    write('{"items": [')
+    first = True
+    for fragment in fragments:
+        if not first:
+            write(', ')
+        write(fragment)
+        first = False
+    write(']}\n')
@@ -1,31 +1,19 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
-import os
 import sys
 import json
 import logging
-import subprocess
 
-# Configure logging
-log_dir = os.path.expanduser('~/Library/Logs/MayankBookmarkManager')
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    filename=os.path.join(log_dir, 'alfred_wrapper.log'),
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s: %(message)s'
-)
+from instrumentation import configure_logging
 
 def main():
     """
     Wrapper script for Alfred to handle different commands
     """
-    logging.info("=== Alfred Wrapper Started ===")
-    logging.info(f"Command line arguments: {sys.argv}")
-    
-    # Get the script directory
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    bookmark_manager = os.path.join(script_dir, 'bookmark_manager.py')
+    configure_logging('alfred_wrapper')
+    logging.debug("=== Alfred Wrapper Started ===")
+    logging.debug("Command line arguments: %s", sys.argv)
     
     # Default command is search with no query
     command = 'search'
@@ -34,7 +22,7 @@ def main():
     # Parse arguments
     if len(sys.argv) > 1:
         arg = sys.argv[1]
-        logging.info(f"Argument: {arg}")
+        logging.debug("Argument: %s", arg)
         
         if arg == 'bm':
             command = 'search'
@@ -52,23 +40,26 @@ def main():
             query = arg
     
     # Build command
-    cmd = [bookmark_manager, command]
+    args = [command]
     if query:
-        cmd.append(query)
+        args.append(query)
     
-    logging.info(f"Executing command: {cmd}")
+    logging.debug("Dispatching command: %s", args)
     
     try:
-        # Execute the bookmark manager script
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        logging.info(f"Return code: {result.returncode}")
-        
-        if result.stdout:
-            logging.info(f"Output: {result.stdout[:200]}...")  # Log first 200 chars
-            print(result.stdout)
-        
-        if result.stderr:
-            logging.error(f"Error: {result.stderr}")
+        # Prefer a warm daemon, otherwise run the command in this process
+        from bookmark_client import request
+        output = request(args)
+        if output is not None:
+            sys.stdout.buffer.write(output)
+            sys.stdout.flush()
+            return
+
+        from bookmark_manager import BookmarkManager, finish_late_loads, handle_command
+        handle_command(BookmarkManager(), ['bookmark_manager.py'] + args, sys.stdout)
+        # Answer Alfred first, then let late loads save their snapshots
+        sys.stdout.flush()
+        finish_late_loads()
     except Exception as e:
         logging.error(f"Error executing command: {e}")
         print(json.dumps({
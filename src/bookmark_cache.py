@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import marshal
+import logging
+import zlib
+from typing import Dict, Optional, Tuple, Any
+
+# Alfred bundle id, used to locate the workflow cache directory
+BUNDLE_ID = 'com.mketkar.bookmarkmanager'
+
+# Bump whenever the snapshot layout changes so stale files are rebuilt
+SNAPSHOT_VERSION = 6
+
+
+def get_cache_dir() -> str:
+    """
+    Get the workflow cache directory, creating it if needed.
+    Alfred exports it as alfred_workflow_cache; outside Alfred we fall back
+    to the same location Alfred would use.
+    """
+    cache_dir = os.environ.get('alfred_workflow_cache') or os.path.join(
+        os.path.expanduser('~'),
+        'Library/Caches/com.runningwithcrayons.Alfred/Workflow Data',
+        BUNDLE_ID
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def atomic_write_bytes(path: str, data: bytes, mode: int = None, fsync: bool = False):
+    """
+    Write data to path via a temp file in the same directory plus rename,
+    so readers never observe a partially written file. With fsync the data
+    is on disk before the rename, so a crash cannot leave an empty file.
+    """
+    import tempfile
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def cache_file_path(prefix: str, source_path: str, extension: str = '.marshal',
+                    cache_dir: str = None) -> str:
+    """
+    Get the path of a cache file derived from source_path, named by a
+    hash of it so several profiles can share the cache directory
+    """
+    digest = '%08x' % zlib.crc32(source_path.encode('utf-8'))
+    return os.path.join(cache_dir or get_cache_dir(), f'{prefix}-{digest}{extension}')
+
+
+def read_marshal(path: str, version: int) -> Optional[Dict[str, Any]]:
+    """
+    Read a dict written by write_marshal, or None if the file is missing,
+    unreadable or from another version of its layout
+    """
+    try:
+        # One read: marshal.load on a file reads it piece by piece
+        with open(path, 'rb') as f:
+            data = marshal.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (EOFError, ValueError, TypeError, OSError) as e:
+        logging.warning(f"Discarding unreadable cache file {os.path.basename(path)}: {e}")
+        return None
+    if not isinstance(data, dict) or data.get('version') != version:
+        return None
+    return data
+
+
+def write_marshal(path: str, data: Dict[str, Any]):
+    """
+    Atomically replace path with data, a dict holding its layout 'version'
+    """
+    atomic_write_bytes(path, marshal.dumps(data))
+
+
+class BookmarkSnapshotCache:
+    """
+    On-disk snapshot of the flattened, title-sorted bookmark list.
+
+    The snapshot is a marshal-encoded dict holding parallel title/url lists,
+    their Alfred item fragments, trigram postings, folder paths and folder
+    trie, and the key it was built from: the source file's
+    (mtime_ns, size) and Chrome's checksum. A matching stat means the snapshot
+    can be used without opening the Bookmarks file at all; a matching checksum
+    after a stat change (e.g. the file was touched or rewritten unchanged)
+    lets us skip the tree walk, sort and index build.
+    """
+
+    def __init__(self, source_path: str, cache_dir: str = None):
+        self.source_path = source_path
+        self.cache_dir = cache_dir or get_cache_dir()
+        self.cache_path = cache_file_path('bookmarks', source_path, '.snapshot', self.cache_dir)
+        self._snapshot = None
+
+    def stat_source(self) -> Optional[Tuple[int, int]]:
+        """
+        Get the (mtime_ns, size) key of the source file, or None if missing
+        """
+        try:
+            st = os.stat(self.source_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the stored snapshot regardless of whether it is still fresh
+        """
+        if self._snapshot is None:
+            self._snapshot = read_marshal(self.cache_path, SNAPSHOT_VERSION)
+        return self._snapshot
+
+    def load(self, stat: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+        """
+        Get the snapshot if it was built from a source file with this stat
+        """
+        snapshot = self.read()
+        if snapshot and tuple(snapshot['stat']) == tuple(stat):
+            return snapshot
+        return None
+
+    def load_for_checksum(self, checksum: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the snapshot if it was built from content with this Chrome checksum
+        """
+        snapshot = self.read()
+        if snapshot and checksum and snapshot.get('checksum') == checksum:
+            return snapshot
+        return None
+
+    def save(self, stat: Tuple[int, int], checksum: Optional[str],
+             fields: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Persist a snapshot of the flattened bookmark list and derived fields
+        """
+        snapshot = dict(fields)
+        snapshot.update({
+            'version': SNAPSHOT_VERSION,
+            'stat': tuple(stat),
+            'checksum': checksum or '',
+        })
+        try:
+            write_marshal(self.cache_path, snapshot)
+        except OSError as e:
+            logging.warning(f"Could not write bookmark snapshot: {e}")
+        self._snapshot = snapshot
+        return snapshot
@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Thin Alfred entry point: forwards the command to a running bookmark daemon
+and falls back to running bookmark_manager in-process when there is none.
+Only stdlib modules needed to talk to the socket are imported up front
+(not even typing, hence the plain annotations).
+"""
+
+import os
+import sys
+import socket
+
+# Kept short: macOS limits Unix socket paths to 104 bytes
+SOCKET_PATH = os.path.join(os.environ.get('TMPDIR', '/tmp'), f'bookmark-manager-{os.getuid()}.sock')
+
+# Commands the daemon answers; anything else runs in-process
+DAEMON_ACTIONS = ('search', 'tabs', 'create', 'debug_paths', '(null)')
+
+# Seconds to wait on the daemon before giving up and running in-process
+CONNECT_TIMEOUT = 0.2
+RESPONSE_TIMEOUT = 5.0
+
+
+def encode_request(args: list) -> bytes:
+    """
+    Encode command arguments as one tab-separated request line
+    """
+    fields = [a.replace('\t', ' ').replace('\n', ' ') for a in args]
+    return ('\t'.join(fields) + '\n').encode('utf-8')
+
+
+def decode_request(line: bytes) -> list:
+    """
+    Decode a request line back into command arguments
+    """
+    text = line.decode('utf-8').rstrip('\n')
+    return text.split('\t') if text else []
+
+
+def request(args: list, socket_path: str = SOCKET_PATH):
+    """
+    Send a command to the daemon and return its raw response,
+    or None if no daemon is listening
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(socket_path)
+        sock.settimeout(RESPONSE_TIMEOUT)
+        sock.sendall(encode_request(args))
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        response = b''.join(chunks)
+        return response or None
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+
+def start_daemon():
+    """
+    Launch the daemon detached from this process so later keystrokes hit it
+    """
+    import subprocess
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bookmark_manager.py')
+    subprocess.Popen(
+        [sys.executable, script, 'serve'],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+
+def main():
+    action = sys.argv[1] if len(sys.argv) > 1 else 'search'
+    response = request(sys.argv[1:]) if action in DAEMON_ACTIONS else None
+    if response is not None:
+        sys.stdout.buffer.write(response)
+        sys.stdout.flush()
+        return
+
+    # No daemon: answer this keystroke in-process, optionally spawning one
+    if os.environ.get('BM_DAEMON') == '1':
+        start_daemon()
+    import bookmark_manager
+    bookmark_manager.main()
+
+
+if __name__ == '__main__':
+    main()
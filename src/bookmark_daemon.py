@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import logging
+import socketserver
+from typing import Callable
+
+from bookmark_client import DAEMON_ACTIONS, SOCKET_PATH, decode_request, request
+from alfred_output import message_fragment, write_items
+
+# Exit after this many seconds without a request
+DEFAULT_IDLE_TIMEOUT = 600
+
+
+def get_idle_timeout() -> float:
+    """
+    Get the idle timeout from the BM_DAEMON_IDLE workflow variable
+    """
+    try:
+        return float(os.environ.get('BM_DAEMON_IDLE', DEFAULT_IDLE_TIMEOUT))
+    except ValueError:
+        return DEFAULT_IDLE_TIMEOUT
+
+
+class BookmarkRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handle one request line: tab-separated command arguments in,
+    Alfred JSON streamed back out
+    """
+
+    def handle(self):
+        args = decode_request(self.rfile.readline())
+        action = args[0] if args else 'search'
+        if action == 'ping':
+            self.wfile.write(b'pong')
+            return
+
+        out = io.TextIOWrapper(self.wfile, encoding='utf-8')
+        try:
+            if action not in DAEMON_ACTIONS:
+                write_items([message_fragment(f"Unsupported command: {action}")], out)
+                return
+            try:
+                self.server.handler(self.server.bm_manager, ['bookmark_manager.py'] + args, out)
+            except Exception as e:
+                logging.error(f"Daemon error handling {args}: {e}")
+                write_items([message_fragment(f"Error: {str(e)}")], out)
+        finally:
+            out.flush()
+            out.detach()
+
+
+class BookmarkDaemon(socketserver.UnixStreamServer):
+    """
+    Single-threaded Unix socket server holding a warm BookmarkManager.
+    Requests are served one at a time, so the manager needs no locking.
+    handler is bookmark_manager.handle_command, passed in so the daemon
+    does not re-import the module it was launched from.
+    """
+
+    def __init__(self, bm_manager, handler: Callable, socket_path: str = SOCKET_PATH,
+                 idle_timeout: float = None):
+        self.bm_manager = bm_manager
+        self.handler = handler
+        self.timeout = idle_timeout if idle_timeout is not None else get_idle_timeout()
+        self.idle = False
+        super().__init__(socket_path, BookmarkRequestHandler)
+        os.chmod(socket_path, 0o600)
+
+    def handle_timeout(self):
+        self.idle = True
+
+    def serve_until_idle(self):
+        """
+        Serve requests until none arrives within the idle timeout
+        """
+        while not self.idle:
+            self.handle_request()
+
+
+def serve(bm_manager, handler: Callable, socket_path: str = SOCKET_PATH,
+          idle_timeout: float = None):
+    """
+    Run the bookmark daemon until it has been idle for idle_timeout seconds
+    """
+    if os.path.exists(socket_path):
+        if request(['ping'], socket_path) is not None:
+            logging.info("Bookmark daemon already running")
+            return
+        # Left behind by a daemon that did not shut down cleanly
+        os.remove(socket_path)
+
+    # Warm the index before accepting requests
+    bm_manager.load_sources()
+
+    try:
+        daemon = BookmarkDaemon(bm_manager, handler, socket_path, idle_timeout)
+    except OSError as e:
+        logging.error(f"Could not start bookmark daemon: {e}")
+        return
+
+    logging.info(f"Bookmark daemon listening on {socket_path}")
+    try:
+        daemon.serve_until_idle()
+    finally:
+        daemon.server_close()
+        try:
+            os.remove(socket_path)
+        except OSError:
+            pass
+        logging.info("Bookmark daemon exited")
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from bookmark_index import join_folder
+from bookmark_writer import ROOT_KEYS, BookmarkFile
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = frozenset((
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid',
+    'igshid', '_ga', '_gl', 'ref_src', 'spm',
+))
+TRACKING_PREFIXES = ('utm_',)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def normalize_url(url: str) -> str:
+    """
+    Reduce a url to what identifies the page: http and https are the same,
+    the host is case-insensitive, default ports, trailing slashes, empty
+    fragments and tracking parameters go, and the other parameters are
+    sorted. Urls that aren't http(s) are only stripped of whitespace.
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return url
+
+    host = (parts.hostname or '').rstrip('.')
+    if port is not None and port != DEFAULT_PORTS[scheme]:
+        host = f'{host}:{port}'
+    path = parts.path.rstrip('/')
+    params = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(name)
+    )
+    key = f'//{host}{path}'
+    if params:
+        key += '?' + urlencode(params)
+    if parts.fragment:
+        key += '#' + parts.fragment
+    return key
+
+
+def find_duplicates(bookmarks: Iterable[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """
+    Group bookmarks whose urls normalize the same, in one pass, as
+    {'url', 'exact', 'bookmarks'} dicts: the first bookmark's url, whether
+    every url in the group is identical, and the bookmarks in the order
+    they came. Largest groups first.
+    """
+    groups = {}
+    for bookmark in bookmarks:
+        groups.setdefault(normalize_url(bookmark['url']), []).append(bookmark)
+    duplicates = [
+        {
+            'url': group[0]['url'],
+            'exact': len({b['url'] for b in group}) == 1,
+            'bookmarks': group,
+        }
+        for group in groups.values() if len(group) > 1
+    ]
+    duplicates.sort(key=lambda g: -len(g['bookmarks']))
+    return duplicates
+
+
+def walk_urls(roots: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Get the url bookmarks of a Chrome Bookmarks document depth first from
+    the bookmarks bar, as {'title', 'url', 'folder', 'node'} dicts
+    """
+    stack = [(roots[key], None) for key in reversed(ROOT_KEYS) if key in roots]
+    while stack:
+        node, folder = stack.pop()
+        if node.get('type') == 'url':
+            yield {'title': node.get('name', ''), 'url': node.get('url', ''),
+                   'folder': folder, 'node': node}
+            continue
+        # Root folders are not part of folder paths
+        path = '' if folder is None else join_folder(folder, node.get('name', ''))
+        stack.extend((child, path) for child in reversed(node.get('children', [])))
+
+
+def duplicate_groups(bookmarks: BookmarkFile) -> List[Dict[str, Any]]:
+    """
+    Find the duplicate groups of a loaded Bookmarks file; the first
+    bookmark of each group is the one remove_duplicates keeps
+    """
+    return find_duplicates(walk_urls(bookmarks.roots))
+
+
+def remove_duplicates(bookmarks_path: str) -> Tuple[int, int]:
+    """
+    Keep the first bookmark of every duplicate group in the Bookmarks file,
+    depth first from the bookmarks bar, and remove the others with a single
+    read-modify-write. Returns (groups, bookmarks removed).
+    """
+    bookmarks = BookmarkFile(bookmarks_path).load()
+    groups = duplicate_groups(bookmarks)
+    extra = {id(b['node']) for group in groups for b in group['bookmarks'][1:]}
+    removed = bookmarks.remove(lambda node: id(node) in extra)
+    if removed:
+        bookmarks.save()
+    logging.info(f"Removed {removed} duplicate bookmarks from {os.path.basename(bookmarks_path)} "
+                 f"in {len(groups)} groups")
+    return len(groups), removed
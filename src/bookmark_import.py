@@ -0,0 +1,183 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import csv
+import json
+import logging
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, TextIO, Tuple
+
+from bookmark_writer import BookmarkFile
+
+# Folder (under the bookmarks bar) for entries that don't name one
+DEFAULT_IMPORT_FOLDER = 'Imported'
+
+IMPORT_FORMATS = ('jsonl', 'csv', 'html')
+
+
+def detect_format(path: str) -> str:
+    """
+    Guess the import format from a file name
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.html', '.htm'):
+        return 'html'
+    if ext == '.csv':
+        return 'csv'
+    return 'jsonl'
+
+
+def parse_jsonl(stream: TextIO) -> Iterator[Dict[str, str]]:
+    """
+    Parse one {"url": ..., "title": ..., "folder": ...} object per line;
+    import_entries skips objects without a usable url
+    """
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            logging.warning(f"Skipping invalid JSON on line {line_no}: {e}")
+            continue
+        if isinstance(entry, dict):
+            yield entry
+        else:
+            logging.warning(f"Skipping non-object JSON on line {line_no}")
+
+
+def parse_csv(stream: TextIO) -> Iterator[Dict[str, str]]:
+    """
+    Parse url,title,folder rows; a header row naming the columns is optional
+    """
+    reader = csv.reader(stream)
+    columns = ['url', 'title', 'folder']
+    for row_no, row in enumerate(reader):
+        if not row:
+            continue
+        if row_no == 0 and 'url' in [c.strip().lower() for c in row]:
+            columns = [c.strip().lower() for c in row]
+            continue
+        entry = dict(zip(columns, row))
+        if entry.get('url'):
+            yield entry
+
+
+class NetscapeBookmarkParser(HTMLParser):
+    """
+    Parser for the Netscape bookmark HTML format browsers export: <H3>
+    headings name folders whose contents are the following <DL> list
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.entries = []
+        self.folders = []
+        self._pending_folder = None
+        self._text = None
+        self._href = None
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, str]]):
+        if tag == 'h3':
+            self._text = []
+        elif tag == 'a':
+            self._href = dict(attrs).get('href')
+            self._text = []
+        elif tag == 'dl':
+            # Each <DL> opens the folder named by the preceding <H3>, if any
+            self.folders.append(self._pending_folder)
+            self._pending_folder = None
+
+    def handle_endtag(self, tag: str):
+        if tag == 'h3' and self._text is not None:
+            self._pending_folder = ''.join(self._text).strip()
+            self._text = None
+        elif tag == 'a' and self._text is not None:
+            if self._href:
+                self.entries.append({
+                    'url': self._href,
+                    'title': ''.join(self._text).strip(),
+                    'folder': '/'.join(f for f in self.folders if f),
+                })
+            self._text = None
+            self._href = None
+        elif tag == 'dl' and self.folders:
+            self.folders.pop()
+
+    def handle_data(self, data: str):
+        if self._text is not None:
+            self._text.append(data)
+
+
+def parse_html(stream: TextIO) -> Iterator[Dict[str, str]]:
+    """
+    Parse a Netscape bookmark HTML export, feeding it in chunks
+    """
+    parser = NetscapeBookmarkParser()
+    for chunk in iter(lambda: stream.read(65536), ''):
+        parser.feed(chunk)
+        yield from parser.entries
+        parser.entries = []
+    parser.close()
+    yield from parser.entries
+
+
+PARSERS = {
+    'jsonl': parse_jsonl,
+    'csv': parse_csv,
+    'html': parse_html,
+}
+
+
+def import_entries(bookmarks: BookmarkFile, entries: Iterable[Dict[str, str]],
+                   folder: str = DEFAULT_IMPORT_FOLDER) -> Tuple[int, int]:
+    """
+    Add entries to a loaded BookmarkFile, skipping urls already present
+    (or repeated within the import) and entries whose url is missing, empty
+    or not a string. Entry folders are created under folder.
+    Returns (added, skipped); the caller saves once.
+    """
+    seen = {node['url'] for node in bookmarks.nodes() if node.get('type') == 'url'}
+    added = skipped = 0
+    for entry in entries:
+        url = entry.get('url')
+        url = url.strip() if isinstance(url, str) else ''
+        if not url or url in seen:
+            skipped += 1
+            continue
+        seen.add(url)
+        title = entry.get('title')
+        entry_folder = entry.get('folder')
+        if not isinstance(entry_folder, str):
+            entry_folder = ''
+        folder_path = f"{folder}/{entry_folder}" if entry_folder else folder
+        bookmarks.add_url(folder_path, title if title and isinstance(title, str) else url, url)
+        added += 1
+    return added, skipped
+
+
+def import_file(bookmarks_path: str, path: str, fmt: str = None,
+                folder: str = DEFAULT_IMPORT_FOLDER) -> Tuple[int, int]:
+    """
+    Import a JSONL, CSV or bookmark HTML file ('-' for stdin) into the
+    Bookmarks file with a single read-modify-write
+    """
+    import sys
+
+    fmt = fmt or detect_format(path)
+    if fmt not in PARSERS:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+    bookmarks = BookmarkFile(bookmarks_path).load()
+    if path == '-':
+        added, skipped = import_entries(bookmarks, PARSERS[fmt](sys.stdin), folder)
+    else:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as stream:
+            added, skipped = import_entries(bookmarks, PARSERS[fmt](stream), folder)
+    if added:
+        bookmarks.save()
+    logging.info(f"Imported {added} bookmarks from {path}, "
+                 f"skipped {skipped} duplicate or invalid entries")
+    return added, skipped
@@ -0,0 +1,801 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import re
+import logging
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from alfred_output import item_fragment
+
+# Separator between title and url in a search key, and terminator after the
+# url; queries never contain it, so no match or trigram can span two fields
+# or two bookmarks
+FIELD_SEPARATOR = '\x00'
+
+# Once this few candidates remain, verifying them directly is cheaper than
+# intersecting with the remaining (longer) posting lists
+VERIFY_THRESHOLD = 64
+
+# Most candidates a fuzzy term collects; each costs a pure-Python score, so
+# a typo matching loosely across a large index stops early, in id order
+FUZZY_CANDIDATE_LIMIT = 2000
+
+# Recent queries whose matches QueryMemo keeps per index
+QUERY_MEMO_SIZE = 32
+
+# Separator between folder names in a bookmark's folder path, as in the
+# folder paths create_bookmark takes
+FOLDER_SEPARATOR = '/'
+
+# A patched index is rebuilt from scratch once more than this fraction of
+# its ids belong to removed or changed bookmarks
+MAX_DEAD_FRACTION = 0.25
+
+
+def fold(text: str) -> str:
+    """
+    Casefold text and strip its accents, so 'Café' and 'CAFE' both match 'cafe'
+    """
+    if text.isascii():
+        return text.lower()
+    import unicodedata
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def search_key(title: str, url: str) -> str:
+    """
+    Build the folded, terminated string a query is matched against
+    """
+    return fold(title) + FIELD_SEPARATOR + fold(url) + FIELD_SEPARATOR
+
+
+def flatten_bookmarks(roots: Union[List, Dict]) -> List[Dict[str, str]]:
+    """
+    Extract all URLs and titles from the roots of a Chrome Bookmarks file,
+    sorted by title, with the path of the folder holding each one below
+    its root ('Work/Infra', or '' directly in the bookmark bar)
+    """
+    urls = []
+
+    def extract_data(data: Dict, folder: str):
+        if isinstance(data, dict):
+            if data.get('type') == 'url':
+                urls.append({
+                    'id': data.get('id', ''),
+                    'title': data.get('name', 'Untitled'),
+                    'url': data.get('url', ''),
+                    'folder': folder,
+                    'source': 'chrome'
+                })
+            if data.get('type') == 'folder' and 'children' in data:
+                for child in data.get('children', []):
+                    extract_data(child, join_folder(folder, data.get('name', '')))
+
+    def extract_root(root: Dict):
+        # The roots themselves (bookmark bar, other, mobile) are not part of paths
+        if isinstance(root, dict):
+            for child in root.get('children', []):
+                extract_data(child, '')
+
+    try:
+        if isinstance(roots, list):
+            for i in roots:
+                extract_root(i)
+        if isinstance(roots, dict):
+            for i in roots.values():
+                extract_root(i)
+        return sorted(urls, key=lambda k: k['title'])
+    except Exception as e:
+        logging.error(f"Error extracting URLs: {e}")
+        return []
+
+
+def join_folder(folder: str, name: str) -> str:
+    """
+    Get the path of subfolder name of the folder at path folder
+    """
+    return folder + FOLDER_SEPARATOR + name if folder else name
+
+
+def split_folder(folder: str) -> List[str]:
+    """
+    Get the folder names along a folder path
+    """
+    return [name for name in folder.split(FOLDER_SEPARATOR) if name]
+
+
+def folder_subtitle(folder: str, url: str) -> str:
+    """
+    Get the Alfred subtitle for a bookmark: where it lives, then its url
+    """
+    return f"{folder} · {url}" if folder else url
+
+
+def trigrams(text: str) -> Iterable[str]:
+    """
+    Get the distinct trigrams of a string
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PackedStrings:
+    """
+    Immutable string column stored as one buffer plus uint32 offsets.
+
+    Costs about a byte per character and four per entry, where a list of
+    str pays a 49+ byte object header and an 8 byte slot per entry, and
+    round-trips through marshal as two objects however many entries it
+    holds. The buffer is UTF-8 bytes, decoded when an item is accessed,
+    unless the whole column is ASCII (as folded keys of Latin-script
+    bookmarks are): then it is kept as a str, which takes the same space
+    and is sliced without decoding.
+    """
+
+    def __init__(self, data: Union[str, bytes], offsets: array):
+        self.data = data
+        self.offsets = offsets
+        self.text = isinstance(data, str)
+
+    @classmethod
+    def build(cls, strings: Iterable[str]) -> 'PackedStrings':
+        offsets = array('I', [0])
+        parts = []
+        end = 0
+        for text in strings:
+            encoded = text.encode('utf-8')
+            parts.append(encoded)
+            end += len(encoded)
+            offsets.append(end)
+        data = b''.join(parts)
+        return cls(data.decode('ascii') if data.isascii() else data, offsets)
+
+    @classmethod
+    def from_fields(cls, fields: Tuple[Union[str, bytes], bytes]) -> 'PackedStrings':
+        data, offsets_bytes = fields
+        offsets = array('I')
+        offsets.frombytes(offsets_bytes)
+        return cls(data, offsets)
+
+    def fields(self) -> Tuple[Union[str, bytes], bytes]:
+        """
+        Get the (data, offsets) pair persisted in the snapshot cache
+        """
+        return self.data, self.offsets.tobytes()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        item = self.data[self.offsets[i]:self.offsets[i + 1]]
+        return item if self.text else item.decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def tolist(self) -> List[str]:
+        """
+        Decode every entry at once, much faster than item by item
+        """
+        data, offsets = self.data, self.offsets
+        items = [data[start:end] for start, end in zip(offsets, islice(offsets, 1, None))]
+        return items if self.text else [item.decode('utf-8') for item in items]
+
+    def needle(self, text: str) -> Union[str, bytes]:
+        """
+        Convert text for searching the buffer with contains and find_all
+        """
+        return text if self.text else text.encode('utf-8')
+
+    def contains(self, i: int, needle: Union[str, bytes]) -> bool:
+        """
+        Check whether entry i contains needle, without decoding it
+        """
+        return self.data.find(needle, self.offsets[i], self.offsets[i + 1]) >= 0
+
+    def find_all(self, needle: Union[str, bytes]) -> List[int]:
+        """
+        Get ids of the entries containing needle, in ascending order, with
+        one C-level scan of the buffer. Matches must not span entries,
+        which holds for terminated search keys.
+        """
+        if not needle:
+            return list(range(len(self)))
+        data, offsets = self.data, self.offsets
+        ids = []
+        pos = data.find(needle)
+        while pos >= 0:
+            i = bisect_right(offsets, pos) - 1
+            ids.append(i)
+            # The rest of this entry can't add anything
+            pos = data.find(needle, offsets[i + 1])
+        return ids
+
+    def extended(self, strings: Iterable[str]) -> 'PackedStrings':
+        """
+        Get a copy with strings appended; the existing entries are copied
+        in one buffer concatenation, not re-encoded
+        """
+        tail = PackedStrings.build(strings)
+        data, tail_data = self.data, tail.data
+        if self.text != tail.text:
+            # An ASCII str buffer has the same offsets as its UTF-8 bytes
+            data = data.encode('ascii') if self.text else data
+            tail_data = tail_data.encode('ascii') if tail.text else tail_data
+        offsets = array('I', self.offsets)
+        end = offsets[-1]
+        offsets.extend(end + offset for offset in tail.offsets[1:])
+        return PackedStrings(data + tail_data, offsets)
+
+    def overwritten(self, entries: Dict[int, str]) -> 'PackedStrings':
+        """
+        Get a copy with entries replaced by ASCII strings of the same
+        length, so every offset stays valid
+        """
+        parts = []
+        pos = 0
+        for i in sorted(entries):
+            start, end = self.offsets[i], self.offsets[i + 1]
+            parts.append(self.data[pos:start])
+            parts.append(entries[i] if self.text else entries[i].encode('ascii'))
+            pos = end
+        parts.append(self.data[pos:])
+        return PackedStrings(''.join(parts) if self.text else b''.join(parts), self.offsets)
+
+
+class TrigramIndex:
+    """
+    Trigram inverted index over the folded search keys of the bookmarks.
+
+    Posting lists hold bookmark ids in ascending order and are stored as
+    raw uint32 bytes so they round-trip through the snapshot cache without
+    any per-entry work; they are only decoded when a query touches them.
+    Matching keeps exact substring semantics: postings only narrow the
+    candidates, every candidate is verified against its search key.
+    """
+
+    def __init__(self, keys: PackedStrings, postings: Dict[str, bytes]):
+        self.keys = keys
+        self.postings = postings
+
+    @classmethod
+    def build(cls, keys: PackedStrings) -> 'TrigramIndex':
+        """
+        Build the index over a column of search keys
+        """
+        lists = {}
+        for i, key in enumerate(keys):
+            for gram in trigrams(key):
+                if FIELD_SEPARATOR in gram:
+                    continue
+                posting = lists.get(gram)
+                if posting is None:
+                    lists[gram] = posting = array('I')
+                posting.append(i)
+        postings = {gram: posting.tobytes() for gram, posting in lists.items()}
+        return cls(keys, postings)
+
+    def _posting(self, gram: str) -> array:
+        posting = array('I')
+        posting.frombytes(self.postings.get(gram, b''))
+        return posting
+
+    def estimate(self, query: str) -> int:
+        """
+        Get an upper bound on the ids a query can match, from the length
+        of its shortest posting list, without decoding any
+        """
+        if len(query) < 3:
+            return len(self.keys)
+        return min(len(self.postings.get(gram, b'')) for gram in trigrams(query)) // 4
+
+    def candidates(self, query: str) -> Iterable[int]:
+        """
+        Get ids that may contain a query of at least three characters, in
+        ascending order
+        """
+        lists = sorted((self._posting(gram) for gram in trigrams(query)), key=len)
+        candidates = lists[0]
+        for posting in lists[1:]:
+            if len(candidates) <= VERIFY_THRESHOLD:
+                break
+            # Filtering against a set keeps the ascending order with no sort
+            members = set(posting)
+            candidates = [i for i in candidates if i in members]
+        return candidates
+
+    def search(self, query: str, within: List[int] = None) -> List[int]:
+        """
+        Get ids of bookmarks whose folded title or url contains the folded
+        query. within, if given, holds ascending ids known to include every
+        match (those of a query this one extends); only the shorter of it
+        and the trigram candidates is verified.
+        """
+        if len(query) >= 3:
+            candidates = self.candidates(query)
+            if within is None or len(candidates) <= len(within):
+                within = candidates
+        elif within is None:
+            # 1-2 character queries have no trigrams; scan every key at once
+            return self.keys.find_all(self.keys.needle(query))
+        return self.search_within(query, within)
+
+    def extended(self, keys: PackedStrings, start: int) -> 'TrigramIndex':
+        """
+        Get the index over keys, whose entries before start are this
+        index's keys, possibly blanked; only the keys from start on are
+        split into trigrams. Blanked keys stay in their posting lists,
+        they just never verify.
+        """
+        added = {}
+        for i in range(start, len(keys)):
+            for gram in trigrams(keys[i]):
+                if FIELD_SEPARATOR in gram:
+                    continue
+                posting = added.get(gram)
+                if posting is None:
+                    added[gram] = posting = array('I')
+                posting.append(i)
+        postings = dict(self.postings)
+        for gram, posting in added.items():
+            postings[gram] = postings.get(gram, b'') + posting.tobytes()
+        return TrigramIndex(keys, postings)
+
+    def subsequence_pattern(self, query: str):
+        """
+        Compile a pattern matching the characters of a folded query in
+        order within one field of a key. Each gap excludes the character
+        after it, so a match is found without backtracking, and the first
+        character is a literal the regex engine scans for in C.
+        """
+        text = self.keys.text
+        parts = []
+        for n, ch in enumerate(query):
+            if n:
+                if text or ch.isascii():
+                    parts.append('[^' + re.escape(ch) + FIELD_SEPARATOR + ']*')
+                else:
+                    # A multi-byte character can't go in a byte class
+                    parts.append('[^' + FIELD_SEPARATOR + ']*?')
+            parts.append(re.escape(ch))
+        pattern = ''.join(parts)
+        return re.compile(pattern if text else pattern.encode('utf-8'))
+
+    def search_subsequence(self, query: str, within: Iterable[int] = None,
+                           limit: int = FUZZY_CANDIDATE_LIMIT) -> List[int]:
+        """
+        Get the first limit ids, among within if given, of bookmarks whose
+        folded title or url holds the characters of the folded query in
+        order: the bookmarks the fuzzy tiers of score_match can score.
+        Without within this is one C-level scan of the packed keys.
+        """
+        pattern = self.subsequence_pattern(query)
+        search = pattern.search
+        data, offsets = self.keys.data, self.keys.offsets
+        ids = []
+        if within is not None:
+            for i in within:
+                if search(data, offsets[i], offsets[i + 1]):
+                    ids.append(i)
+                    if len(ids) >= limit:
+                        break
+            return ids
+        found = search(data)
+        while found and len(ids) < limit:
+            i = bisect_right(offsets, found.start()) - 1
+            ids.append(i)
+            # The rest of this entry can't add anything
+            found = search(data, offsets[i + 1])
+        return ids
+
+    def search_within(self, query: str, ids: Iterable[int]) -> List[int]:
+        """
+        Get the ids among ids whose folded title or url contains the folded
+        query, keeping their order
+        """
+        # PackedStrings.contains inlined: verification dominates queries
+        # that match many bookmarks
+        needle = self.keys.needle(query)
+        find, offsets = self.keys.data.find, self.keys.offsets
+        return [i for i in ids if find(needle, offsets[i], offsets[i + 1]) >= 0]
+
+
+class FolderTrie:
+    """
+    Trie over the folder paths of the bookmarks, by folded folder name.
+
+    order lists the bookmark ids sorted by folder path, which puts each
+    folder's whole subtree in one contiguous run of it; a node is
+    [start, end, {name: child}, extra ids] over that run, so scoping a
+    search to a folder is a walk down the trie and a slice, never a scan.
+    Bookmarks added by a patch go in the extra ids of their folder's node
+    instead. Nodes are plain lists and dicts so they round-trip through
+    the snapshot cache.
+    """
+
+    def __init__(self, root: list, order: bytes):
+        self.root = root
+        self.order = order
+        self._ids = None
+
+    @classmethod
+    def build(cls, folders: List[str]) -> 'FolderTrie':
+        """
+        Build the trie over the folder path of every bookmark
+        """
+        paths = [tuple(fold(name) for name in split_folder(folder)) for folder in folders]
+        order = sorted(range(len(paths)), key=paths.__getitem__)
+        root = [0, len(order), {}, []]
+        for pos, i in enumerate(order):
+            node = root
+            for name in paths[i]:
+                child = node[2].get(name)
+                if child is None:
+                    child = node[2][name] = [pos, pos, {}, []]
+                child[1] = pos + 1
+                node = child
+        return cls(root, array('I', order).tobytes())
+
+    def extended(self, folders: Iterable[Tuple[int, str]]) -> 'FolderTrie':
+        """
+        Get a copy with bookmarks added as (id, folder path). Only the nodes
+        along their paths are copied.
+        """
+        copied = set()
+
+        def own(node: list) -> list:
+            if id(node) not in copied:
+                node = [node[0], node[1], dict(node[2]), list(node[3])]
+                copied.add(id(node))
+            return node
+
+        root = own(self.root)
+        for i, folder in folders:
+            node = root
+            for name in split_folder(folder):
+                name = fold(name)
+                child = own(node[2].get(name) or [0, 0, {}, []])
+                node[2][name] = child
+                node = child
+            node[3].append(i)
+        return FolderTrie(root, self.order)
+
+    def match(self, folder: str) -> List[list]:
+        """
+        Get the nodes of the folders a typed path names, empty if none.
+        Each name matches from the top, down one level at a time, and may be
+        the start of a folder name ('work/inf', 'team/' for 'Team Hub'); a
+        folder named exactly that wins over longer ones.
+        """
+        nodes = [self.root]
+        for name in split_folder(folder):
+            name = fold(name)
+            exact = [node[2][name] for node in nodes if name in node[2]]
+            nodes = exact or [
+                child for node in nodes
+                for child_name, child in node[2].items() if child_name.startswith(name)
+            ]
+            if not nodes:
+                return []
+        return nodes
+
+    def find(self, folder: str) -> List[Tuple[int, int]]:
+        """
+        Get the (start, end) runs of order under the folders a typed path
+        names. Sibling names sharing a prefix sort together, so their
+        subtrees form one run.
+        """
+        return self._runs(self.match(folder))
+
+    @staticmethod
+    def _runs(nodes: List[list]) -> List[Tuple[int, int]]:
+        runs = []
+        for start, end in sorted((node[0], node[1]) for node in nodes):
+            if start == end:
+                continue
+            if runs and start <= runs[-1][1]:
+                runs[-1] = (runs[-1][0], max(end, runs[-1][1]))
+            else:
+                runs.append((start, end))
+        return runs
+
+    def scope(self, folder: str) -> Optional[List[int]]:
+        """
+        Get the ids of the bookmarks in and below the folders a typed path
+        names, in ascending order, or None if it names none
+        """
+        nodes = self.match(folder)
+        if not nodes:
+            return None
+        if self._ids is None:
+            self._ids = array('I')
+            self._ids.frombytes(self.order)
+        ids = []
+        for start, end in self._runs(nodes):
+            ids.extend(self._ids[start:end])
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            ids.extend(node[3])
+            stack.extend(node[2].values())
+        return sorted(ids)
+
+
+def blank_key(length: int) -> str:
+    """
+    Get a search key of length that no query matches, for a removed bookmark
+    """
+    return ' ' * (length - 2) + FIELD_SEPARATOR * 2
+
+
+def title_position(order: array, titles: PackedStrings, title: str) -> int:
+    """
+    Get the first position in order, a list of ids sorted by title, whose
+    title is not less than title
+    """
+    lo, hi = 0, len(order)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if titles[order[mid]] < title:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class BookmarkIndex:
+    """
+    The flattened, title-sorted bookmarks plus everything derived from them
+    at build time: pre-encoded Alfred item fragments, folded search keys
+    the trigram index and the folder trie. Every column is a PackedStrings,
+    and bookmark ids are positions in them. generation identifies the
+    snapshot the index was loaded from, for caches derived from it.
+
+    A built index has ids in title order. patched() keeps every id stable
+    instead: changes are appended, and the ids they replace are left dead
+    with blanked keys. order lists the live ids in title order, dead the
+    rest, and patch records (the generation patched, ids added) so caches
+    keyed by id can be updated rather than rebuilt.
+    """
+
+    def __init__(self, titles: PackedStrings, urls: PackedStrings,
+                 fragments: PackedStrings, keys: PackedStrings,
+                 trigrams: TrigramIndex, folders: PackedStrings,
+                 folder_trie: FolderTrie, node_ids: PackedStrings,
+                 order: array = None, dead: array = None, generation: Any = None):
+        self.generation = generation
+        self.titles = titles
+        self.urls = urls
+        self.fragments = fragments
+        self.keys = keys
+        self.trigrams = trigrams
+        self.folders = folders
+        self.folder_trie = folder_trie
+        self.node_ids = node_ids
+        self.order = array('I', range(len(titles))) if order is None else order
+        self.dead = array('I') if dead is None else dead
+        self.patch = None
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    @classmethod
+    def empty(cls) -> 'BookmarkIndex':
+        return cls.build([], [])
+
+    @classmethod
+    def build(cls, titles: List[str], urls: List[str], folders: List[str] = None,
+              node_ids: List[str] = None) -> 'BookmarkIndex':
+        """
+        Build the index, encoding every bookmark's Alfred item and folding
+        its search key exactly once. folders holds each bookmark's folder
+        path; without it every bookmark is at the top level. node_ids are
+        the source's ids for the bookmarks, which patched() diffs on.
+        """
+        if folders is None:
+            folders = [''] * len(titles)
+        if node_ids is None:
+            node_ids = [''] * len(titles)
+        keys = PackedStrings.build(search_key(title, url) for title, url in zip(titles, urls))
+        return cls(
+            PackedStrings.build(titles),
+            PackedStrings.build(urls),
+            PackedStrings.build(
+                item_fragment(title, url, folder_subtitle(folder, url))
+                for title, url, folder in zip(titles, urls, folders)
+            ),
+            keys,
+            TrigramIndex.build(keys),
+            PackedStrings.build(folders),
+            FolderTrie.build(folders),
+            PackedStrings.build(node_ids)
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> 'BookmarkIndex':
+        keys = PackedStrings.from_fields(snapshot['keys'])
+        order, dead = array('I'), array('I')
+        order.frombytes(snapshot['order'])
+        dead.frombytes(snapshot['dead'])
+        index = cls(PackedStrings.from_fields(snapshot['titles']),
+                    PackedStrings.from_fields(snapshot['urls']),
+                    PackedStrings.from_fields(snapshot['fragments']),
+                    keys,
+                    TrigramIndex(keys, snapshot['postings']),
+                    PackedStrings.from_fields(snapshot['folders']),
+                    FolderTrie(snapshot['folder_trie'], snapshot['folder_order']),
+                    PackedStrings.from_fields(snapshot['node_ids']),
+                    order, dead,
+                    (tuple(snapshot['stat']), snapshot['checksum']))
+        if snapshot['patch'] is not None:
+            generation, added = snapshot['patch']
+            index.patch = (generation, array('I', added))
+        return index
+
+    def patched(self, bookmarks: List[Dict[str, str]]) -> Optional['BookmarkIndex']:
+        """
+        Get this index updated to a new list of {'id', 'title', 'url',
+        'folder'} bookmarks by diffing on id. Bookmarks that are new, or
+        whose title, url or folder changed, get ids at the end; the ids of
+        removed and changed ones die. Only the changes are encoded, folded
+        and split into trigrams. None if a full build is due instead: the
+        bookmarks have no ids, or too many ids would be dead.
+        """
+        node_ids = self.node_ids.tolist()
+        live = {node_ids[i]: i for i in self.order}
+        if '' in live or len(live) != len(self.order):
+            return None
+
+        titles, urls, folders = self.titles.tolist(), self.urls.tolist(), self.folders.tolist()
+        added, removed = [], []
+        for bookmark in bookmarks:
+            if not bookmark.get('id'):
+                return None
+            i = live.pop(bookmark['id'], None)
+            if i is None:
+                added.append(bookmark)
+            elif (titles[i] != bookmark['title'] or urls[i] != bookmark['url']
+                  or folders[i] != bookmark.get('folder', '')):
+                removed.append(i)
+                added.append(bookmark)
+        removed.extend(live.values())
+
+        start = len(titles)
+        if len(self.dead) + len(removed) > MAX_DEAD_FRACTION * (start + len(added)):
+            return None
+
+        added.sort(key=lambda b: b['title'])
+        new_titles = [b['title'] for b in added]
+        new_urls = [b['url'] for b in added]
+        new_folders = [b.get('folder', '') for b in added]
+        offsets = self.keys.offsets
+        keys = self.keys.extended(map(search_key, new_titles, new_urls)).overwritten(
+            {i: blank_key(offsets[i + 1] - offsets[i]) for i in removed}
+        )
+        titles = self.titles.extended(new_titles)
+
+        order = array('I', self.order)
+        for i in removed:
+            pos = title_position(order, titles, titles[i])
+            while order[pos] != i:
+                pos += 1
+            del order[pos]
+        for i, title in enumerate(new_titles, start):
+            pos = title_position(order, titles, title)
+            while pos < len(order) and titles[order[pos]] == title:
+                pos += 1
+            order.insert(pos, i)
+
+        index = BookmarkIndex(
+            titles,
+            self.urls.extended(new_urls),
+            self.fragments.extended(
+                item_fragment(title, url, folder_subtitle(folder, url))
+                for title, url, folder in zip(new_titles, new_urls, new_folders)
+            ),
+            keys,
+            self.trigrams.extended(keys, start),
+            self.folders.extended(new_folders),
+            self.folder_trie.extended(zip(range(start, start + len(added)), new_folders)),
+            self.node_ids.extended(b['id'] for b in added),
+            order,
+            self.dead + array('I', removed)
+        )
+        index.patch = (self.generation, array('I', range(start, start + len(added))))
+        return index
+
+    def scope(self, folder: str) -> Optional[List[int]]:
+        """
+        Get the live ids in and below the folders a typed path names, in
+        ascending order, or None if it names none
+        """
+        ids = self.folder_trie.scope(folder)
+        if ids is None or not self.dead:
+            return ids
+        dead = set(self.dead)
+        return [i for i in ids if i not in dead]
+
+    def search_fields(self, i: int) -> Tuple[str, str]:
+        """
+        Get the folded (title, url) of bookmark i
+        """
+        title, url, _ = self.keys[i].split(FIELD_SEPARATOR)
+        return title, url
+
+    def snapshot_fields(self) -> Dict[str, Any]:
+        """
+        Get the fields persisted in the snapshot cache
+        """
+        return {
+            'titles': self.titles.fields(),
+            'urls': self.urls.fields(),
+            'fragments': self.fragments.fields(),
+            'keys': self.keys.fields(),
+            'postings': self.trigrams.postings,
+            'folders': self.folders.fields(),
+            'folder_trie': self.folder_trie.root,
+            'folder_order': self.folder_trie.order,
+            'node_ids': self.node_ids.fields(),
+            'order': self.order.tobytes(),
+            'dead': self.dead.tobytes(),
+            'patch': None if self.patch is None else (self.patch[0], self.patch[1].tobytes()),
+        }
+
+
+class QueryMemo:
+    """
+    LRU memo of the ids matching recent queries against one index.
+
+    While a query is typed out, each keystroke extends the last query, and
+    a key containing the longer query contains the shorter one, so its
+    matches are among the memoized matches of the longest prefix seen;
+    only those are verified instead of searching the whole index. Entries
+    are keyed by (index generation, query): a new generation means the
+    bookmarks changed, and the memo is cleared.
+    """
+
+    def __init__(self, size: int = QUERY_MEMO_SIZE):
+        self.size = size
+        self.generation = None
+        self.entries = OrderedDict()
+
+    def get(self, generation: Any, query: str):
+        ids = self.entries.get((generation, query))
+        if ids is not None:
+            self.entries.move_to_end((generation, query))
+        return ids
+
+    def put(self, generation: Any, query: str, ids: List[int]):
+        if generation != self.generation:
+            self.entries.clear()
+            self.generation = generation
+        self.entries[(generation, query)] = array('I', ids)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def search(self, index: 'BookmarkIndex', query: str) -> List[int]:
+        """
+        Get the ids of bookmarks in index containing the folded query, as
+        TrigramIndex.search does, narrowing from a memoized prefix when
+        there is one
+        """
+        generation = index.generation
+        if generation is None:
+            # Not loaded from a snapshot, nothing to key the memo on
+            return index.trigrams.search(query)
+        ids = self.get(generation, query)
+        if ids is not None:
+            return list(ids)
+        base = None
+        for end in range(len(query) - 1, 0, -1):
+            base = self.get(generation, query[:end])
+            if base is not None:
+                break
+        ids = index.trigrams.search(query, base)
+        self.put(generation, query, ids)
+        return ids
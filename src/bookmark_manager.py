@@ -1,133 +1,294 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
-import codecs
 import json
 import os
 import sys
 import logging
-import shlex
-from typing import List, Dict, Any, Union
-from urllib.parse import urljoin
+from typing import Iterable, List, Dict, Any, Optional, Tuple, TextIO
 
 # Add the current directory to the path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.append(current_dir)
 
-from chrome_tab_manager import ChromeTabManager
-
-# Configure logging
-log_dir = os.path.expanduser('~/Library/Logs/MayankBookmarkManager')
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    filename=os.path.join(log_dir, 'bookmark_manager.log'),
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s: %(message)s'
+from chrome_profiles import CHROME_DIR, DEFAULT_PROFILE, ChromeProfile, read_bookmarks_document
+from bookmark_sources import (
+    BookmarkSource, discover_sources, finish_late_loads, get_source_timeout, map_sources
+)
+from bookmark_index import (
+    BookmarkIndex, QueryMemo, flatten_bookmarks, folder_subtitle
 )
-logging.info("=== Bookmark Manager Started ===")
-logging.info(f"Python version: {sys.version}")
-logging.info(f"Current directory: {os.getcwd()}")
+from alfred_output import item_fragment, message_fragment, with_icon, write_items
+from bookmark_ranking import get_max_results, score_match, frecency_boost, top_k
+from query_compiler import QueryPlan, compile_query
+import instrumentation
+from instrumentation import (
+    begin_request, end_request, format_timings, span, timings_enabled
+)
+
+def configure_logging():
+    """
+    Configure file logging; called from entry points, not at import time,
+    so importing this module from the wrapper or daemon stays cheap
+    """
+    instrumentation.configure_logging('bookmark_manager')
+    logging.debug("=== Bookmark Manager Started ===")
+    logging.debug("Python version: %s", sys.version)
+    logging.debug("Current directory: %s", os.getcwd())
 
 # Chrome bookmark file path relative to HOME
 CHROME_BOOKMARK_PATH = 'Library/Application Support/Google/Chrome/Default/Bookmarks'
 
+# Most tabs shown by the tabs command, across all browsers and profiles
+MAX_OPEN_TABS = 200
+
+# Where full-text search says a history result comes from
+HISTORY_FOLDER = 'History'
+
 class BookmarkManager:
     def __init__(self):
         self.user_dir = os.path.expanduser('~')
+        self.chrome_dir = os.path.join(self.user_dir, CHROME_DIR)
         self.chrome_path = os.path.join(self.user_dir, CHROME_BOOKMARK_PATH)
-        self.tab_manager = ChromeTabManager()
-        logging.info(f"Chrome bookmarks path: {self.chrome_path}")
+        self.sources = discover_sources(self.user_dir)
+        # New bookmarks go to Chrome's Default profile
+        self.default_profile = next(
+            (s for s in self.sources if s.path == self.chrome_path),
+            None
+        ) or ChromeProfile(self.chrome_dir, DEFAULT_PROFILE)
+        self.tab_manager = self.default_profile.tab_manager
+        self.snapshot_cache = self.default_profile.snapshot_cache
+        self.fts_store = None
+        logging.debug("Chrome bookmarks path: %s", self.chrome_path)
+        logging.debug("Bookmark sources: %s", self.sources)
 
     def get_all_urls(self, the_json: Dict) -> List[Dict[str, str]]:
         """
         Extract all URLs and title from Chrome Bookmarks file
         """
-        urls = []
-
-        def extract_data(data: Dict):
-            if isinstance(data, dict):
-                if data.get('type') == 'url':
-                    urls.append({
-                        'title': data.get('name', 'Untitled'),
-                        'url': data.get('url', ''),
-                        'source': 'chrome'
-                    })
-                if data.get('type') == 'folder' and 'children' in data:
-                    for child in data.get('children', []):
-                        extract_data(child)
-
-        def get_container(o: Union[List, Dict]):
-            if isinstance(o, list):
-                for i in o:
-                    extract_data(i)
-            if isinstance(o, dict):
-                for k, i in o.items():
-                    extract_data(i)
+        return flatten_bookmarks(the_json)
 
-        try:
-            get_container(the_json)
-            return sorted(urls, key=lambda k: k['title'], reverse=False)
-        except Exception as e:
-            logging.error(f"Error extracting URLs: {e}")
-            return []
+    def get_document_from_file(self) -> Dict:
+        """
+        Get the whole Chrome bookmarks document, including checksum and version
+        """
+        return read_bookmarks_document(self.chrome_path)
 
     def get_json_from_file(self) -> Dict:
         """
         Get Bookmark JSON from Chrome bookmarks file
         """
-        try:
-            with codecs.open(self.chrome_path, 'r', 'utf-8-sig') as f:
-                return json.load(f)['roots']
-        except Exception as e:
-            logging.error(f"Error reading Chrome bookmarks: {e}")
-            return {}
+        return self.get_document_from_file().get('roots', {})
 
-    def search_bookmarks(self, query: str = None) -> List[Dict[str, str]]:
+    def load_index(self) -> BookmarkIndex:
         """
-        Search Chrome bookmarks
+        Get the search index over the Default profile's bookmarks
         """
-        logging.info(f"Searching bookmarks. Query: {query}")
+        return self.default_profile.load_index()
 
-        if not os.path.exists(self.chrome_path):
-            logging.error("Chrome bookmarks file not found")
-            return []
+    def load_sources(self) -> List[Tuple[BookmarkSource, BookmarkIndex, Dict[int, float], float,
+                                         Dict[int, str]]]:
+        """
+        Load every source's index, frecency and icons concurrently, as
+        (source, index, frecency, decay, icons) in source order. A source that
+        misses the BM_SOURCE_TIMEOUT deadline is served from its last
+        snapshot; one that fails to load is left out.
+        """
+        loaded = map_sources(
+            lambda s: s.load(), self.sources,
+            timeout=get_source_timeout(), fallback=lambda s: s.load_cached()
+        )
+        return [(source,) + result for source, result in zip(self.sources, loaded) if result]
+
+    def rank_bookmarks(self, index: BookmarkIndex, plan: QueryPlan, limit: int,
+                       frecency: Dict[int, float], decay: float,
+                       memo: QueryMemo = None) -> List[Tuple[float, int]]:
+        """
+        Get (score, id) of the best matches for a compiled query in index,
+        narrowing from memo's matches for an earlier prefix if given
+        """
+        # Filter bookmarks based on search query
+        with span('filter'):
+            matches = plan.match(index, memo)
+            if not matches and plan.needs_fallback(index, memo):
+                # Nothing contains the terms verbatim, fall back to fuzzy matching
+                plan = plan.fallback
+                matches = plan.match(index, memo)
 
-        # Get all bookmarks
-        bookmarks_json = self.get_json_from_file()
-        all_bookmarks = self.get_all_urls(bookmarks_json)
-        logging.info(f"Total bookmarks found: {len(all_bookmarks)}")
+        # With nothing to rank by (an empty query, only folders or
+        # exclusions), return the first bookmarks
+        needles = plan.scored
+        if not needles:
+            return [(0.0, i) for i in matches[:limit]]
 
-        # If query is empty, None, or just whitespace, return all bookmarks
-        if not query or query.strip() == '':
-            return all_bookmarks
+        def score(i: int) -> float:
+            title, url = index.search_fields(i)
+            total = 0.0
+            for needle in needles:
+                match = score_match(needle, title, url)
+                if not match:
+                    return 0
+                total += match
+            if frecency:
+                total *= frecency_boost(frecency.get(i, 0.0) * decay)
+            return total
 
-        # Check if query contains a path suffix
-        parts = query.split(' ', 1)
-        search_query = parts[0].lower()
-        path_suffix = parts[1] if len(parts) > 1 else ''
+        with span('rank'):
+            return top_k(matches, score, limit)
 
-        # Filter bookmarks based on search query
-        filtered_bookmarks = []
-        for bookmark in all_bookmarks:
-            if search_query in bookmark['title'].lower() or search_query in bookmark['url'].lower():
+    def search_bookmarks(self, query: str = None, limit: int = None) -> List[Dict[str, str]]:
+        """
+        Search bookmarks, returning at most limit results best match first
+        """
+        return [
+            {'title': title, 'url': url, 'folder': folder,
+             'source': source.browser, 'profile': source.name}
+            for title, url, folder, _, source in self.search_results(query, limit)
+        ]
+
+    def search_items(self, query: str = None, limit: int = None) -> List[str]:
+        """
+        Search bookmarks, returning encoded Alfred item fragments
+        """
+        return [fragment for _, _, _, fragment, _ in self.search_results(query, limit)]
+
+    def search_results(self, query: str = None,
+                       limit: int = None) -> List[Tuple[str, str, str, str, BookmarkSource]]:
+        """
+        Search the bookmarks of every source as (title, url, folder, item
+        fragment, source), merged into one ranking. A url bookmarked in several
+        browsers or profiles is listed once. Fragments come straight from the index,
+        plus the bookmark's cached favicon, unless a path suffix changes the url.
+
+        The query is compiled once (see query_compiler.compile_query): its
+        terms are AND-ed and may be limited to a field ('site:', 'folder:',
+        'title:', 'url:') or negated with '-'; text after '>' is joined to
+        each result's url. A first word naming a folder ('work/infra',
+        'work/') limits the search to that folder and its subfolders, e.g.
+        'work/infra k8s'.
+
+        With BM_SEARCH_BACKEND=fts, other non-empty queries go to the
+        full-text database instead (see fts_results).
+        """
+        logging.debug("Searching bookmarks. Query: %s", query)
+        if limit is None:
+            limit = get_max_results()
+
+        plan = compile_query(query or '')
+        if (os.environ.get('BM_SEARCH_BACKEND') == 'fts' and plan.leading_folder is None
+                and any(not negate for _, _, negate in plan.fts_clauses)):
+            results = self.fts_results(plan, limit)
+            if results is not None:
+                return results
+        loaded = self.load_sources()
+
+        if plan.leading_folder is not None:
+            if any(index.scope(plan.leading_folder) is not None for _, index, _, _, _ in loaded):
+                logging.debug("Scoped to folder %s", plan.leading_folder)
+            else:
+                # Not a folder after all, just a term with a slash
+                plan = compile_query(query, folder_first=False)
+        path_suffix = plan.path_suffix
+
+        merged = []
+        for pos, (source, index, frecency, decay, _) in enumerate(loaded):
+            for score, i in self.rank_bookmarks(index, plan, limit, frecency, decay,
+                                                source.query_memo):
+                merged.append((-score, index.titles[i], pos, i))
+        with span('merge'):
+            merged.sort()
+
+        if path_suffix:
+            from urllib.parse import urljoin
+
+        # With BM_COLLAPSE_DUPLICATES=1, urls that differ only in tracking
+        # parameters, a trailing slash or http/https are listed once too
+        same_page = str
+        if os.environ.get('BM_COLLAPSE_DUPLICATES') == '1':
+            from bookmark_dedupe import normalize_url as same_page
+
+        results = []
+        seen = set()
+        for _, title, pos, i in merged:
+            source, index, icons = loaded[pos][0], loaded[pos][1], loaded[pos][4]
+            url = index.urls[i]
+            page = same_page(url)
+            if page in seen:
+                continue
+            seen.add(page)
+            folder = index.folders[i]
+            icon = icons.get(i)
+            if path_suffix:
                 # If path suffix exists, append it to the URL
-                if path_suffix:
-                    bookmark = bookmark.copy()
-                    bookmark['url'] = urljoin(bookmark['url'], path_suffix.lstrip('/'))
-                filtered_bookmarks.append(bookmark)
+                url = urljoin(url, path_suffix.lstrip('/'))
+                fragment = item_fragment(title, url, folder_subtitle(folder, url), icon)
+            else:
+                fragment = index.fragments[i]
+                if icon is not None:
+                    fragment = with_icon(fragment, icon)
+            results.append((title, url, folder, fragment, source))
+            if len(results) >= limit:
+                break
+
+        logging.debug("Filtered bookmarks: %d", len(results))
+        return results
 
-        logging.info(f"Filtered bookmarks: {len(filtered_bookmarks)}")
-        return filtered_bookmarks
+    def fts_results(self, plan: QueryPlan,
+                    limit: int) -> Optional[List[Tuple[str, str, str, str, BookmarkSource]]]:
+        """
+        Search the full-text database (BM_SEARCH_BACKEND=fts) over every
+        source's bookmarks and Chrome history, results shaped as for
+        search_results. None if the database can't be used, e.g. when
+        SQLite lacks FTS5, or the query has no words it can match, so the
+        caller falls back to the index.
+        """
+        try:
+            if self.fts_store is None:
+                from fts_store import FtsStore
+                self.fts_store = FtsStore()
+            self.fts_store.sync(self.sources)
+            rows = self.fts_store.search(plan.fts_clauses, limit)
+        except Exception as e:
+            logging.error(f"Full-text search failed, using the index: {e}")
+            return None
+        if rows is None:
+            logging.debug("No full-text words in the query, using the index")
+            return None
+
+        path_suffix = plan.path_suffix
+        if path_suffix:
+            from urllib.parse import urljoin
+        sources = {str(source): source for source in self.sources}
+        results = []
+        seen = set()
+        for source_name, kind, title, url, folder in rows:
+            source = sources.get(source_name)
+            if source is None or url in seen:
+                continue
+            seen.add(url)
+            if path_suffix:
+                url = urljoin(url, path_suffix.lstrip('/'))
+            if kind == 'history':
+                folder = HISTORY_FOLDER
+            results.append((title, url, folder,
+                            item_fragment(title or url, url, folder_subtitle(folder, url)), source))
+            if len(results) >= limit:
+                break
+        return results
 
     def debug_bookmark_paths(self) -> List[str]:
         """
-        Debug method to print out Chrome bookmark file location
+        Debug method to print out the bookmark file location of every source
         """
-        if os.path.exists(self.chrome_path):
-            return [f"Chrome bookmarks found at: {self.chrome_path}"]
-        else:
-            return [f"Chrome bookmarks NOT found at: {self.chrome_path}"]
+        paths = []
+        for source in self.sources:
+            browser = source.browser.capitalize()
+            if os.path.exists(source.path):
+                paths.append(f"{browser} bookmarks found at: {source.path}")
+            else:
+                paths.append(f"{browser} bookmarks NOT found at: {source.path}")
+        return paths
 
     def create_bookmark(self, url: str, folder_path: str, title: str) -> bool:
         """
@@ -135,17 +296,95 @@ class BookmarkManager:
         """
         return self.tab_manager.create_bookmark(url, folder_path, title, self)
 
+    def import_bookmarks(self, path: str, folder: str = None) -> Tuple[int, int]:
+        """
+        Bulk-import bookmarks from a JSONL, CSV or bookmark HTML file,
+        returning (added, skipped)
+        """
+        from bookmark_import import import_file, DEFAULT_IMPORT_FOLDER
+        try:
+            return import_file(self.chrome_path, path, folder=folder or DEFAULT_IMPORT_FOLDER)
+        except Exception as e:
+            logging.error(f"Error importing bookmarks from {path}: {e}")
+            return 0, 0
+
+    def find_duplicates(self) -> List[Dict[str, Any]]:
+        """
+        Group the Chrome bookmarks that are the same page: identical urls,
+        or urls differing only in tracking parameters, trailing slashes or
+        http vs https
+        """
+        from bookmark_dedupe import duplicate_groups
+        from bookmark_writer import BookmarkFile
+        try:
+            return duplicate_groups(BookmarkFile(self.chrome_path).load())
+        except Exception as e:
+            logging.error(f"Error finding duplicate bookmarks: {e}")
+            return []
+
+    def remove_duplicates(self) -> Tuple[int, int]:
+        """
+        Remove all but the first bookmark of every duplicate group in one
+        write, returning (groups, removed)
+        """
+        from bookmark_dedupe import remove_duplicates
+        try:
+            return remove_duplicates(self.chrome_path)
+        except Exception as e:
+            logging.error(f"Error removing duplicate bookmarks: {e}")
+            return 0, 0
+
+    def check_links(self, refresh: bool = False) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Check every source's bookmarked urls (see link_checker), re-checking
+        only results older than the cache TTL unless refresh. Returns the
+        broken bookmarks as {'title', 'url', 'folder', 'status'} dicts and
+        how many urls were checked.
+        """
+        from link_checker import LinkChecker, is_dead
+
+        bookmarks = []
+        for index in map_sources(lambda s: s.load_index(), self.sources):
+            if index is None:
+                continue
+            bookmarks.extend((index.titles[i], index.urls[i], index.folders[i])
+                             for i in index.order)
+        with span('check'):
+            statuses = LinkChecker().check((url for _, url, _ in bookmarks), refresh)
+
+        broken = []
+        seen = set()
+        for title, url, folder in bookmarks:
+            status = statuses.get(url)
+            if status is not None and is_dead(status) and url not in seen:
+                seen.add(url)
+                broken.append({'title': title, 'url': url, 'folder': folder, 'status': status})
+        return broken, len(statuses)
+
     def get_open_tabs(self) -> List[Dict[str, str]]:
         """
-        Get all open Chrome tabs
+        Get recently open tabs of every source that tracks them (the
+        Chromium-family profiles), loaded concurrently
         """
-        return self.tab_manager.get_open_tabs()
+        tabs = []
+        seen = set()
+        # There is no cached copy of the tabs to fall back to, so wait for
+        # every source rather than show an empty list
+        per_source = map_sources(lambda s: s.get_open_tabs(), self.sources)
+        for source, source_tabs in zip(self.sources, per_source):
+            for tab in source_tabs or []:
+                if tab['url'] not in seen:
+                    seen.add(tab['url'])
+                    tabs.append(dict(tab, profile=source.name))
+        return tabs[:MAX_OPEN_TABS]
 
 def parse_bookmark_command(cmd: str) -> Dict[str, str]:
     """
     Parse the bookmark command string
     Format: bms "url" folder/path "title"
     """
+    import shlex
+
     try:
         parts = shlex.split(cmd)
         if len(parts) < 4:  # Need at least: bms "url" folder "title"
@@ -160,132 +399,184 @@ def parse_bookmark_command(cmd: str) -> Dict[str, str]:
         logging.error(f"Error parsing bookmark command: {e}")
         return {}
 
-def main():
-    # Add debug logging for command line arguments
-    logging.info(f"Command line arguments: {sys.argv}")
-    
+def duplicate_fragments(groups: List[Dict[str, Any]]) -> List[str]:
+    """
+    Encode a dedupe report: a summary, then one item per group opening the
+    copy that would be kept
+    """
+    if not groups:
+        return [message_fragment("No duplicate bookmarks found")]
+    extra = sum(len(group['bookmarks']) - 1 for group in groups)
+    fragments = [message_fragment(
+        f"{extra} duplicate bookmarks in {len(groups)} groups",
+        "Run dedupe --apply to keep only the first of each"
+    )]
+    for group in groups:
+        kept = group['bookmarks'][0]
+        folders = ', '.join(sorted({b['folder'] or '/' for b in group['bookmarks']}))
+        kind = 'copies' if group['exact'] else 'variants'
+        fragments.append(item_fragment(
+            kept['title'] or kept['url'], kept['url'],
+            f"{len(group['bookmarks'])} {kind} in {folders}"
+        ))
+    return fragments
+
+def broken_link_fragments(broken: List[Dict[str, Any]], checked: int) -> List[str]:
+    """
+    Encode a check-links report: a summary, then one item per broken bookmark
+    """
+    from link_checker import describe_status
+
+    if not broken:
+        return [message_fragment("No broken links found", f"Checked {checked} links")]
+    fragments = [message_fragment(
+        f"{len(broken)} broken links",
+        f"Checked {checked} links; run check-links --refresh to re-check all"
+    )]
+    for bookmark in broken:
+        status = describe_status(bookmark['status'])
+        fragments.append(item_fragment(
+            bookmark['title'] or bookmark['url'], bookmark['url'],
+            f"{status} · {folder_subtitle(bookmark['folder'], bookmark['url'])}"
+        ))
+    return fragments
+
+def write_response(fragments: Iterable[str], out: TextIO):
+    """
+    Stream a Script Filter response, followed by an item showing this
+    request's phase timings when BM_DEBUG_TIMINGS is set
+    """
+    if timings_enabled():
+        fragments = list(fragments) + [message_fragment(*format_timings())]
+    with span('serialize'):
+        write_items(fragments, out)
+
+def write_tabs(bm_manager: BookmarkManager, out: TextIO, empty_message: str = None) -> int:
+    """
+    Stream the open tabs as Alfred items, or empty_message if there are none
+    """
+    tabs = bm_manager.get_open_tabs()
+    logging.debug("Found %d tabs", len(tabs))
+    if not tabs and empty_message:
+        write_response([message_fragment(empty_message)], out)
+    else:
+        write_response([item_fragment(t['title'], t['url']) for t in tabs], out)
+    return len(tabs)
+
+def handle_command(bm_manager: BookmarkManager, argv: List[str], out: TextIO):
+    """
+    Run one workflow command and stream its JSON response to out, then
+    record its phase timings in the metrics file.
+    argv has the same layout as sys.argv for bookmark_manager.py.
+    """
+    begin_request()
+
     # Check if we're being called from Alfred
     # Alfred sometimes passes '(null)' as the argument
-    query_from_alfred = None
-    if len(sys.argv) > 1 and sys.argv[1] == '(null)':
-        logging.info("Detected Alfred null argument pattern")
+    if len(argv) > 1 and argv[1] == '(null)':
+        logging.debug("Detected Alfred null argument pattern")
         # Default to search with no query when called with (null)
         action = 'search'
     else:
-        action = sys.argv[1] if len(sys.argv) > 1 else 'search'  # Default to search
+        action = argv[1] if len(argv) > 1 else 'search'  # Default to search
     
-    logging.info(f"Action: {action}")
-    
-    bm_manager = BookmarkManager()
+    logging.debug("Action: %s", action)
+    results = None
     
     if action == 'search':
         # If called from Alfred with (null), use empty query
-        if len(sys.argv) > 1 and sys.argv[1] == '(null)':
+        if len(argv) > 1 and argv[1] == '(null)':
             query = None
         else:
-            query = sys.argv[2] if len(sys.argv) > 2 else None
+            query = argv[2] if len(argv) > 2 else None
             
-        logging.info(f"Search query: {query}")
-        bookmarks = bm_manager.search_bookmarks(query)
-        logging.info(f"Found {len(bookmarks)} bookmarks")
-        print(json.dumps({
-            "items": [
-                {
-                    "title": b['title'],
-                    "subtitle": b['url'],
-                    "arg": b['url'],
-                    "text": {
-                        "copy": b['url'],
-                        "largetype": b['title']
-                    }
-                } for b in bookmarks
-            ]
-        }))
+        logging.debug("Search query: %s", query)
+        fragments = bm_manager.search_items(query)
+        results = len(fragments)
+        write_response(fragments, out)
     
     elif action == 'tabs':
-        tabs = bm_manager.get_open_tabs()
-        logging.info(f"Found {len(tabs)} tabs")
-        print(json.dumps({
-            "items": [
-                {
-                    "title": t['title'],
-                    "subtitle": t['url'],
-                    "arg": t['url'],
-                    "text": {
-                        "copy": t['url'],
-                        "largetype": t['title']
-                    }
-                } for t in tabs
-            ]
-        }))
+        results = write_tabs(bm_manager, out)
     
     elif action == 'create':
-        # If called from Alfred with (null), show tabs
-        if len(sys.argv) > 1 and sys.argv[1] == '(null)':
-            logging.info("Alfred null argument, showing open tabs")
-            tabs = bm_manager.get_open_tabs()
-            logging.info(f"Found {len(tabs)} tabs")
-            if not tabs:
-                print(json.dumps({"items": [{"title": "No open tabs found"}]}))
-            else:
-                print(json.dumps({
-                    "items": [
-                        {
-                            "title": t['title'],
-                            "subtitle": t['url'],
-                            "arg": t['url'],
-                            "text": {
-                                "copy": t['url'],
-                                "largetype": t['title']
-                            }
-                        } for t in tabs
-                    ]
-                }))
-            return
-            
         # Get command arguments
-        cmd = ' '.join(sys.argv[2:]) if len(sys.argv) > 2 else ''
-        logging.info(f"Create command: '{cmd}'")
+        cmd = ' '.join(argv[2:]) if len(argv) > 2 else ''
+        logging.debug("Create command: '%s'", cmd)
         
         # If no arguments provided, show open tabs
         if not cmd:
-            logging.info("No command arguments, showing open tabs")
-            tabs = bm_manager.get_open_tabs()
-            logging.info(f"Found {len(tabs)} tabs")
-            if not tabs:
-                print(json.dumps({"items": [{"title": "No open tabs found"}]}))
-            else:
-                print(json.dumps({
-                    "items": [
-                        {
-                            "title": t['title'],
-                            "subtitle": t['url'],
-                            "arg": t['url'],
-                            "text": {
-                                "copy": t['url'],
-                                "largetype": t['title']
-                            }
-                        } for t in tabs
-                    ]
-                }))
-            return
-
-        # Parse and create bookmark if arguments provided
-        params = parse_bookmark_command(cmd)
-        if params:
-            success = bm_manager.create_bookmark(
-                params['url'],
-                params['folder_path'],
-                params['title']
-            )
-            if success:
-                print(json.dumps({"items": [{"title": "Bookmark Created Successfully"}]}))
-            else:
-                print(json.dumps({"items": [{"title": "Failed to Create Bookmark"}]}))
+            logging.debug("No command arguments, showing open tabs")
+            results = write_tabs(bm_manager, out, "No open tabs found")
+        else:
+            # Parse and create bookmark if arguments provided
+            params = parse_bookmark_command(cmd)
+            if params:
+                success = bm_manager.create_bookmark(
+                    params['url'],
+                    params['folder_path'],
+                    params['title']
+                )
+                if success:
+                    write_response([message_fragment("Bookmark Created Successfully")], out)
+                else:
+                    write_response([message_fragment("Failed to Create Bookmark")], out)
+    
+    elif action == 'import':
+        # import <file> [folder]: bulk-add bookmarks from JSONL, CSV or HTML
+        if len(argv) < 3:
+            write_response([message_fragment("Usage: import <file> [folder]")], out)
+        else:
+            added, skipped = bm_manager.import_bookmarks(argv[2], *argv[3:4])
+            results = added
+            write_response([message_fragment(
+                f"Imported {added} bookmarks",
+                f"Skipped {skipped} already bookmarked or without a url"
+            )], out)
+    
+    elif action == 'dedupe':
+        # dedupe [--apply]: report duplicate bookmarks, or remove them
+        if '--apply' in argv[2:]:
+            groups, removed = bm_manager.remove_duplicates()
+            results = removed
+            write_response([message_fragment(
+                f"Removed {removed} duplicate bookmarks",
+                f"Kept one bookmark of each of {groups} groups"
+            )], out)
+        else:
+            groups = bm_manager.find_duplicates()
+            results = len(groups)
+            write_response(duplicate_fragments(groups), out)
+    
+    elif action == 'check-links':
+        # check-links [--refresh]: list bookmarks whose pages are gone
+        broken, checked = bm_manager.check_links('--refresh' in argv[2:])
+        results = len(broken)
+        write_response(broken_link_fragments(broken, checked), out)
     
     elif action == 'debug_paths':
         paths = bm_manager.debug_bookmark_paths()
-        print(json.dumps(paths))
+        out.write(json.dumps(paths) + '\n')
+
+    end_request(action, results)
+
+def main():
+    configure_logging()
+
+    # Add debug logging for command line arguments
+    logging.debug("Command line arguments: %s", sys.argv)
+
+    bm_manager = BookmarkManager()
+
+    # Resident mode: keep the index in memory and answer over a Unix socket
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        from bookmark_daemon import serve
+        serve(bm_manager, handle_command)
+        return
+
+    handle_command(bm_manager, sys.argv, sys.stdout)
+    # Answer Alfred first, then let late loads save their snapshots
+    sys.stdout.flush()
+    finish_late_loads()
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
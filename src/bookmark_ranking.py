@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import math
+import heapq
+from typing import Callable, Iterable, List, Tuple
+
+# Default number of results handed to Alfred, which only shows a screenful
+DEFAULT_MAX_RESULTS = 50
+
+# Match-quality tiers, best first
+SCORE_TITLE_PREFIX = 100
+SCORE_DOMAIN_PREFIX = 90
+SCORE_TITLE_WORD = 80
+SCORE_TITLE_ACRONYM = 70
+SCORE_DOMAIN = 60
+SCORE_TITLE = 50
+SCORE_PATH = 30
+SCORE_URL = 25
+SCORE_SUBSEQUENCE = 10
+
+# How strongly frecency lifts a match; logarithmic so that a heavily
+# visited page can overtake a slightly better match, not a much better one
+FRECENCY_WEIGHT = 0.25
+
+
+def get_max_results() -> int:
+    """
+    Get the result cap from the BM_MAX_RESULTS workflow variable
+    """
+    try:
+        value = int(os.environ.get('BM_MAX_RESULTS', DEFAULT_MAX_RESULTS))
+    except ValueError:
+        return DEFAULT_MAX_RESULTS
+    return value if value > 0 else DEFAULT_MAX_RESULTS
+
+
+def split_url(url: str) -> Tuple[str, str]:
+    """
+    Split a folded url into (domain, path) without a full URL parse
+    """
+    rest = url.split('://', 1)[-1]
+    slash = rest.find('/')
+    if slash < 0:
+        domain, path = rest, ''
+    else:
+        domain, path = rest[:slash], rest[slash:]
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return domain, path
+
+
+def at_word_boundary(text: str, query: str) -> bool:
+    """
+    Check whether query occurs in text at the start of a word
+    """
+    pos = text.find(query)
+    while pos > 0:
+        if not text[pos - 1].isalnum():
+            return True
+        pos = text.find(query, pos + 1)
+    return pos == 0
+
+
+def acronym(text: str) -> str:
+    """
+    Get the initials of the words in text
+    """
+    initials = []
+    in_word = False
+    for ch in text:
+        if ch.isalnum():
+            if not in_word:
+                initials.append(ch)
+            in_word = True
+        else:
+            in_word = False
+    return ''.join(initials)
+
+
+def subsequence_score(text: str, query: str) -> float:
+    """
+    Score query as an in-order subsequence of text, 0 if it is not one.
+    Tighter matches (shorter span) score higher.
+    """
+    pos = text.find(query[0])
+    if pos < 0:
+        return 0
+    start = pos
+    for ch in query[1:]:
+        pos = text.find(ch, pos + 1)
+        if pos < 0:
+            return 0
+    span = pos - start + 1
+    return SCORE_SUBSEQUENCE + SCORE_SUBSEQUENCE * len(query) / span
+
+
+def score_match(query: str, title: str, url: str) -> float:
+    """
+    Score how well a folded query matches a bookmark's folded title and
+    url (see bookmark_index.fold), 0 for no match
+    """
+    domain, path = split_url(url)
+
+    if title.startswith(query):
+        score = SCORE_TITLE_PREFIX
+    elif domain.startswith(query):
+        score = SCORE_DOMAIN_PREFIX
+    elif at_word_boundary(title, query):
+        score = SCORE_TITLE_WORD
+    elif acronym(title).startswith(query):
+        score = SCORE_TITLE_ACRONYM
+    elif query in domain:
+        score = SCORE_DOMAIN
+    elif query in title:
+        score = SCORE_TITLE
+    elif query in path:
+        score = SCORE_PATH
+    elif query in url:
+        score = SCORE_URL
+    else:
+        score = subsequence_score(title, query)
+        if not score:
+            return 0
+
+    # Prefer concise titles within a tier
+    return score + 1.0 / (1 + len(title))
+
+
+def frecency_boost(frecency: float) -> float:
+    """
+    Multiplier applied to a match score for a page with this frecency
+    """
+    return 1.0 + FRECENCY_WEIGHT * math.log1p(frecency)
+
+
+def top_k(ids: Iterable[int], score: Callable[[int], float],
+          k: int) -> List[Tuple[float, int]]:
+    """
+    Select the k best-scoring ids as (score, id) with a bounded heap instead
+    of a full sort. Ties keep ascending id order, alphabetical by title.
+    """
+    scored = ((score(i), -i) for i in ids)
+    return [(s, -neg_i) for s, neg_i in heapq.nlargest(k, (item for item in scored if item[0] > 0))]
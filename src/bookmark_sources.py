@@ -0,0 +1,248 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bookmark_cache import BookmarkSnapshotCache
+from bookmark_index import BookmarkIndex, QueryMemo
+from instrumentation import span
+
+# Seconds a search waits for a source before using its last snapshot
+DEFAULT_SOURCE_TIMEOUT = 0.5
+
+# Loads that missed their deadline and are still refreshing a snapshot
+_late_loads = []
+
+
+def get_source_timeout() -> float:
+    """
+    Get the per-search source deadline from the BM_SOURCE_TIMEOUT workflow variable
+    """
+    try:
+        value = float(os.environ.get('BM_SOURCE_TIMEOUT', DEFAULT_SOURCE_TIMEOUT))
+    except ValueError:
+        return DEFAULT_SOURCE_TIMEOUT
+    return value if value > 0 else DEFAULT_SOURCE_TIMEOUT
+
+
+class BookmarkSource(ABC):
+    """
+    One place bookmarks come from: a browser profile's bookmark store.
+
+    Subclasses say where the store lives and how to read it, implementing
+    read_source and extract (a subclass missing either can't be created);
+    this class puts the snapshot cache in front of it, so a store whose
+    (mtime_ns, size) is unchanged is never opened. A store that also carries a content checksum
+    (Chrome's) can reuse the snapshot after a touch without re-flattening.
+    Loads of one source are serialized, so a load still running in the
+    background after a missed deadline is never duplicated.
+    """
+
+    # Browser tag for results from this source
+    browser = None
+
+    def __init__(self, path: str, name: str):
+        self.path = path
+        self.name = name
+        self.snapshot_cache = BookmarkSnapshotCache(path)
+        # Lives as long as the source, so a resident daemon narrows each
+        # keystroke's search from the previous one
+        self.query_memo = QueryMemo()
+        self._lock = threading.Lock()
+
+    def stat_source(self) -> Optional[Tuple[int, int]]:
+        """
+        Get the key the snapshot is validated against, or None if missing
+        """
+        return self.snapshot_cache.stat_source()
+
+    @abstractmethod
+    def read_source(self) -> Tuple[Any, Optional[str]]:
+        """
+        Read the raw store, returning it with its content checksum, if any
+        """
+
+    @abstractmethod
+    def extract(self, data: Any) -> List[Dict[str, str]]:
+        """
+        Get {'id', 'title', 'url', 'folder'} dicts from what read_source
+        returned, folder being the '/'-separated path below the browser's
+        root folders. Stable ids let a change be patched into the index.
+        """
+
+    def load_index(self) -> BookmarkIndex:
+        """
+        Get the search index over this source's title-sorted bookmarks,
+        served from the snapshot cache unless the store changed
+        """
+        # Stat before reading so a concurrent rewrite invalidates next time
+        stat = self.stat_source()
+        if stat is None:
+            return BookmarkIndex.empty()
+
+        with span('snapshot'):
+            snapshot = self.snapshot_cache.load(stat)
+        if snapshot is None:
+            data, checksum = self.read_source()
+            snapshot = self.snapshot_cache.load_for_checksum(checksum)
+            if snapshot is not None:
+                logging.debug(f"{self}: touched but unchanged, reusing snapshot")
+                index = BookmarkIndex.from_snapshot(snapshot)
+                index.patch = (index.generation, array('I'))
+            else:
+                with span('flatten'):
+                    bookmarks = self.extract(data)
+                index = None
+                stale = self.snapshot_cache.read()
+                if stale is not None:
+                    with span('diff'):
+                        index = BookmarkIndex.from_snapshot(stale).patched(bookmarks)
+                if index is not None:
+                    logging.info(f"{self}: patched bookmark snapshot, "
+                                 f"{len(index.patch[1])} bookmarks added or changed")
+                else:
+                    logging.info(f"{self}: rebuilding bookmark snapshot")
+                    with span('index'):
+                        bookmarks.sort(key=lambda b: b['title'])
+                        index = BookmarkIndex.build(
+                            [b['title'] for b in bookmarks],
+                            [b['url'] for b in bookmarks],
+                            [b.get('folder', '') for b in bookmarks],
+                            [b.get('id', '') for b in bookmarks]
+                        )
+            with span('save'):
+                snapshot = self.snapshot_cache.save(stat, checksum, index.snapshot_fields())
+
+        return BookmarkIndex.from_snapshot(snapshot)
+
+    def load_cached(self) -> Optional[Tuple[BookmarkIndex, Dict[int, float], float,
+                                            Dict[int, str]]]:
+        """
+        Load from the last snapshot, however old, without touching the
+        store; None if there has never been one
+        """
+        snapshot = self.snapshot_cache.read()
+        if snapshot is None:
+            return None
+        return BookmarkIndex.from_snapshot(snapshot), {}, 1.0, {}
+
+    def get_frecency(self, index: BookmarkIndex) -> Tuple[Dict[int, float], float]:
+        """
+        Get {id: frecency} for the bookmarks in index and the factor that
+        decays the stored scores to now; sources without history have none
+        """
+        return {}, 1.0
+
+    def get_history_mirror(self):
+        """
+        Get the local mirror of this source's browsing history, or None
+        for sources whose history we don't read
+        """
+        return None
+
+    def get_icons(self, index: BookmarkIndex) -> Dict[int, str]:
+        """
+        Get {id: icon file path} for the bookmarks in index that have a
+        cached favicon; sources without favicons have none
+        """
+        return {}
+
+    def load(self) -> Tuple[BookmarkIndex, Dict[int, float], float, Dict[int, str]]:
+        """
+        Load everything a search needs from this source
+        """
+        with self._lock:
+            index = self.load_index()
+            frecency, decay = self.get_frecency(index)
+            icons = self.get_icons(index)
+        return index, frecency, decay, icons
+
+    def get_open_tabs(self) -> List[Dict[str, str]]:
+        return []
+
+    def __str__(self) -> str:
+        return f"{self.browser}:{self.name}"
+
+    # Lists of sources in lazily formatted log lines read as names too
+    __repr__ = __str__
+
+
+def map_sources(fn: Callable[[BookmarkSource], Any], sources: List[BookmarkSource],
+                timeout: float = None,
+                fallback: Callable[[BookmarkSource], Any] = None) -> List[Any]:
+    """
+    Apply fn to every source concurrently, each on its own daemon thread,
+    so the wall-clock time is that of the slowest source. Results keep
+    source order; a source whose fn raised gets None.
+
+    With a timeout, a source still running at the deadline gets
+    fallback(source) instead, unless that is None too, in which case we
+    keep waiting for it. The late thread carries on refreshing the
+    snapshot cache for the next search; a one-shot process must call
+    finish_late_loads after answering, or it would exit first and every
+    later search would serve the same stale snapshot.
+    """
+    if len(sources) <= 1 and timeout is None:
+        return [fn(source) for source in sources]
+
+    results = [None] * len(sources)
+
+    def run(pos: int, source: BookmarkSource):
+        try:
+            results[pos] = fn(source)
+        except Exception as e:
+            logging.error(f"Loading {source} failed: {e}")
+
+    threads = [
+        threading.Thread(target=run, args=(pos, source), daemon=True)
+        for pos, source in enumerate(sources)
+    ]
+    for thread in threads:
+        thread.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for thread in threads:
+        thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    output = []
+    for pos, source in enumerate(sources):
+        thread = threads[pos]
+        if thread.is_alive():
+            stale = fallback(source) if fallback else None
+            if stale is not None:
+                logging.warning(f"{source} missed the {timeout}s deadline, using its last snapshot")
+                _late_loads.append(thread)
+                output.append(stale)
+                continue
+            thread.join()
+        output.append(results[pos])
+    return output
+
+
+def finish_late_loads():
+    """
+    Wait for the loads that missed their deadline to save their snapshots
+    """
+    if _late_loads:
+        logging.debug("Waiting for %d late source loads", len(_late_loads))
+    while _late_loads:
+        _late_loads.pop().join()
+
+
+def discover_sources(user_dir: str) -> List[BookmarkSource]:
+    """
+    Find every bookmark source under a home directory: Chromium-family
+    profiles (Chrome first), then Firefox and Safari
+    """
+    from chrome_profiles import discover_chromium_profiles
+    from firefox_source import discover_firefox_profiles
+    from safari_source import discover_safari
+
+    return (discover_chromium_profiles(user_dir)
+            + discover_firefox_profiles(user_dir)
+            + discover_safari(user_dir))
@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import uuid
+import codecs
+import hashlib
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from bookmark_cache import atomic_write_bytes
+from chrome_tab_manager import chrome_time
+
+# Root folders in the order Chrome encodes (and checksums) them
+ROOT_KEYS = ('bookmark_bar', 'other', 'synced')
+
+
+def split_folder_path(folder_path: str) -> List[str]:
+    """
+    Split 'a/b/c' into folder names, ignoring empty segments
+    """
+    return [part for part in folder_path.split('/') if part]
+
+
+def compute_checksum(roots: Dict[str, Any]) -> str:
+    """
+    Compute Chrome's Bookmarks checksum: an MD5 over every node's id,
+    UTF-16 title and type (plus url for url nodes), depth first
+    """
+    md5 = hashlib.md5()
+
+    def update(node: Dict[str, Any]):
+        md5.update(node.get('id', '').encode('utf-8'))
+        md5.update(node.get('name', '').encode('utf-16-le'))
+        if node.get('type') == 'url':
+            md5.update(b'url')
+            md5.update(node.get('url', '').encode('utf-8'))
+        else:
+            md5.update(b'folder')
+            for child in node.get('children', []):
+                update(child)
+
+    for key in ROOT_KEYS:
+        if key in roots:
+            update(roots[key])
+    return md5.hexdigest()
+
+
+class BookmarkFile:
+    """
+    Editable Chrome Bookmarks document.
+
+    The whole document (version, sync metadata, ...) is kept as loaded and
+    written back with its top-level structure intact. Folder lookups go
+    through a per-folder {name: child folder} index built the first time a
+    folder is visited, so resolving a path is O(depth) after the first
+    lookup through each level. Saves recompute the checksum and replace
+    the file atomically.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.document = None
+        self._folders = {}
+        self._next_id = 1
+
+    def load(self) -> 'BookmarkFile':
+        with codecs.open(self.path, 'r', 'utf-8-sig') as f:
+            self.document = json.load(f)
+        self._folders = {}
+        self._next_id = max((int(node['id']) for node in self.nodes()
+                             if str(node.get('id', '')).isdigit()), default=0) + 1
+        return self
+
+    @property
+    def roots(self) -> Dict[str, Any]:
+        return self.document['roots']
+
+    def nodes(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over every node under the roots, depth first
+        """
+        stack = [self.roots[key] for key in reversed(ROOT_KEYS) if key in self.roots]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.get('children', [])))
+
+    def new_node(self, node_type: str, name: str, **fields: Any) -> Dict[str, Any]:
+        """
+        Create a node with a fresh id, guid and date_added
+        """
+        node = {
+            'date_added': str(chrome_time(time.time())),
+            'guid': str(uuid.uuid4()),
+            'id': str(self._next_id),
+            'name': name,
+            'type': node_type,
+        }
+        node.update(fields)
+        self._next_id += 1
+        return node
+
+    def _subfolders(self, folder: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        index = self._folders.get(id(folder))
+        if index is None:
+            index = {}
+            for child in folder.setdefault('children', []):
+                if child.get('type') == 'folder':
+                    # First match wins, as in a linear scan
+                    index.setdefault(child.get('name'), child)
+            self._folders[id(folder)] = index
+        return index
+
+    def folder(self, folder_path: str, root: str = 'bookmark_bar',
+               create: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Resolve a 'a/b/c' folder path under root, creating missing folders
+        """
+        node = self.roots[root]
+        for name in split_folder_path(folder_path):
+            subfolders = self._subfolders(node)
+            child = subfolders.get(name)
+            if child is None:
+                if not create:
+                    return None
+                child = self.new_node('folder', name, children=[],
+                                      date_modified=str(chrome_time(time.time())))
+                self.append(node, child)
+                subfolders[name] = child
+            node = child
+        return node
+
+    def append(self, folder: Dict[str, Any], node: Dict[str, Any]):
+        """
+        Append node to folder and mark the folder modified
+        """
+        folder.setdefault('children', []).append(node)
+        folder['date_modified'] = str(chrome_time(time.time()))
+
+    def add_url(self, folder_path: str, title: str, url: str) -> Dict[str, Any]:
+        """
+        Add a url bookmark at the end of folder_path, creating folders as needed
+        """
+        folder = self.folder(folder_path)
+        node = self.new_node('url', title, url=url)
+        self.append(folder, node)
+        return node
+
+    def remove(self, predicate: Callable[[Dict[str, Any]], bool]) -> int:
+        """
+        Remove every url node predicate selects, marking the folders they
+        were in modified, and return how many were removed
+        """
+        removed = 0
+        for node in self.nodes():
+            children = node.get('children')
+            if not children:
+                continue
+            kept = [child for child in children
+                    if child.get('type') != 'url' or not predicate(child)]
+            if len(kept) != len(children):
+                removed += len(children) - len(kept)
+                node['children'] = kept
+                node['date_modified'] = str(chrome_time(time.time()))
+        return removed
+
+    def save(self):
+        """
+        Write the document back compactly via temp file plus rename
+        """
+        if 'checksum' in self.document:
+            self.document['checksum'] = compute_checksum(self.roots)
+        data = json.dumps(self.document, ensure_ascii=False, separators=(',', ':'))
+        mode = os.stat(self.path).st_mode & 0o777
+        atomic_write_bytes(self.path, data.encode('utf-8'), mode, fsync=True)
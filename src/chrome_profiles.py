@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from bookmark_index import BookmarkIndex, flatten_bookmarks
+from bookmark_sources import BookmarkSource
+from chrome_tab_manager import ChromeTabManager
+from instrumentation import span
+
+# Chrome user data directory relative to HOME
+CHROME_DIR = 'Library/Application Support/Google/Chrome'
+
+DEFAULT_PROFILE = 'Default'
+
+# Browsers sharing Chrome's profile layout, with their user data directory
+# relative to HOME
+CHROMIUM_BROWSERS = [
+    ('chrome', CHROME_DIR),
+    ('chromium', 'Library/Application Support/Chromium'),
+    ('brave', 'Library/Application Support/BraveSoftware/Brave-Browser'),
+    ('edge', 'Library/Application Support/Microsoft Edge'),
+    ('arc', 'Library/Application Support/Arc/User Data'),
+]
+
+
+def read_bookmarks_document(path: str) -> Dict[str, Any]:
+    """
+    Get a whole Chrome bookmarks document, including checksum and version
+    """
+    try:
+        with span('read'), open(path, 'rb') as f:
+            data = f.read()
+        # json.loads detects the encoding of bytes and skips a UTF-8 BOM
+        with span('parse'):
+            return json.loads(data)
+    except Exception as e:
+        logging.error(f"Error reading Chrome bookmarks {path}: {e}")
+        return {}
+
+
+class ChromeProfile(BookmarkSource):
+    """
+    One Chromium-family profile: its Bookmarks file, and its History
+    through a per-profile ChromeTabManager
+    """
+
+    browser = 'chrome'
+
+    def __init__(self, chrome_dir: str, dir_name: str, name: str = None,
+                 browser: str = None):
+        super().__init__(os.path.join(chrome_dir, dir_name, 'Bookmarks'), name or dir_name)
+        self.dir_name = dir_name
+        self.browser = browser or self.browser
+        self.bookmarks_path = self.path
+        self.tab_manager = ChromeTabManager(dir_name, chrome_dir)
+        self.frecency_store = None
+        self.favicon_store = None
+
+    def read_source(self) -> Tuple[Dict[str, Any], Optional[str]]:
+        document = read_bookmarks_document(self.bookmarks_path)
+        return document, document.get('checksum')
+
+    def extract(self, document: Dict[str, Any]) -> List[Dict[str, str]]:
+        return flatten_bookmarks(document.get('roots', {}))
+
+    def get_frecency(self, index: BookmarkIndex) -> Tuple[Dict[int, float], float]:
+        """
+        Get precomputed {id: frecency} for the bookmarks in index, plus the
+        factor that decays those stored scores to the current time
+        """
+        history_path = self.tab_manager.chrome_tabs_db
+        if not os.path.exists(history_path):
+            return {}, 1.0
+        from frecency import FrecencyStore, decay_factor
+        if self.frecency_store is None:
+            self.frecency_store = FrecencyStore(history_path, self.tab_manager.get_history_mirror)
+        return (self.frecency_store.scores(index.generation, index.urls, index.patch),
+                decay_factor())
+
+    def get_history_mirror(self):
+        if not os.path.exists(self.tab_manager.chrome_tabs_db):
+            return None
+        return self.tab_manager.get_history_mirror()
+
+    def get_icons(self, index: BookmarkIndex) -> Dict[int, str]:
+        """
+        Get {id: icon path} for the bookmarks in index from the profile's
+        Favicons database, via the favicon cache
+        """
+        favicons_path = os.path.join(os.path.dirname(self.tab_manager.chrome_tabs_db), 'Favicons')
+        if not os.path.exists(favicons_path):
+            return {}
+        from favicons import FaviconStore
+        if self.favicon_store is None:
+            self.favicon_store = FaviconStore(favicons_path)
+        with span('favicons'):
+            return self.favicon_store.paths(index.generation, index.urls, index.patch)
+
+    def get_open_tabs(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return self.tab_manager.get_open_tabs()
+
+
+def discover_profiles(chrome_dir: str, browser: str = 'chrome') -> List[ChromeProfile]:
+    """
+    Find Chrome profiles from the Local State file, most recently used
+    first. Falls back to the Default profile when Local State is missing.
+    """
+    try:
+        with open(os.path.join(chrome_dir, 'Local State'), encoding='utf-8') as f:
+            profile_state = json.load(f).get('profile', {})
+    except (OSError, ValueError) as e:
+        logging.debug(f"No usable Chrome Local State, using Default profile: {e}")
+        profile_state = {}
+
+    info_cache = profile_state.get('info_cache', {})
+    order = list(profile_state.get('last_active_profiles', []))
+    order += [d for d in profile_state.get('profiles_order', []) if d not in order]
+    order += [d for d in sorted(info_cache) if d not in order]
+    if not order:
+        order = [DEFAULT_PROFILE]
+
+    profiles = [
+        ChromeProfile(chrome_dir, dir_name, info_cache.get(dir_name, {}).get('name'), browser)
+        for dir_name in order
+        if os.path.isdir(os.path.join(chrome_dir, dir_name))
+    ]
+    return profiles or [ChromeProfile(chrome_dir, DEFAULT_PROFILE, browser=browser)]
+
+
+def discover_chromium_profiles(user_dir: str) -> List[ChromeProfile]:
+    """
+    Find the profiles of every installed Chromium-family browser, Chrome
+    first. Chrome always yields at least its Default profile.
+    """
+    profiles = []
+    for browser, relative_dir in CHROMIUM_BROWSERS:
+        chrome_dir = os.path.join(user_dir, relative_dir)
+        if browser == 'chrome' or os.path.isdir(chrome_dir):
+            profiles.extend(discover_profiles(chrome_dir, browser))
+    return profiles
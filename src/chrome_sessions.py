@@ -0,0 +1,282 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import mmap
+import struct
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from bookmark_cache import cache_file_path, read_marshal, write_marshal
+from instrumentation import span
+
+# Bump whenever the cached tab layout changes
+SESSION_CACHE_VERSION = 1
+
+SNSS_MAGIC = b'SNSS'
+# 1 is the original format, 3 adds an initial-state marker command;
+# 2 is encrypted and cannot be read
+SUPPORTED_VERSIONS = (1, 3)
+
+# Session command ids (components/sessions/core/session_service_commands.cc)
+CMD_SET_TAB_WINDOW = 0
+CMD_SET_TAB_INDEX_IN_WINDOW = 2
+CMD_NAVIGATION_PRUNED_FROM_BACK = 5
+CMD_UPDATE_TAB_NAVIGATION = 6
+CMD_SET_SELECTED_NAVIGATION_INDEX = 7
+CMD_NAVIGATION_PRUNED_FROM_FRONT = 11
+CMD_SET_PINNED_STATE = 12
+CMD_TAB_CLOSED = 16
+CMD_WINDOW_CLOSED = 17
+CMD_LAST_ACTIVE_TIME = 21
+CMD_NAVIGATION_PRUNED = 24
+
+_u16 = struct.Struct('<H').unpack_from
+_i32 = struct.Struct('<i').unpack_from
+_two_i32 = struct.Struct('<ii').unpack_from
+_three_i32 = struct.Struct('<iii').unpack_from
+_i32_i64 = struct.Struct('<i4xq').unpack_from
+
+
+class SessionTab:
+    """
+    What the session log says about one tab so far. Navigations are kept
+    as {navigation index: (start, end) of its command payload} and only
+    the selected one is ever decoded.
+    """
+
+    __slots__ = ('window', 'index', 'selected', 'navigations', 'last_active', 'pinned')
+
+    def __init__(self):
+        self.window = None
+        self.index = 0
+        self.selected = None
+        self.navigations = {}
+        self.last_active = 0
+        self.pinned = False
+
+    def prune(self, index: int, count: int):
+        """
+        Drop navigations index..index+count-1, renumbering later ones
+        """
+        self.navigations = {
+            i if i < index else i - count: entry
+            for i, entry in self.navigations.items() if not index <= i < index + count
+        }
+        if self.selected is not None:
+            if self.selected >= index + count:
+                self.selected -= count
+            elif self.selected >= index:
+                self.selected = max(0, index - 1)
+
+
+def find_session_file(sessions_dir: str, legacy_path: str = None) -> Optional[str]:
+    """
+    Get the newest session log of a profile: Sessions/Session_<time> in
+    current Chrome, 'Current Session' in older versions
+    """
+    candidates = []
+    try:
+        with os.scandir(sessions_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('Session_'):
+                    candidates.append((entry.stat().st_mtime_ns, entry.path))
+    except OSError:
+        pass
+    if legacy_path:
+        try:
+            candidates.append((os.stat(legacy_path).st_mtime_ns, legacy_path))
+        except OSError:
+            pass
+    return max(candidates)[1] if candidates else None
+
+
+def read_pickle_string(buf, pos: int, end: int, wide: bool = False) -> Tuple[str, int]:
+    """
+    Read a base::Pickle string (UTF-8, or UTF-16 when wide) at pos,
+    returning it and the 4-byte aligned position after it
+    """
+    if pos + 4 > end:
+        raise ValueError('truncated pickle')
+    length = _i32(buf, pos)[0] * (2 if wide else 1)
+    pos += 4
+    if length < 0 or pos + length > end:
+        raise ValueError('bad pickle string length')
+    data = bytes(buf[pos:pos + length])
+    text = data.decode('utf-16-le' if wide else 'utf-8', 'replace')
+    return text, pos + ((length + 3) & ~3)
+
+
+def read_navigation(buf, start: int, end: int) -> Tuple[str, str]:
+    """
+    Decode (url, title) from an UpdateTabNavigation payload: a pickle of
+    tab id, navigation index, virtual url, title and fields we don't need
+    """
+    # Skip the pickle's payload size, the tab id and the navigation index
+    url, pos = read_pickle_string(buf, start + 12, end)
+    title, _ = read_pickle_string(buf, pos, end, wide=True)
+    return url, title
+
+
+def parse_session(buf) -> List[Dict[str, Any]]:
+    """
+    Replay an SNSS session command log and get its open tabs as
+    {'url', 'title', 'window', 'index', 'last_active', 'pinned'} dicts,
+    most recently active first.
+
+    One pass reads only the 3-byte command headers and the fixed-size
+    payloads that say which tabs are where; navigation payloads are just
+    located, and only each open tab's selected navigation is decoded.
+    A command cut short by a write in progress ends the log.
+    """
+    if len(buf) < 8 or bytes(buf[:4]) != SNSS_MAGIC:
+        raise ValueError('not an SNSS file')
+    version = _i32(buf, 4)[0]
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f'unsupported SNSS version {version}')
+
+    tabs = {}
+    closed_windows = set()
+
+    def tab(tab_id: int) -> SessionTab:
+        found = tabs.get(tab_id)
+        if found is None:
+            found = tabs[tab_id] = SessionTab()
+        return found
+
+    size = len(buf)
+    pos = 8
+    while pos + 2 <= size:
+        length = _u16(buf, pos)[0]
+        start = pos + 3
+        end = pos + 2 + length
+        if length == 0 or end > size:
+            break
+        command = buf[pos + 2]
+        pos = end
+        payload = end - start
+
+        if command == CMD_UPDATE_TAB_NAVIGATION:
+            if payload >= 12:
+                tab_id, nav_index = _two_i32(buf, start + 4)
+                tab(tab_id).navigations[nav_index] = (start, end)
+        elif command == CMD_SET_SELECTED_NAVIGATION_INDEX:
+            if payload >= 8:
+                tab_id, nav_index = _two_i32(buf, start)
+                tab(tab_id).selected = nav_index
+        elif command == CMD_SET_TAB_WINDOW:
+            if payload >= 8:
+                window_id, tab_id = _two_i32(buf, start)
+                tab(tab_id).window = window_id
+        elif command == CMD_SET_TAB_INDEX_IN_WINDOW:
+            if payload >= 8:
+                tab_id, index = _two_i32(buf, start)
+                tab(tab_id).index = index
+        elif command == CMD_TAB_CLOSED:
+            if payload >= 4:
+                tabs.pop(_i32(buf, start)[0], None)
+        elif command == CMD_WINDOW_CLOSED:
+            if payload >= 4:
+                closed_windows.add(_i32(buf, start)[0])
+        elif command == CMD_LAST_ACTIVE_TIME:
+            if payload >= 16:
+                tab_id, active = _i32_i64(buf, start)
+                tab(tab_id).last_active = active
+        elif command == CMD_SET_PINNED_STATE:
+            if payload >= 5:
+                tab(_i32(buf, start)[0]).pinned = bool(buf[start + 4])
+        elif command == CMD_NAVIGATION_PRUNED:
+            if payload >= 12:
+                tab_id, index, count = _three_i32(buf, start)
+                tab(tab_id).prune(index, count)
+        elif command == CMD_NAVIGATION_PRUNED_FROM_BACK:
+            if payload >= 8:
+                # Only the first `kept` navigations remain
+                tab_id, kept = _two_i32(buf, start)
+                state = tab(tab_id)
+                state.prune(kept, max(state.navigations, default=kept - 1) - kept + 1)
+        elif command == CMD_NAVIGATION_PRUNED_FROM_FRONT:
+            if payload >= 8:
+                tab_id, count = _two_i32(buf, start)
+                tab(tab_id).prune(0, count)
+
+    open_tabs = []
+    for tab_id, state in tabs.items():
+        if state.window is None or state.window in closed_windows or not state.navigations:
+            continue
+        entry = state.navigations.get(state.selected)
+        if entry is None:
+            # No selection recorded (or it was pruned): the latest navigation
+            entry = state.navigations[max(state.navigations)]
+        try:
+            url, title = read_navigation(buf, *entry)
+        except ValueError as e:
+            logging.debug(f"Skipping tab {tab_id}: {e}")
+            continue
+        open_tabs.append({
+            'url': url,
+            'title': title,
+            'window': state.window,
+            'index': state.index,
+            'last_active': state.last_active,
+            'pinned': state.pinned,
+        })
+    open_tabs.sort(key=lambda t: (-t['last_active'], t['window'], t['index']))
+    return open_tabs
+
+
+def read_session_tabs(path: str) -> List[Dict[str, Any]]:
+    """
+    Get the open tabs recorded in a session file, read through mmap
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return parse_session(buf)
+
+
+class SessionTabsCache:
+    """
+    The open tabs of a profile's newest session file, parsed only when
+    the file's (path, size, mtime) changes. The last result is kept in
+    memory for a resident daemon and in a marshal file for everyone else.
+    """
+
+    def __init__(self, sessions_dir: str, legacy_path: str = None, cache_dir: str = None):
+        self.sessions_dir = sessions_dir
+        self.legacy_path = legacy_path
+        self.cache_path = cache_file_path('sessions', sessions_dir, cache_dir=cache_dir)
+        self._cached = None
+
+    def read(self) -> Optional[Dict]:
+        if self._cached is None:
+            self._cached = read_marshal(self.cache_path, SESSION_CACHE_VERSION)
+        return self._cached
+
+    def tabs(self) -> List[Dict[str, Any]]:
+        """
+        Get the open tabs, most recently active first
+        """
+        path = find_session_file(self.sessions_dir, self.legacy_path)
+        if path is None:
+            logging.debug(f"No session file in {self.sessions_dir}")
+            return []
+        try:
+            st = os.stat(path)
+        except OSError:
+            return []
+        key = (path, st.st_size, st.st_mtime_ns)
+        cached = self.read()
+        if cached is not None and tuple(cached['key']) == key:
+            return cached['tabs']
+
+        with span('sessions'):
+            tabs = read_session_tabs(path)
+        logging.info(f"Read {len(tabs)} open tabs from {os.path.basename(path)}")
+        self._cached = {'version': SESSION_CACHE_VERSION, 'key': key, 'tabs': tabs}
+        try:
+            write_marshal(self.cache_path, self._cached)
+        except OSError as e:
+            logging.error(f"Error caching open tabs: {e}")
+        return tabs
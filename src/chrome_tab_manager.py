@@ -2,83 +2,58 @@
 # -*- coding: utf-8 -*-
 
 import os
-import sqlite3
-import json
 import logging
-import time
-import glob
-from typing import List, Dict, Optional
-from pathlib import Path
+from typing import List, Dict
+
+def chrome_time(unix_time: float) -> int:
+    """
+    Convert a Unix timestamp to Chrome's microseconds since 1601-01-01
+    """
+    return int(unix_time * 1000000 + 11644473600000000)
 
 class ChromeTabManager:
-    def __init__(self):
+    def __init__(self, profile_dir: str = 'Default', chrome_dir: str = None):
         self.user_dir = os.path.expanduser('~')
-        self.chrome_state_dir = os.path.join(
-            self.user_dir,
-            'Library/Application Support/Google/Chrome/Default/Sessions'
-        )
-        self.chrome_snss_file = os.path.join(
-            self.user_dir,
-            'Library/Application Support/Google/Chrome/Default/Current Session'
-        )
-        self.chrome_tabs_db = os.path.join(
+        self.chrome_dir = chrome_dir or os.path.join(
             self.user_dir,
-            'Library/Application Support/Google/Chrome/Default/History'
+            'Library/Application Support/Google/Chrome'
         )
-        
+        self.chrome_state_dir = os.path.join(self.chrome_dir, profile_dir, 'Sessions')
+        self.chrome_snss_file = os.path.join(self.chrome_dir, profile_dir, 'Current Session')
+        self.chrome_tabs_db = os.path.join(self.chrome_dir, profile_dir, 'History')
+        self.history_mirror = None
+        self.session_tabs = None
+
+    def get_history_mirror(self):
+        """
+        Get the incremental local mirror of the History database
+        """
+        if self.history_mirror is None:
+            from history_mirror import HistoryMirror
+            self.history_mirror = HistoryMirror(self.chrome_tabs_db)
+        return self.history_mirror
+
     def get_open_tabs(self) -> List[Dict[str, str]]:
         """
-        Get all open Chrome tabs from the current session using SQLite database
+        Get the open Chrome tabs of this profile from its session file,
+        most recently active first
         """
         try:
-            if not os.path.exists(self.chrome_tabs_db):
-                logging.error(f"Chrome history database not found at: {self.chrome_tabs_db}")
-                return []
+            if self.session_tabs is None:
+                from chrome_sessions import SessionTabsCache
+                self.session_tabs = SessionTabsCache(self.chrome_state_dir, self.chrome_snss_file)
 
-            # Create a temporary copy of the database since Chrome might lock it
-            temp_db = "/tmp/chrome_history_temp"
-            os.system(f"cp '{self.chrome_tabs_db}' '{temp_db}'")
-            
-            tabs = []
-            try:
-                conn = sqlite3.connect(temp_db)
-                cursor = conn.cursor()
-                
-                # Query for recently accessed tabs (within last hour)
-                cursor.execute("""
-                    SELECT title, url 
-                    FROM urls 
-                    WHERE last_visit_time > ? 
-                    ORDER BY last_visit_time DESC 
-                    LIMIT 20
-                """, (int((time.time() - 3600) * 1000000 + 11644473600000000),))
-                
-                for row in cursor.fetchall():
-                    title, url = row
-                    if url and url.startswith('http'):
-                        tabs.append({
-                            'title': title or url.split('/')[-1] or url,
-                            'url': url,
-                            'source': 'chrome_tab'
-                        })
-                
-                conn.close()
-                
-            except sqlite3.Error as e:
-                logging.error(f"SQLite error: {e}")
-            finally:
-                try:
-                    os.remove(temp_db)
-                except:
-                    pass
-            
-            # Log the results for debugging
-            logging.info(f"Found {len(tabs)} open tabs")
-            for tab in tabs:
-                logging.info(f"Tab: {tab['title']} - {tab['url']}")
-            
+            tabs = [
+                {
+                    'title': tab['title'] or tab['url'],
+                    'url': tab['url'],
+                    'source': 'chrome_tab'
+                }
+                for tab in self.session_tabs.tabs() if tab['url'].startswith('http')
+            ]
+            logging.debug("Found %d open tabs", len(tabs))
             return tabs
-            
+
         except Exception as e:
             logging.error(f"Error getting open tabs: {e}")
             return []
@@ -87,49 +62,14 @@ class ChromeTabManager:
         """
         Create a new bookmark in Chrome with the specified folder structure
         """
+        from bookmark_writer import BookmarkFile
+
         try:
-            # Get current bookmarks
-            bookmarks = bookmark_manager.get_json_from_file()
-            
-            # Navigate to or create folder structure
-            current_node = bookmarks['bookmark_bar']
-            folder_parts = folder_path.split('/')
-            
-            for folder in folder_parts:
-                # Find or create folder
-                folder_found = False
-                if 'children' not in current_node:
-                    current_node['children'] = []
-                
-                for child in current_node['children']:
-                    if child['type'] == 'folder' and child['name'] == folder:
-                        current_node = child
-                        folder_found = True
-                        break
-                
-                if not folder_found:
-                    new_folder = {
-                        'type': 'folder',
-                        'name': folder,
-                        'children': []
-                    }
-                    current_node['children'].append(new_folder)
-                    current_node = new_folder
-            
-            # Add bookmark to final folder
-            bookmark = {
-                'type': 'url',
-                'name': title,
-                'url': url
-            }
-            current_node['children'].append(bookmark)
-            
-            # Save updated bookmarks
-            with open(bookmark_manager.chrome_path, 'w', encoding='utf-8') as f:
-                json.dump({'roots': bookmarks}, f, indent=2)
-            
+            bookmarks = BookmarkFile(bookmark_manager.chrome_path).load()
+            bookmarks.add_url(folder_path, title, url)
+            bookmarks.save()
             return True
             
         except Exception as e:
             logging.error(f"Error creating bookmark: {e}")
-            return False 
\ No newline at end of file
+            return False
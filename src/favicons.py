@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bookmark_cache import (
+    atomic_write_bytes, cache_file_path, get_cache_dir, read_marshal, write_marshal
+)
+from instrumentation import span
+
+# Bump whenever the stored layout changes
+FAVICON_VERSION = 1
+
+# Seconds between checks of the Favicons database for new icons
+DEFAULT_REFRESH_INTERVAL = 3600
+
+# Alfred shows icons at 32pt, 64px on Retina screens: use the smallest
+# bitmap at least this wide, or the widest there is
+PREFERRED_WIDTH = 64
+
+# Icons are stored once per content hash in this subdirectory of the cache
+ICON_DIR = 'icons'
+
+
+def pick_bitmaps(rows: Iterable[Tuple[str, bytes, int]]) -> Dict[str, bytes]:
+    """
+    Choose one bitmap per page from (page url, image data, width) rows
+    """
+    best = {}
+    for page_url, data, width in rows:
+        if not data:
+            continue
+        current = best.get(page_url)
+        if current is None:
+            best[page_url] = (width, data)
+            continue
+        # Prefer big enough over too small, then the smaller of two big enough
+        if (width >= PREFERRED_WIDTH) != (current[0] >= PREFERRED_WIDTH):
+            better = width >= PREFERRED_WIDTH
+        elif width >= PREFERRED_WIDTH:
+            better = width < current[0]
+        else:
+            better = width > current[0]
+        if better:
+            best[page_url] = (width, data)
+    return {page_url: data for page_url, (_, data) in best.items()}
+
+
+class FaviconStore:
+    """
+    Chrome favicons for bookmarked URLs, as files in a content-addressed
+    icon directory plus {bookmark id: icon path} in a marshal file next to
+    the bookmark snapshot.
+
+    A refresh reads the bitmaps of every bookmarked url from the Favicons
+    database in one batched join and writes each distinct image once,
+    named by its hash. It runs when the bookmark index changed, or every
+    refresh_interval seconds if the database changed since the last one;
+    a patched index only looks up the urls that were added. Searches read
+    the stored dict, so an icon costs one lookup per result and sqlite3 is
+    only imported for refreshes.
+    """
+
+    def __init__(self, favicons_path: str, cache_dir: str = None,
+                 refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
+        self.favicons_path = favicons_path
+        self.refresh_interval = refresh_interval
+        cache_dir = cache_dir or get_cache_dir()
+        self.cache_path = cache_file_path('favicons', favicons_path, cache_dir=cache_dir)
+        self.icon_dir = os.path.join(cache_dir, ICON_DIR)
+        self._data = None
+
+    def read(self) -> Dict:
+        if self._data is None:
+            self._data = read_marshal(self.cache_path, FAVICON_VERSION) or {
+                'version': FAVICON_VERSION,
+                'generation': None,
+                'stat': None,
+                'refreshed_at': 0,
+                'by_id': {},
+            }
+        return self._data
+
+    def stat_favicons(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.favicons_path)
+        except OSError:
+            return None
+        # Chrome writes through the WAL, which the main file's stat misses
+        try:
+            wal = os.stat(self.favicons_path + '-wal')
+            return st.st_mtime_ns, st.st_size, wal.st_mtime_ns, wal.st_size
+        except OSError:
+            return st.st_mtime_ns, st.st_size
+
+    def paths(self, generation, urls: Sequence[str], patch: Tuple = None) -> Dict[int, str]:
+        """
+        Get {bookmark id: icon path} for the bookmark index identified by
+        generation, refreshing from the Favicons database first when due.
+        patch is the index's (generation patched, ids added), as for
+        FrecencyStore.scores.
+        """
+        data = self.read()
+        now = time.time()
+        stale = data['generation'] != generation
+        try:
+            if stale and patch is not None and data['generation'] == patch[0]:
+                self.update(generation, urls, patch[1], extend=True)
+            elif stale or (now - data['refreshed_at'] >= self.refresh_interval
+                           and self.stat_favicons() != data['stat']):
+                self.update(generation, urls, range(len(urls)))
+        except Exception as e:
+            logging.error(f"Error refreshing favicons: {e}")
+            # A broken Favicons database is next read after refresh_interval
+            data['refreshed_at'] = now
+        if data['generation'] != generation:
+            return {}
+        return data['by_id']
+
+    def icon_path(self, image: bytes) -> str:
+        """
+        Store an image under its hash, once, and get its path
+        """
+        import hashlib
+
+        path = os.path.join(self.icon_dir, hashlib.sha1(image).hexdigest() + '.png')
+        if not os.path.exists(path):
+            atomic_write_bytes(path, image)
+        return path
+
+    def read_bitmaps(self, page_urls: Iterable[str]) -> List[Tuple[str, bytes, int]]:
+        """
+        Get (page url, image data, width) for every favicon bitmap of
+        page_urls, in one batched join
+        """
+        # Only refreshes pay for importing sqlite3
+        from readonly_db import open_readonly
+
+        with span('sqlite'), open_readonly(self.favicons_path) as conn:
+            conn.execute("CREATE TEMP TABLE wanted_urls(url TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO wanted_urls(url) VALUES (?)",
+                             ((url,) for url in page_urls))
+            return conn.execute("""
+                SELECT m.page_url, b.image_data, b.width
+                FROM icon_mapping m
+                JOIN wanted_urls w ON w.url = m.page_url
+                JOIN favicon_bitmaps b ON b.icon_id = m.icon_id
+            """).fetchall()
+
+    def update(self, generation, urls: Sequence[str], ids: Iterable[int], extend: bool = False):
+        """
+        Look up the icons of the bookmarks ids, replacing the stored paths,
+        or adding to them when extend (the other ids are unchanged)
+        """
+        data = self.read()
+        stat = self.stat_favicons()
+        ids = list(ids)
+        by_id = data['by_id'] if extend else {}
+        if stat is not None and ids:
+            bitmaps = pick_bitmaps(self.read_bitmaps({urls[i] for i in ids}))
+            os.makedirs(self.icon_dir, exist_ok=True)
+            paths = {url: self.icon_path(image) for url, image in bitmaps.items()}
+            for i in ids:
+                path = paths.get(urls[i])
+                if path is not None:
+                    by_id[i] = path
+            logging.info(f"Favicons {'added' if extend else 'read'} for {len(paths)} urls")
+        data['by_id'] = by_id
+        data['generation'] = generation
+        if not extend:
+            data['stat'] = stat
+            data['refreshed_at'] = time.time()
+        write_marshal(self.cache_path, data)
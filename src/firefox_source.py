@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from bookmark_sources import BookmarkSource
+from instrumentation import span
+
+# Firefox profiles directory relative to HOME
+FIREFOX_PROFILES_DIR = 'Library/Application Support/Firefox/Profiles'
+
+# Url bookmarks with the '/'-separated path of their folder below the
+# top-level folders (menu, toolbar, other, mobile); the tags root is not
+# walked, so the copies of tagged bookmarks under it are left out
+BOOKMARKS_QUERY = """
+WITH RECURSIVE folders(id, path, depth) AS (
+  SELECT id, '', 0 FROM moz_bookmarks WHERE guid = 'root________'
+  UNION ALL
+  SELECT b.id,
+         CASE WHEN f.depth = 0 THEN ''
+              WHEN f.path = '' THEN coalesce(b.title, '')
+              ELSE f.path || '/' || coalesce(b.title, '') END,
+         f.depth + 1
+  FROM moz_bookmarks b JOIN folders f ON b.parent = f.id
+  WHERE b.type = 2 AND b.guid IS NOT 'tags________'
+)
+SELECT b.id, b.title, p.url, f.path
+FROM moz_bookmarks b
+JOIN moz_places p ON p.id = b.fk
+JOIN folders f ON f.id = b.parent
+WHERE b.type = 1
+  AND p.url NOT LIKE 'place:%'
+"""
+
+
+class FirefoxProfile(BookmarkSource):
+    """
+    One Firefox profile, read from its places.sqlite
+    """
+
+    browser = 'firefox'
+
+    def __init__(self, profile_dir: str):
+        # Profile directories are named '<salt>.<profile name>'
+        dir_name = os.path.basename(profile_dir)
+        super().__init__(os.path.join(profile_dir, 'places.sqlite'),
+                         dir_name.split('.', 1)[-1])
+
+    def stat_source(self) -> Optional[Tuple[int, int]]:
+        """
+        Key the snapshot on places.sqlite and its WAL together: Firefox
+        keeps the database in WAL mode, so recent bookmarks may only be in
+        the WAL while the main file is untouched
+        """
+        stat = self.snapshot_cache.stat_source()
+        if stat is None:
+            return None
+        try:
+            wal = os.stat(self.path + '-wal')
+        except OSError:
+            return stat
+        return (max(stat[0], wal.st_mtime_ns), stat[1] + wal.st_size)
+
+    def read_source(self) -> Tuple[List[Tuple[int, str, str, str]], None]:
+        from readonly_db import open_readonly
+
+        with span('sqlite'), open_readonly(self.path) as conn:
+            return conn.execute(BOOKMARKS_QUERY).fetchall(), None
+
+    def extract(self, rows: List[Tuple[int, str, str, str]]) -> List[Dict[str, str]]:
+        return [{'id': str(row_id), 'title': title or url, 'url': url, 'folder': folder}
+                for row_id, title, url, folder in rows]
+
+
+def discover_firefox_profiles(user_dir: str) -> List[FirefoxProfile]:
+    """
+    Find Firefox profiles that have a places.sqlite
+    """
+    profiles_dir = os.path.join(user_dir, FIREFOX_PROFILES_DIR)
+    try:
+        names = sorted(os.listdir(profiles_dir))
+    except OSError:
+        return []
+    profiles = [
+        FirefoxProfile(os.path.join(profiles_dir, name))
+        for name in names
+        if os.path.exists(os.path.join(profiles_dir, name, 'places.sqlite'))
+    ]
+    logging.debug("Firefox profiles: %s", profiles)
+    return profiles
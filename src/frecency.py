@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from bookmark_cache import cache_file_path, read_marshal, write_marshal
+from chrome_tab_manager import chrome_time
+
+# Bump whenever the stored score layout or formula changes
+FRECENCY_VERSION = 2
+
+# A visit's weight halves every this many seconds
+HALF_LIFE = 30 * 86400
+
+# Scores are stored as decayed value at this fixed Chrome time (2024-01-01).
+# Decaying all scores to "now" multiplies them by the same factor, so stored
+# scores never need rewriting just because time passed.
+REFERENCE_TIME = chrome_time(1704067200)
+
+# Seconds between incremental refreshes from the History mirror
+DEFAULT_REFRESH_INTERVAL = 300
+
+# Seconds between full recomputations, which also drop expired visits
+FULL_REFRESH_INTERVAL = 86400
+
+# Chrome page transition core types (transition & 0xff) and their weights
+TRANSITION_CORE_MASK = 0xff
+TRANSITION_WEIGHTS = {
+    0: 1.0,   # LINK
+    1: 2.0,   # TYPED
+    2: 1.5,   # AUTO_BOOKMARK
+    8: 1.5,   # KEYWORD
+    9: 1.5,   # KEYWORD_GENERATED
+}
+DEFAULT_TRANSITION_WEIGHT = 0.5
+
+
+def visit_weight(visit_time: int, transition: int) -> float:
+    """
+    Weight of one visit, decayed relative to REFERENCE_TIME
+    """
+    weight = TRANSITION_WEIGHTS.get(transition & TRANSITION_CORE_MASK, DEFAULT_TRANSITION_WEIGHT)
+    return weight * 2.0 ** ((visit_time - REFERENCE_TIME) / (HALF_LIFE * 1000000))
+
+
+def decay_factor(now: float = None) -> float:
+    """
+    Factor turning stored reference-time scores into scores at Unix time now
+    """
+    now_chrome = chrome_time(time.time() if now is None else now)
+    return 2.0 ** (-(now_chrome - REFERENCE_TIME) / (HALF_LIFE * 1000000))
+
+
+def score_visits(rows: List[tuple]) -> Dict[str, float]:
+    """
+    Turn (url, visit_count, typed_count, visit_time, transition) join rows
+    into frecency scores: the mean decayed visit weight, scaled by the total
+    visit count and boosted by the share of typed visits
+    """
+    sums = {}
+    samples = {}
+    counts = {}
+    for url, visit_count, typed_count, visit_time, transition in rows:
+        sums[url] = sums.get(url, 0.0) + visit_weight(visit_time, transition)
+        samples[url] = samples.get(url, 0) + 1
+        counts[url] = (visit_count, typed_count)
+    scores = {}
+    for url, total in sums.items():
+        visit_count, typed_count = counts[url]
+        visit_count = max(visit_count, samples[url])
+        scores[url] = visit_count * (total / samples[url]) * (1 + typed_count / visit_count)
+    return scores
+
+
+class FrecencyStore:
+    """
+    Precomputed frecency scores for bookmarked URLs, kept in a marshal file
+    next to the bookmark snapshot.
+
+    Scores are refreshed from the History mirror at most every
+    refresh_interval seconds: incrementally (only pages visited since the
+    last refresh) while the bookmark index is unchanged, fully when it
+    changed. Between refreshes, ranking reads the stored dict only and
+    the History mirror (and sqlite3) is never loaded.
+    """
+
+    def __init__(self, history_path: str, get_mirror: Callable, cache_dir: str = None,
+                 refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
+        self.get_mirror = get_mirror
+        self.refresh_interval = refresh_interval
+        self.cache_path = cache_file_path('frecency', history_path, cache_dir=cache_dir)
+        self._data = None
+
+    def read(self) -> Dict:
+        if self._data is None:
+            self._data = read_marshal(self.cache_path, FRECENCY_VERSION) or {
+                'version': FRECENCY_VERSION,
+                'generation': None,
+                'watermark': 0,
+                'refreshed_at': 0,
+                'full_refreshed_at': 0,
+                'scores': {},
+                'by_id': {},
+            }
+        return self._data
+
+    def scores(self, generation, urls: Sequence[str], patch: Tuple = None) -> Dict[int, float]:
+        """
+        Get {bookmark id: score at REFERENCE_TIME} for the bookmark index
+        identified by generation, refreshing from History first when due.
+        Keying by id lets ranking skip decoding each candidate's url.
+        patch is the index's (generation patched, ids added), if it was
+        patched from the index these scores are for: then only the added
+        ids are scored.
+        """
+        data = self.read()
+        now = time.time()
+        if patch is not None and data['generation'] == patch[0] != generation:
+            try:
+                self.extend(generation, urls, patch[1])
+            except Exception as e:
+                logging.error(f"Error extending frecency: {e}")
+        if data['generation'] != generation or now - data['refreshed_at'] >= self.refresh_interval:
+            try:
+                self.refresh(generation, urls, now)
+            except Exception as e:
+                logging.error(f"Error refreshing frecency: {e}")
+                # Wait out refresh_interval before trying History again
+                data['refreshed_at'] = now
+        if data['generation'] != generation:
+            # Ids from another index would point at the wrong bookmarks
+            return {}
+        return data['by_id']
+
+    def extend(self, generation, urls: Sequence[str], added: Iterable[int]):
+        """
+        Carry the scores over to a patched index, whose other ids are
+        unchanged, scoring the urls of the added ids
+        """
+        data = self.read()
+        added = list(added)
+        new_urls = {urls[i] for i in added}
+        if new_urls:
+            data['scores'].update(score_visits(self.get_mirror().visits_for_urls(new_urls)))
+        scores = data['scores']
+        for i in added:
+            url = urls[i]
+            if url in scores:
+                data['by_id'][i] = scores[url]
+        data['generation'] = generation
+        write_marshal(self.cache_path, data)
+
+    def refresh(self, generation, urls: Iterable[str], now: float):
+        data = self.read()
+        full = (data['generation'] != generation
+                or now - data['full_refreshed_at'] >= FULL_REFRESH_INTERVAL)
+
+        mirror = self.get_mirror()
+        mirror.refresh()
+        since = 0 if full else data['watermark']
+        watermark = mirror.get_meta('watermark')
+        updated = score_visits(mirror.visits_for_urls(urls, since))
+
+        if full:
+            data['scores'] = updated
+            data['full_refreshed_at'] = now
+        else:
+            data['scores'].update(updated)
+        scores = data['scores']
+        data['by_id'] = {i: scores[url] for i, url in enumerate(urls) if url in scores}
+        data['generation'] = generation
+        data['watermark'] = watermark
+        data['refreshed_at'] = now
+        write_marshal(self.cache_path, data)
+        logging.info(f"Frecency {'rebuilt' if full else 'updated'} for {len(updated)} urls")
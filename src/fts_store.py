@@ -0,0 +1,257 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import time
+import logging
+import sqlite3
+from typing import Iterable, List, Optional, Tuple
+
+from bookmark_cache import get_cache_dir
+from instrumentation import span
+
+# Bump whenever the schema changes; the database is then rebuilt
+FTS_VERSION = 1
+
+# Seconds between syncs of visited pages from the History mirrors
+DEFAULT_HISTORY_INTERVAL = 300
+
+# BM25 weights of the title, url and folder columns
+BM25_WEIGHTS = (10.0, 2.0, 4.0)
+
+# BM25 scores are negative, better matches more so: bookmarks are scaled
+# by this to rank above history pages that match as well
+BOOKMARK_BOOST = 2.0
+
+# Rows fetched per result wanted, since urls in several places collapse
+OVERFETCH = 3
+
+FTS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value);
+    CREATE TABLE IF NOT EXISTS docs(
+        id INTEGER PRIMARY KEY,
+        source TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        title TEXT NOT NULL,
+        url TEXT NOT NULL,
+        folder TEXT NOT NULL DEFAULT '',
+        UNIQUE(source, kind, key)
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+        title, url, folder,
+        content='docs', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER IF NOT EXISTS docs_insert AFTER INSERT ON docs BEGIN
+        INSERT INTO docs_fts(rowid, title, url, folder)
+        VALUES (new.id, new.title, new.url, new.folder);
+    END;
+    CREATE TRIGGER IF NOT EXISTS docs_delete AFTER DELETE ON docs BEGIN
+        INSERT INTO docs_fts(docs_fts, rowid, title, url, folder)
+        VALUES ('delete', old.id, old.title, old.url, old.folder);
+    END;
+    CREATE TRIGGER IF NOT EXISTS docs_update AFTER UPDATE ON docs BEGIN
+        INSERT INTO docs_fts(docs_fts, rowid, title, url, folder)
+        VALUES ('delete', old.id, old.title, old.url, old.folder);
+        INSERT INTO docs_fts(rowid, title, url, folder)
+        VALUES (new.id, new.title, new.url, new.folder);
+    END;
+"""
+
+SEARCH = f"""
+    SELECT d.source, d.kind, d.title, d.url, d.folder
+    FROM docs_fts f
+    JOIN docs d ON d.id = f.rowid
+    WHERE docs_fts MATCH ?
+    ORDER BY bm25(docs_fts, {', '.join(map(str, BM25_WEIGHTS))})
+             * CASE d.kind WHEN 'bookmark' THEN {BOOKMARK_BOOST} ELSE 1.0 END
+    LIMIT ?
+"""
+
+_TOKEN = re.compile(r'\w+')
+
+
+def match_expression(clauses: Iterable[Tuple[Optional[str], str, bool]]) -> Optional[str]:
+    """
+    Turn (column or None, text, negate) clauses of a compiled query into
+    an FTS5 MATCH expression: each clause's words as a phrase whose last
+    word may be a prefix, limited to column if given, and the negated ones
+    excluded with NOT. None if no clause requires any words.
+    """
+    required = []
+    excluded = []
+    for column, text, negate in clauses:
+        tokens = _TOKEN.findall(text)
+        if not tokens:
+            continue
+        phrase = '"' + ' '.join(tokens) + '"*'
+        if column is not None:
+            phrase = f'{column} : {phrase}'
+        (excluded if negate else required).append(phrase)
+    if not required:
+        return None
+    return ' '.join([f"({' AND '.join(required)})"] + [f'NOT {phrase}' for phrase in excluded])
+
+
+class FtsStore:
+    """
+    Optional full-text search database (BM_SEARCH_BACKEND=fts): an FTS5
+    table over the bookmark titles, urls and folder paths of every source
+    and the page titles in each Chrome profile's History.
+
+    Syncs are incremental. A source's bookmarks are only re-read when its
+    store's stat changes, then diffed against the stored rows by node id.
+    History pages come from the profile's HistoryMirror, past a watermark,
+    every history_interval seconds; reconciling drops pages the mirror
+    expired. A search is then one BM25-ranked MATCH with a LIMIT, whose
+    cost depends on how many pages match, not on how many there are.
+    """
+
+    def __init__(self, cache_dir: str = None,
+                 history_interval: float = DEFAULT_HISTORY_INTERVAL):
+        self.db_path = os.path.join(cache_dir or get_cache_dir(), 'search.sqlite')
+        self.history_interval = history_interval
+        self._conn = None
+
+    def connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != FTS_VERSION:
+                conn.executescript("""
+                    DROP TABLE IF EXISTS docs_fts;
+                    DROP TABLE IF EXISTS docs;
+                    DROP TABLE IF EXISTS meta;
+                """)
+            conn.executescript(FTS_SCHEMA)
+            conn.execute(f"PRAGMA user_version = {FTS_VERSION}")
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get_meta(self, key: str, default=None):
+        row = self.connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value):
+        self.connect().execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)",
+                               (key, value))
+
+    def sync(self, sources: List) -> bool:
+        """
+        Bring every source's bookmarks, and its history if due, up to date.
+        Returns whether anything was written.
+        """
+        changed = False
+        now = time.time()
+        for source in sources:
+            try:
+                changed |= self.sync_bookmarks(source)
+                mirror = source.get_history_mirror()
+                if mirror is not None and \
+                        now - self.get_meta(f'history_at:{source}', 0) >= self.history_interval:
+                    changed |= self.sync_history(source, mirror, now)
+            except Exception as e:
+                logging.error(f"Error syncing {source} to the search database: {e}")
+        return changed
+
+    def sync_bookmarks(self, source) -> bool:
+        """
+        Re-read source's bookmarks if its store changed, and apply the
+        difference to the stored rows
+        """
+        stat = source.stat_source()
+        stat_key = repr(stat)
+        if self.get_meta(f'stat:{source}') == stat_key:
+            return False
+
+        index = source.load_index()
+        name = str(source)
+        wanted = {}
+        for i in index.order:
+            url = index.urls[i]
+            wanted[index.node_ids[i] or url] = (index.titles[i], url, index.folders[i])
+
+        conn = self.connect()
+        with span('sqlite'), conn:
+            stored = {
+                key: (row_id, (title, url, folder))
+                for row_id, key, title, url, folder in conn.execute(
+                    "SELECT id, key, title, url, folder FROM docs "
+                    "WHERE source = ? AND kind = 'bookmark'", (name,))
+            }
+            removed = [(row_id,) for key, (row_id, _) in stored.items() if key not in wanted]
+            upserts = [
+                (name, key) + fields for key, fields in wanted.items()
+                if key not in stored or stored[key][1] != fields
+            ]
+            conn.executemany("DELETE FROM docs WHERE id = ?", removed)
+            conn.executemany(
+                "INSERT INTO docs(source, kind, key, title, url, folder) "
+                "VALUES (?, 'bookmark', ?, ?, ?, ?) "
+                "ON CONFLICT(source, kind, key) DO UPDATE SET "
+                "title = excluded.title, url = excluded.url, folder = excluded.folder",
+                upserts)
+            self.set_meta(f'stat:{source}', stat_key)
+        if removed or upserts:
+            logging.info(f"Search database: {source} bookmarks, {len(upserts)} added or "
+                         f"changed, {len(removed)} removed")
+        return bool(removed or upserts)
+
+    def sync_history(self, source, mirror, now: float) -> bool:
+        """
+        Copy pages visited since the last sync from the History mirror,
+        dropping pages the mirror no longer has when it reconciled since
+        """
+        mirror.refresh()
+        name = str(source)
+        watermark = self.get_meta(f'history_watermark:{source}', 0)
+        reconciled = mirror.get_meta('reconciled_at')
+        conn = self.connect()
+        with span('sqlite'):
+            conn.execute("ATTACH DATABASE ? AS mirror", (mirror.mirror_path,))
+            try:
+                with conn:
+                    added = conn.execute("""
+                        INSERT INTO docs(source, kind, key, title, url)
+                        SELECT ?, 'history', CAST(u.id AS TEXT), coalesce(u.title, ''), u.url
+                        FROM mirror.urls u
+                        WHERE u.last_visit_time > ?
+                        ON CONFLICT(source, kind, key) DO UPDATE SET
+                            title = excluded.title, url = excluded.url
+                    """, (name, watermark)).rowcount
+                    removed = 0
+                    if reconciled != self.get_meta(f'history_reconciled:{source}'):
+                        removed = conn.execute("""
+                            DELETE FROM docs
+                            WHERE source = ? AND kind = 'history'
+                              AND CAST(key AS INTEGER) NOT IN (SELECT id FROM mirror.urls)
+                        """, (name,)).rowcount
+                        self.set_meta(f'history_reconciled:{source}', reconciled)
+                    self.set_meta(f'history_watermark:{source}', mirror.get_meta('watermark'))
+                    self.set_meta(f'history_at:{source}', now)
+            finally:
+                conn.execute("DETACH DATABASE mirror")
+        if added or removed:
+            logging.info(f"Search database: {source} history, {added} pages added or "
+                         f"updated, {removed} removed")
+        return bool(added or removed)
+
+    def search(self, clauses: Iterable[Tuple[Optional[str], str, bool]],
+               limit: int) -> Optional[List[Tuple[str, str, str, str, str]]]:
+        """
+        Get (source, kind, title, url, folder) rows matching a compiled
+        query's clauses (see match_expression), best BM25 match first.
+        None if the clauses require no words FTS5 can match ('.', '!!').
+        """
+        expression = match_expression(clauses)
+        if expression is None:
+            return None
+        with span('fts'):
+            return self.connect().execute(SEARCH, (expression, limit * OVERFETCH)).fetchall()
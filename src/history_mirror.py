@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import logging
+import sqlite3
+from typing import Iterable, List, Tuple
+
+from bookmark_cache import cache_file_path
+from readonly_db import open_readonly
+from instrumentation import span
+
+# How often to reconcile against rows Chrome expired from History, in seconds
+DEFAULT_RECONCILE_INTERVAL = 3600
+
+MIRROR_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS urls(
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL,
+        title TEXT,
+        visit_count INTEGER NOT NULL DEFAULT 0,
+        typed_count INTEGER NOT NULL DEFAULT 0,
+        last_visit_time INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS urls_last_visit_time ON urls(last_visit_time);
+    CREATE INDEX IF NOT EXISTS urls_url ON urls(url);
+    CREATE TABLE IF NOT EXISTS visits(
+        id INTEGER PRIMARY KEY,
+        url INTEGER NOT NULL,
+        visit_time INTEGER NOT NULL,
+        transition INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS visits_url ON visits(url);
+    CREATE INDEX IF NOT EXISTS visits_time ON visits(visit_time);
+    CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+URL_COLUMNS = "u.id, u.url, u.title, u.visit_count, u.typed_count, u.last_visit_time"
+
+# Chrome indexes visits.visit_time but not urls.last_visit_time, so new rows
+# are found through the visits table; the urls scan is a fallback for
+# History files without one
+NEW_URLS_BY_VISITS = f"""
+    SELECT {URL_COLUMNS} FROM urls u
+    WHERE u.id IN (SELECT url FROM visits WHERE visit_time > ?)
+"""
+NEW_URLS_BY_SCAN = f"SELECT {URL_COLUMNS} FROM urls u WHERE u.last_visit_time > ?"
+NEW_VISITS = "SELECT id, url, visit_time, transition FROM visits WHERE visit_time > ?"
+
+
+class HistoryMirror:
+    """
+    Local SQLite mirror of Chrome's History urls and visits tables.
+
+    refresh() ingests only rows visited after the stored watermarks, so each
+    call costs O(new visits) rather than a full copy-and-scan. Rows Chrome
+    expires from History are removed by a periodic reconciliation that
+    compares url primary keys and drops visits older than History's oldest.
+    """
+
+    def __init__(self, history_path: str, cache_dir: str = None,
+                 reconcile_interval: float = DEFAULT_RECONCILE_INTERVAL):
+        self.history_path = history_path
+        self.reconcile_interval = reconcile_interval
+        self.mirror_path = cache_file_path('history', history_path, '.sqlite', cache_dir)
+        self._conn = None
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Get the connection to the mirror database, creating it if needed
+        """
+        if self._conn is None:
+            # Profiles load on worker threads; callers serialize access
+            self._conn = sqlite3.connect(self.mirror_path, check_same_thread=False)
+            self._conn.executescript(MIRROR_SCHEMA)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get_meta(self, key: str, default: int = 0) -> int:
+        row = self.connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: int):
+        self.connect().execute(
+            "INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def refresh(self) -> int:
+        """
+        Pull urls and visits newer than the watermarks from History,
+        reconciling expired rows when due. Returns the number of urls ingested.
+        """
+        if not os.path.exists(self.history_path):
+            return 0
+
+        conn = self.connect()
+        watermark = self.get_meta('watermark')
+        visit_watermark = self.get_meta('visit_watermark')
+        reconcile_due = time.time() - self.get_meta('reconciled_at') >= self.reconcile_interval
+
+        visits = []
+        oldest_visit = None
+        with span('sqlite'):
+            with open_readonly(self.history_path) as source:
+                try:
+                    rows = source.execute(NEW_URLS_BY_VISITS, (watermark,)).fetchall()
+                    visits = source.execute(NEW_VISITS, (visit_watermark,)).fetchall()
+                    if reconcile_due:
+                        oldest_visit = source.execute("SELECT min(visit_time) FROM visits").fetchone()[0]
+                except sqlite3.OperationalError:
+                    rows = source.execute(NEW_URLS_BY_SCAN, (watermark,)).fetchall()
+                source_ids = None
+                if reconcile_due:
+                    source_ids = {row[0] for row in source.execute("SELECT id FROM urls")}
+
+            with conn:
+                if rows:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO urls(id, url, title, visit_count, typed_count, "
+                        "last_visit_time) VALUES (?, ?, ?, ?, ?, ?)", rows
+                    )
+                    self.set_meta('watermark', max(watermark, max(row[5] for row in rows)))
+                if visits:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO visits(id, url, visit_time, transition) "
+                        "VALUES (?, ?, ?, ?)", visits
+                    )
+                    self.set_meta('visit_watermark', max(visit_watermark, max(v[2] for v in visits)))
+                if source_ids is not None:
+                    self.reconcile(source_ids, oldest_visit)
+                    self.set_meta('reconciled_at', int(time.time()))
+
+        if rows or visits:
+            logging.info(f"History mirror ingested {len(rows)} urls, {len(visits)} visits")
+        return len(rows)
+
+    def reconcile(self, source_ids: set, oldest_visit: int = None):
+        """
+        Delete mirrored urls whose ids no longer exist in History, and
+        visits older than the oldest one History still keeps
+        """
+        conn = self.connect()
+        if oldest_visit is not None:
+            conn.execute("DELETE FROM visits WHERE visit_time < ?", (oldest_visit,))
+        expired = [
+            (row_id,) for (row_id,) in conn.execute("SELECT id FROM urls")
+            if row_id not in source_ids
+        ]
+        if expired:
+            conn.executemany("DELETE FROM urls WHERE id = ?", expired)
+            conn.executemany("DELETE FROM visits WHERE url = ?", expired)
+            logging.info(f"History mirror removed {len(expired)} expired rows")
+
+    def visits_for_urls(self, urls: Iterable[str], since: int = 0) -> List[Tuple]:
+        """
+        Get (url, visit_count, typed_count, visit_time, transition) for every
+        visit to any of urls whose page was visited after the Chrome time
+        since, in one batched join
+        """
+        with span('sqlite'):
+            conn = self.connect()
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_urls(url TEXT PRIMARY KEY)")
+            with conn:
+                conn.execute("DELETE FROM wanted_urls")
+                conn.executemany("INSERT OR IGNORE INTO wanted_urls(url) VALUES (?)",
+                                 ((url,) for url in urls))
+            return conn.execute("""
+                SELECT u.url, u.visit_count, u.typed_count, v.visit_time, v.transition
+                FROM urls u
+                JOIN wanted_urls w ON w.url = u.url
+                JOIN visits v ON v.url = u.id
+                WHERE u.last_visit_time > ?
+            """, (since,)).fetchall()
@@ -0,0 +1,214 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import atexit
+import time
+import queue
+import logging
+import threading
+from typing import Dict, List, Optional, TextIO, Tuple
+
+# Log directory relative to HOME
+LOG_DIR = 'Library/Logs/MayankBookmarkManager'
+
+DEFAULT_LOG_LEVEL = 'INFO'
+
+# Log and metrics files are rotated to <name>.1 past this size
+MAX_LOG_BYTES = 1 << 20
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s: %(message)s'
+
+
+def get_log_dir() -> str:
+    log_dir = os.path.join(os.path.expanduser('~'), LOG_DIR)
+    os.makedirs(log_dir, exist_ok=True)
+    return log_dir
+
+
+def get_log_level() -> int:
+    """
+    Get the log level from the BM_LOG_LEVEL workflow variable (DEBUG, INFO, ...)
+    """
+    level = logging.getLevelName(os.environ.get('BM_LOG_LEVEL', DEFAULT_LOG_LEVEL).upper())
+    return level if isinstance(level, int) else logging.INFO
+
+
+class BackgroundWriter:
+    """
+    Appends lines to files from a daemon thread fed through a SimpleQueue,
+    so a caller only pays for a queue put; formatting and file I/O happen
+    off the request path. Files are rotated once they pass MAX_LOG_BYTES.
+    """
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def put(self, path: str, item, formatter: logging.Formatter = None):
+        """
+        Queue a line (or a LogRecord to format with formatter) for path
+        """
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, daemon=True)
+                    self.thread.start()
+                    atexit.register(self.close)
+        self.queue.put((path, item, formatter))
+
+    def _open(self, path: str) -> TextIO:
+        try:
+            if os.path.getsize(path) > MAX_LOG_BYTES:
+                os.replace(path, path + '.1')
+        except OSError:
+            pass
+        return open(path, 'a', encoding='utf-8')
+
+    def _run(self):
+        while True:
+            entry = self.queue.get()
+            if entry is None:
+                break
+            path, item, formatter = entry
+            try:
+                line = item if formatter is None else formatter.format(item) + '\n'
+                f = self.files.get(path)
+                if f is None:
+                    f = self.files[path] = self._open(path)
+                f.write(line)
+                if f.tell() > MAX_LOG_BYTES:
+                    f.close()
+                    self.files[path] = self._open(path)
+            except Exception:
+                # Never let a logging problem take the writer down
+                pass
+            if self.queue.empty():
+                for f in self.files.values():
+                    f.flush()
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+    def close(self):
+        """
+        Write everything queued so far and stop the thread
+        """
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+_writer = BackgroundWriter()
+
+
+class QueueLogHandler(logging.Handler):
+    """
+    Logging handler that hands records to the background writer
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+
+    def emit(self, record: logging.LogRecord):
+        _writer.put(self.path, record, self.formatter)
+
+    def close(self):
+        # Called by logging.shutdown at exit: drain the queue first
+        _writer.close()
+        super().close()
+
+
+def configure_logging(name: str):
+    """
+    Send the root logger to <log dir>/<name>.log through the background
+    writer, at the BM_LOG_LEVEL level. Does nothing if already configured.
+    """
+    root = logging.getLogger()
+    if any(isinstance(h, QueueLogHandler) for h in root.handlers):
+        return
+    handler = QueueLogHandler(os.path.join(get_log_dir(), f'{name}.log'))
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(get_log_level())
+
+
+class Span:
+    """
+    Times a phase of the current request: `with span('rank'): ...`
+    """
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> 'Span':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _spans.append((self.name, (time.perf_counter() - self.start) * 1000))
+
+
+span = Span
+
+# (phase, milliseconds) of the current request, in completion order;
+# list.append is atomic, so source loader threads can record too
+_spans: List[Tuple[str, float]] = []
+_request_start = [0.0]
+
+
+def begin_request():
+    del _spans[:]
+    _request_start[0] = time.perf_counter()
+
+
+def span_totals() -> Dict[str, float]:
+    """
+    Get total milliseconds per phase so far in this request, in first-seen order
+    """
+    totals = {}
+    for name, ms in list(_spans):
+        totals[name] = totals.get(name, 0.0) + ms
+    return totals
+
+
+def elapsed_ms() -> float:
+    return (time.perf_counter() - _request_start[0]) * 1000
+
+
+def timings_enabled() -> bool:
+    """
+    Whether to show per-phase timings as an Alfred item (BM_DEBUG_TIMINGS=1)
+    """
+    return os.environ.get('BM_DEBUG_TIMINGS') == '1'
+
+
+def format_timings() -> Tuple[str, str]:
+    """
+    Get (title, subtitle) summarizing this request's timings for Alfred
+    """
+    phases = ' · '.join(f'{name} {ms:.2f}' for name, ms in span_totals().items())
+    return f'{elapsed_ms():.1f} ms', phases or 'no phases recorded'
+
+
+def end_request(action: str, results: Optional[int] = None):
+    """
+    Append this request's total and per-phase times to the metrics file,
+    one JSON object per line
+    """
+    record = {
+        'time': round(time.time(), 3),
+        'action': action,
+        'total_ms': round(elapsed_ms(), 3),
+        'spans': {name: round(ms, 3) for name, ms in span_totals().items()},
+    }
+    if results is not None:
+        record['results'] = results
+    _writer.put(os.path.join(get_log_dir(), 'metrics.jsonl'), json.dumps(record) + '\n')
@@ -0,0 +1,408 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import ssl
+import socket
+import time
+import queue
+import logging
+import threading
+import http.client
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from bookmark_cache import get_cache_dir, read_marshal, write_marshal
+
+# Bump whenever the stored result layout changes
+LINK_CACHE_VERSION = 1
+
+# Seconds a checked url's result stays fresh
+DEFAULT_TTL = 7 * 86400
+
+# Threads checking urls, and at most this many (each with its own
+# keep-alive connection) on any one host
+DEFAULT_WORKERS = 32
+DEFAULT_PER_HOST = 2
+
+# Requests per second sent to any one host
+DEFAULT_HOST_RATE = 10.0
+
+# Seconds to wait for a connection or a response
+DEFAULT_TIMEOUT = 10.0
+
+MAX_REDIRECTS = 5
+
+# HEAD answers that don't say whether GET works
+HEAD_UNRELIABLE = frozenset((400, 403, 405, 429, 501))
+
+# Answers meaning the page is gone rather than temporarily unreachable
+DEAD_STATUSES = frozenset((404, 410))
+
+# Pseudo statuses for failures without an HTTP answer
+STATUS_UNREACHABLE = 0
+STATUS_TIMEOUT = -1
+STATUS_TLS_ERROR = -2
+STATUS_DROPPED = -3
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh) BookmarkManager-LinkCheck/1.0'
+
+# Largest GET body read to keep a connection reusable
+MAX_DRAIN_BYTES = 64 * 1024
+
+
+def is_dead(status: int) -> bool:
+    """
+    Whether a check result means the bookmark is broken: the page is
+    gone, or the host doesn't resolve or accept connections. A connection
+    dropped mid-answer says nothing about the page, so it isn't.
+    """
+    return status in DEAD_STATUSES or status == STATUS_UNREACHABLE
+
+
+def describe_status(status: int) -> str:
+    if status == STATUS_UNREACHABLE:
+        return 'unreachable'
+    if status == STATUS_TIMEOUT:
+        return 'timed out'
+    if status == STATUS_TLS_ERROR:
+        return 'certificate error'
+    if status == STATUS_DROPPED:
+        return 'connection dropped'
+    return f'HTTP {status}'
+
+
+def host_key(url: str) -> Optional[Tuple[str, str, int]]:
+    """
+    Get (scheme, host, port) of an http(s) url, or None for other urls
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https') or not parts.hostname:
+        return None
+    return scheme, parts.hostname.lower(), port or (443 if scheme == 'https' else 80)
+
+
+class HostUnreachable(Exception):
+    """
+    Opening a connection to a host failed, so none of its urls can answer
+    """
+
+    def __init__(self, status: int, error: Exception):
+        super().__init__(str(error))
+        self.status = status
+
+
+def request_target(url: str) -> str:
+    parts = urlsplit(url)
+    return (parts.path or '/') + ('?' + parts.query if parts.query else '')
+
+
+class HostLimiter:
+    """
+    Spaces the requests to one host at least 1/rate seconds apart, across
+    every thread checking that host
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+class HostConnection:
+    """
+    A keep-alive connection to one (scheme, host, port), reopened after
+    errors and whenever the server closes it
+    """
+
+    def __init__(self, key: Tuple[str, str, int], timeout: float,
+                 context: ssl.SSLContext = None):
+        self.key = key
+        self.timeout = timeout
+        self.context = context
+        self.conn = None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def connect(self):
+        """
+        Open the connection (and the TLS session), raising HostUnreachable
+        when the host doesn't resolve, refuses, never answers or presents a
+        bad certificate
+        """
+        try:
+            self.conn.connect()
+        except socket.timeout as e:
+            self.close()
+            raise HostUnreachable(STATUS_TIMEOUT, e)
+        except ssl.SSLCertVerificationError as e:
+            self.close()
+            raise HostUnreachable(STATUS_TLS_ERROR, e)
+        except OSError as e:
+            self.close()
+            raise HostUnreachable(STATUS_UNREACHABLE, e)
+
+    def request(self, method: str, target: str) -> Tuple[int, Optional[str]]:
+        """
+        Send one request, returning (status, Location header)
+        """
+        scheme, host, port = self.key
+        for attempt in (0, 1):
+            if self.conn is None:
+                if scheme == 'https':
+                    self.conn = http.client.HTTPSConnection(host, port, timeout=self.timeout,
+                                                            context=self.context)
+                else:
+                    self.conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+                self.connect()
+            try:
+                self.conn.request(method, target, headers={'User-Agent': USER_AGENT,
+                                                           'Accept': '*/*'})
+                response = self.conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # A kept-alive connection the server already dropped: retry once fresh
+                self.close()
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                self.close()
+                raise
+            status, location = response.status, response.getheader('Location')
+            # The body has to be consumed before the connection can be reused
+            if response.length is not None and response.length > MAX_DRAIN_BYTES:
+                self.close()
+            else:
+                response.read(MAX_DRAIN_BYTES + 1)
+                if not response.isclosed() or response.will_close:
+                    self.close()
+            return status, location
+        return STATUS_DROPPED, None
+
+
+class LinkCheckCache:
+    """
+    Check results as {url: (checked at, status)} in a marshal file in the
+    workflow cache, so a re-run only re-checks urls older than ttl.
+    Failures without an HTTP answer (statuses of 0 and below) are often
+    transient, e.g. while offline, so they are never stored and the next
+    run checks those urls again.
+    """
+
+    def __init__(self, cache_dir: str = None, ttl: float = DEFAULT_TTL):
+        self.path = os.path.join(cache_dir or get_cache_dir(), 'links.marshal')
+        self.ttl = ttl
+        self.results = None
+
+    def load(self) -> Dict[str, Tuple[float, int]]:
+        if self.results is None:
+            data = read_marshal(self.path, LINK_CACHE_VERSION)
+            self.results = data['results'] if data else {}
+        return self.results
+
+    def fresh(self, url: str, now: float) -> Optional[int]:
+        """
+        Get url's cached status if it was checked within ttl
+        """
+        entry = self.load().get(url)
+        # Caches written before failures were left out may still hold some
+        if entry is not None and entry[1] > 0 and now - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def save(self, now: float):
+        # Drop results too old to be used again
+        results = {url: entry for url, entry in self.load().items()
+                   if entry[1] > 0 and now - entry[0] < self.ttl}
+        write_marshal(self.path, {
+            'version': LINK_CACHE_VERSION,
+            'results': results,
+        })
+
+
+class LinkChecker:
+    """
+    Checks urls concurrently on a bounded thread pool.
+
+    Urls are grouped by host and each host's urls split into at most
+    per_host batches; a worker takes a whole batch and sends it over one
+    keep-alive connection, so a host never sees more than per_host
+    connections, and a shared HostLimiter holds it to host_rate requests
+    per second. Each url gets a HEAD, then a GET when the HEAD answer
+    can't be trusted; redirects are followed up to MAX_REDIRECTS.
+
+    A host that can't be connected to (DNS failure, refused or timed out
+    connection, bad certificate) is marked down, and its remaining urls
+    get the same status without waiting out the timeout again. A url that
+    times out or fails once connected only fails itself.
+    """
+
+    def __init__(self, cache: LinkCheckCache = None, workers: int = DEFAULT_WORKERS,
+                 per_host: int = DEFAULT_PER_HOST, host_rate: float = DEFAULT_HOST_RATE,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.cache = cache or LinkCheckCache()
+        self.workers = workers
+        self.per_host = per_host
+        self.host_rate = host_rate
+        self.timeout = timeout
+        self.context = ssl.create_default_context()
+        self.limiters = {}
+        self.limiters_lock = threading.Lock()
+        # {(scheme, host, port): status} of hosts that failed to answer
+        self.down = {}
+
+    def limiter(self, key: Tuple[str, str, int]) -> HostLimiter:
+        with self.limiters_lock:
+            limiter = self.limiters.get(key)
+            if limiter is None:
+                limiter = self.limiters[key] = HostLimiter(self.host_rate)
+            return limiter
+
+    def request(self, conn: HostConnection, url: str) -> Tuple[int, Optional[str]]:
+        """
+        HEAD url, then GET it if the HEAD answer can't be trusted
+        """
+        limiter = self.limiter(conn.key)
+        target = request_target(url)
+        limiter.wait()
+        status, location = conn.request('HEAD', target)
+        if status in HEAD_UNRELIABLE:
+            limiter.wait()
+            status, location = conn.request('GET', target)
+        return status, location
+
+    def check_url(self, conn: HostConnection, url: str) -> int:
+        """
+        Get url's status through conn, following redirects (over one-off
+        connections when they leave conn's host)
+        """
+        key = conn.key
+        opened = []
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                if key in self.down:
+                    return self.down[key]
+                if key != conn.key:
+                    conn = HostConnection(key, self.timeout, self.context)
+                    opened.append(conn)
+                try:
+                    status, location = self.request(conn, url)
+                except HostUnreachable as e:
+                    # No url on this host can answer: skip the rest of them
+                    self.down[key] = e.status
+                    return e.status
+                except socket.timeout:
+                    # A slow page says nothing about the host's other pages
+                    return STATUS_TIMEOUT
+                except ssl.SSLError:
+                    return STATUS_TLS_ERROR
+                except (OSError, http.client.HTTPException):
+                    # Reset or closed mid-answer, even on a fresh connection:
+                    # the host is up, so don't call the page dead
+                    return STATUS_DROPPED
+                if 300 <= status < 400 and location:
+                    url = urljoin(url, location)
+                    key = host_key(url)
+                    if key is None:
+                        return status
+                    continue
+                return status
+            return status
+        except ValueError:
+            # A malformed redirect
+            return STATUS_UNREACHABLE
+        finally:
+            for extra in opened:
+                extra.close()
+
+    def check_batch(self, key: Tuple[str, str, int], urls: List[str],
+                    results: Dict[str, int]):
+        conn = HostConnection(key, self.timeout, self.context)
+        try:
+            for url in urls:
+                results[url] = self.check_url(conn, url)
+        finally:
+            conn.close()
+
+    def check(self, urls: Iterable[str], refresh: bool = False) -> Dict[str, int]:
+        """
+        Get {url: status} for the http(s) urls, checking only those without
+        a fresh cached result (all of them with refresh), and store the new
+        results in the cache
+        """
+        now = time.time()
+        results = {}
+        by_host = {}
+        for url in dict.fromkeys(urls):
+            key = host_key(url)
+            if key is None:
+                continue
+            status = None if refresh else self.cache.fresh(url, now)
+            if status is not None:
+                results[url] = status
+            else:
+                by_host.setdefault(key, []).append(url)
+
+        batches = queue.SimpleQueue()
+        pending = 0
+        # Biggest hosts first, so they don't end up running alone at the end
+        for key, host_urls in sorted(by_host.items(), key=lambda item: -len(item[1])):
+            count = min(self.per_host, len(host_urls))
+            for n in range(count):
+                batches.put((key, host_urls[n::count]))
+                pending += 1
+        logging.info(f"Checking {sum(map(len, by_host.values()))} links on {len(by_host)} hosts, "
+                     f"{len(results)} cached")
+
+        checked = {}
+
+        def work():
+            while True:
+                try:
+                    key, batch = batches.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    self.check_batch(key, batch, checked)
+                except Exception as e:
+                    logging.error(f"Checking links on {key[1]} failed: {e}")
+
+        threads = [threading.Thread(target=work, daemon=True)
+                   for _ in range(min(self.workers, pending))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if checked:
+            done = time.time()
+            cached = self.cache.load()
+            for url, status in checked.items():
+                if status > 0:
+                    cached[url] = (done, status)
+                else:
+                    cached.pop(url, None)
+            try:
+                self.cache.save(done)
+            except OSError as e:
+                logging.error(f"Error saving link check results: {e}")
+        results.update(checked)
+        return results
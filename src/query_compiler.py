@@ -0,0 +1,273 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import logging
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from bookmark_index import (
+    FOLDER_SEPARATOR, FUZZY_CANDIDATE_LIMIT, BookmarkIndex, QueryMemo, fold
+)
+from bookmark_ranking import split_url
+
+# Operators restricting a term to one field, as in 'site:github.com'
+FIELDS = ('site', 'folder', 'title', 'url')
+
+# Prefix of a term that must not match
+NEGATE = '-'
+
+# Operator whose value, the rest of the query, is joined to each result's url
+PATH_OPERATOR = '>'
+
+# Distinct queries whose plans are kept; typing revisits the same few
+COMPILED_QUERIES = 256
+
+# Plan step kinds, in the order they run: folder scopes are trie lookups,
+# key substrings use the trigram index, fuzzy terms one regex scan of the
+# keys, field checks split each candidate's key, and exclusions, which
+# rarely narrow much, go last
+STEP_FOLDER = 0
+STEP_KEY = 1
+STEP_FUZZY = 2
+STEP_FIELD = 3
+STEP_EXCLUDE = 4
+
+
+def split_terms(text: str) -> Tuple[List[str], str]:
+    """
+    Split a query into its whitespace-separated terms and the path suffix
+    after the path operator. Double quotes keep spaces inside a term
+    ('title:"release notes"'); the quotes themselves are dropped.
+    """
+    terms = []
+    pos = 0
+    size = len(text)
+    while pos < size:
+        if text[pos].isspace():
+            pos += 1
+            continue
+        if text[pos] == PATH_OPERATOR:
+            return terms, text[pos + 1:].strip()
+        term = []
+        quoted = False
+        while pos < size and (quoted or not text[pos].isspace()):
+            if text[pos] == '"':
+                quoted = not quoted
+            else:
+                term.append(text[pos])
+            pos += 1
+        terms.append(''.join(term))
+    return terms, ''
+
+
+class QueryPlan:
+    """
+    A query compiled into the steps that find its matches in an index.
+
+    Steps are (kind, field, value, negate) tuples ordered cheapest and
+    most selective first: folder scopes, then substrings of the search
+    key, longest first, since a longer needle usually has fewer trigram
+    candidates to verify, then exact field checks, then exclusions. Several
+    key steps are reordered for each index by the size of their shortest
+    posting list, which costs no decoding. The first key
+    step without a folder scope goes to the trigram index (or the query
+    memo); every later step only filters the ids left. A field term also
+    adds a key step for its value, so it narrows by trigrams before its
+    field is checked.
+
+    scored holds the plain and field terms that rank the matches, plain
+    the folded plain terms alone. If no bookmark contains all the plain
+    terms (see needs_fallback), fallback runs the same steps with the plain
+    terms matched fuzzily: only bookmarks holding their characters in order
+    are scored. Terms that matched but were all filtered out by exclusions
+    or field checks don't fall back, as there is nothing to correct.
+    """
+
+    __slots__ = ('steps', 'scored', 'plain', 'path_suffix', 'leading_folder',
+                 'fts_clauses', 'fallback')
+
+    def __init__(self, steps: List[Tuple], scored: List[str],
+                 path_suffix: str = '', leading_folder: str = None,
+                 fts_clauses: List[Tuple[Optional[str], str, bool]] = (),
+                 plain: List[str] = ()):
+        self.steps = steps
+        self.scored = scored
+        self.plain = plain
+        self.path_suffix = path_suffix
+        self.leading_folder = leading_folder
+        self.fts_clauses = fts_clauses
+        self.fallback = None
+
+    def __repr__(self):
+        return f"QueryPlan({self.steps!r}, path_suffix={self.path_suffix!r})"
+
+    def ordered(self, index: BookmarkIndex) -> List[Tuple]:
+        """
+        Get the steps for index, with its key steps reordered by their
+        estimated matches there when there are several
+        """
+        steps = self.steps
+        keyed = [n for n, step in enumerate(steps) if step[0] == STEP_KEY]
+        if len(keyed) < 2:
+            return steps
+        start, end = keyed[0], keyed[-1] + 1
+        estimate = index.trigrams.estimate
+        return steps[:start] + sorted(steps[start:end], key=lambda step: estimate(step[2])) \
+            + steps[end:]
+
+    def match(self, index: BookmarkIndex, memo: QueryMemo = None) -> List[int]:
+        """
+        Get the ids of the bookmarks in index matching every step
+        """
+        ids = None
+        keys = index.trigrams.keys
+        for kind, field, value, negate in self.ordered(index):
+            if field == 'folder':
+                scope = index.scope(value)
+                if negate:
+                    if scope:
+                        excluded = set(scope)
+                        ids = [i for i in (index.order if ids is None else ids)
+                               if i not in excluded]
+                elif scope is None:
+                    # Names no folder in this index
+                    return []
+                else:
+                    ids = scope if ids is None else sorted(set(ids).intersection(scope))
+            elif negate:
+                ids = index.order if ids is None else ids
+                if field is None:
+                    needle = keys.needle(value)
+                    ids = [i for i in ids if not keys.contains(i, needle)]
+                else:
+                    ids = [i for i in ids
+                           if not field_contains(field, value, index.search_fields(i))]
+            elif kind == STEP_FUZZY:
+                ids = index.trigrams.search_subsequence(value, ids)
+                if len(ids) >= FUZZY_CANDIDATE_LIMIT:
+                    logging.debug("Fuzzy candidates for %r capped at %d", value, len(ids))
+            elif kind == STEP_KEY:
+                if ids is not None:
+                    ids = index.trigrams.search_within(value, ids)
+                elif memo is not None:
+                    ids = memo.search(index, value)
+                else:
+                    ids = index.trigrams.search(value)
+            else:
+                ids = [i for i in ids if field_contains(field, value, index.search_fields(i))]
+            if not ids:
+                return []
+        return index.order if ids is None else ids
+
+
+    def needs_fallback(self, index: BookmarkIndex, memo: QueryMemo = None) -> bool:
+        """
+        Check whether the fuzzy fallback should run for index, i.e. no
+        bookmark there contains every plain term, whatever the other
+        steps do
+        """
+        if self.fallback is None:
+            return False
+        ids = None
+        for value in self.plain:
+            if ids is not None:
+                ids = index.trigrams.search_within(value, ids)
+            elif memo is not None:
+                ids = memo.search(index, value)
+            else:
+                ids = index.trigrams.search(value)
+            if not ids:
+                return True
+        return False
+
+
+def field_contains(field: str, value: str, fields: Tuple[str, str]) -> bool:
+    """
+    Check whether a bookmark's folded (title, url) has value in field
+    """
+    title, url = fields
+    if field == 'title':
+        return value in title
+    if field == 'url':
+        return value in url
+    return value in split_url(url)[0]
+
+
+def plan_steps(entries: Iterable[Tuple[Optional[str], str, bool]],
+               fuzzy: bool = False) -> List[Tuple]:
+    """
+    Turn (field, folded value, negate) entries into plan steps, ordered.
+    With fuzzy, plain terms only need their characters in order.
+    """
+    steps = set()
+    for field, value, negate in entries:
+        if negate:
+            steps.add((STEP_EXCLUDE, field, value, True))
+        elif field == 'folder':
+            steps.add((STEP_FOLDER, field, value, False))
+        elif fuzzy and field is None:
+            steps.add((STEP_FUZZY, None, value, False))
+        else:
+            steps.add((STEP_KEY, None, value, False))
+            if field is not None:
+                steps.add((STEP_FIELD, field, value, False))
+    # Within a kind, longer values first: they match fewer bookmarks
+    ordered = []
+    for step in sorted(steps, key=lambda step: (step[0], -len(step[2]), step[2], step[1] or '')):
+        # A key step inside a longer one already run can't narrow further
+        if step[0] == STEP_KEY and any(
+                earlier[0] == STEP_KEY and step[2] in earlier[2] for earlier in ordered):
+            continue
+        ordered.append(step)
+    return ordered
+
+
+@lru_cache(maxsize=COMPILED_QUERIES)
+def compile_query(text: str, folder_first: bool = True) -> QueryPlan:
+    """
+    Compile a query into a QueryPlan. Terms are AND-ed; 'site:', 'folder:',
+    'title:' and 'url:' restrict a term to the page's domain, its folder
+    path, its title or its url, and a leading '-' excludes what a term
+    matches. '>' ends the query: the text after it is joined to each
+    result's url, e.g. 'github >pulls'.
+
+    With folder_first, a leading term containing a folder separator
+    ('work/infra k8s') is a folder scope; leading_folder then holds it, so
+    the caller can recompile without folder_first when no index has that
+    folder.
+    """
+    terms, path_suffix = split_terms(text or '')
+    entries = []
+    fts_clauses = []
+    leading_folder = None
+    for n, term in enumerate(terms):
+        negate = term.startswith(NEGATE)
+        if negate:
+            term = term[1:]
+        field, sep, value = term.partition(':')
+        if sep and field.lower() in FIELDS:
+            field = field.lower()
+        else:
+            field, value = None, term
+        if field is None and not negate and n == 0 and folder_first \
+                and FOLDER_SEPARATOR in value:
+            field = 'folder'
+            leading_folder = value
+        if not value:
+            # An operator still being typed
+            continue
+        entries.append((field, value if field == 'folder' else fold(value), negate))
+        fts_clauses.append(('url' if field == 'site' else field, value, negate))
+
+    scored = list(dict.fromkeys(value for field, value, negate in entries
+                                if field != 'folder' and not negate))
+    # Longest first, as for key steps
+    plain = sorted(dict.fromkeys(value for field, value, negate in entries
+                                 if field is None and not negate), key=len, reverse=True)
+    plan = QueryPlan(plan_steps(entries), scored, path_suffix, leading_folder, fts_clauses,
+                     plain)
+    if any(field is None and not negate for field, _, negate in entries):
+        # The same filters, with the plain terms matched fuzzily
+        plan.fallback = QueryPlan(plan_steps(entries, fuzzy=True), scored, path_suffix,
+                                  leading_folder)
+    return plan
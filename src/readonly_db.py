@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import logging
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from urllib.parse import quote
+from typing import Iterator
+
+# Largest database we are willing to copy when it cannot be read in place
+DEFAULT_COPY_LIMIT = 1 << 30
+
+
+def get_copy_limit() -> int:
+    """
+    Get the copy size limit from the BM_DB_COPY_LIMIT workflow variable
+    """
+    try:
+        return int(os.environ.get('BM_DB_COPY_LIMIT', DEFAULT_COPY_LIMIT))
+    except ValueError:
+        return DEFAULT_COPY_LIMIT
+
+
+def sqlite_uri(db_path: str, **params: str) -> str:
+    """
+    Build a file: URI for db_path with the given query parameters
+    """
+    query = '&'.join(f'{k}={v}' for k, v in params.items())
+    return f"file:{quote(os.path.abspath(db_path))}?{query}"
+
+
+def _connect(uri: str) -> sqlite3.Connection:
+    # Fail fast on a lock instead of waiting out the default busy timeout
+    conn = sqlite3.connect(uri, uri=True, timeout=0)
+    try:
+        # Opening is lazy; touch the schema so locking errors surface here
+        conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn
+
+
+def _copy_and_connect(db_path: str, temp_dir: str) -> sqlite3.Connection:
+    """
+    Copy the database (and its WAL, if any) into temp_dir and open the copy
+    """
+    size = os.path.getsize(db_path)
+    limit = get_copy_limit()
+    if size > limit:
+        raise sqlite3.OperationalError(
+            f"{db_path} is {size} bytes, over the {limit} byte copy limit"
+        )
+    temp_db = os.path.join(temp_dir, os.path.basename(db_path))
+    shutil.copyfile(db_path, temp_db)
+    if os.path.exists(db_path + '-wal'):
+        shutil.copyfile(db_path + '-wal', temp_db + '-wal')
+    return sqlite3.connect(temp_db)
+
+
+@contextmanager
+def open_readonly(db_path: str) -> Iterator[sqlite3.Connection]:
+    """
+    Open a SQLite database another process (Chrome) may hold open, without
+    copying it unless there is no other way.
+
+    1. mode=ro: a normal read-only connection that honours locks.
+    2. immutable=1: when Chrome holds an exclusive lock, read the file
+       in place without taking locks.
+    3. A size-bounded copy into a private per-process directory, removed
+       when the connection is closed.
+    """
+    conn = None
+    temp_dir = None
+    try:
+        for params in ({'mode': 'ro'}, {'mode': 'ro', 'immutable': '1'}):
+            try:
+                conn = _connect(sqlite_uri(db_path, **params))
+                break
+            except sqlite3.Error as e:
+                logging.info(f"Read-only open of {db_path} with {params} failed: {e}")
+        if conn is None:
+            temp_dir = tempfile.mkdtemp(prefix='bookmark-manager-')
+            conn = _copy_and_connect(db_path, temp_dir)
+        yield conn
+    finally:
+        if conn is not None:
+            conn.close()
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
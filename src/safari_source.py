@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+from typing import Any, Dict, List, Tuple
+
+from bookmark_index import join_folder
+from bookmark_sources import BookmarkSource
+from instrumentation import span
+
+# Safari bookmarks property list relative to HOME
+SAFARI_BOOKMARKS_PATH = 'Library/Safari/Bookmarks.plist'
+
+
+class SafariBookmarks(BookmarkSource):
+    """
+    Safari's Bookmarks.plist (binary or XML). Reading it needs Full Disk
+    Access on recent macOS; without it the source just fails to load.
+    """
+
+    browser = 'safari'
+
+    def __init__(self, path: str):
+        super().__init__(path, 'Safari')
+
+    def read_source(self) -> Tuple[Dict[str, Any], None]:
+        import plistlib
+
+        with span('read'), open(self.path, 'rb') as f:
+            data = f.read()
+        with span('parse'):
+            return plistlib.loads(data), None
+
+    def extract(self, root: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        Walk the WebBookmarkTypeList folders down to WebBookmarkTypeLeaf
+        entries. The root and its lists (Favorites, the menu, the Reading
+        List) are not part of folder paths.
+        """
+        bookmarks = []
+        stack = [(root, None)]
+        while stack:
+            node, folder = stack.pop()
+            kind = node.get('WebBookmarkType')
+            if kind == 'WebBookmarkTypeLeaf' and node.get('URLString'):
+                url = node['URLString']
+                title = node.get('URIDictionary', {}).get('title') or url
+                bookmarks.append({'id': node.get('WebBookmarkUUID', ''), 'title': title,
+                                  'url': url, 'folder': folder or ''})
+            elif kind == 'WebBookmarkTypeList':
+                if folder is None:
+                    path = '' if node is not root else None
+                else:
+                    path = join_folder(folder, node.get('Title', ''))
+                stack.extend((child, path) for child in reversed(node.get('Children', [])))
+        return bookmarks
+
+
+def discover_safari(user_dir: str) -> List[SafariBookmarks]:
+    path = os.path.join(user_dir, SAFARI_BOOKMARKS_PATH)
+    return [SafariBookmarks(path)] if os.path.exists(path) else []